@@ -1,11 +1,40 @@
-import { NextResponse } from "next/server"
+import { NextResponse, type NextRequest } from "next/server"
 import fs from "fs"
 import path from "path"
 
-export async function GET() {
+// ETag do documento: a impressão das páginas das salas gravada no manifesto pelo script
+// (se o manifesto não for mais antigo que o DOCX); senão, tamanho e data do arquivo
+function etagDoDocumento(docxPath: string, stat: fs.Stats): string {
+  const manifestoPath = docxPath.replace(/\.docx$/, ".manifesto.json")
   try {
+    if (fs.statSync(manifestoPath).mtimeMs >= stat.mtimeMs) {
+      const { impressao } = JSON.parse(fs.readFileSync(manifestoPath, "utf-8"))
+      if (typeof impressao === "string" && impressao) {
+        return `"${impressao}"`
+      }
+    }
+  } catch {
+    // sem manifesto: usa os dados do arquivo
+  }
+  return `W/"${stat.size}-${Math.floor(stat.mtimeMs)}"`
+}
+
+export async function GET(request: NextRequest) {
+  try {
+    // Com year e semester, serve o documento daquele semestre gerado pelo trabalhador;
+    // sem eles, o último documento gerado
+    const year = request.nextUrl.searchParams.get("year")
+    const semester = request.nextUrl.searchParams.get("semester")
+    if ((year || semester) && !(/^\d{4}$/.test(year ?? "") && /^\d$/.test(semester ?? ""))) {
+      return NextResponse.json(
+        { error: "Parâmetros inválidos", message: "Informe year (ex: 2025) e semester (ex: 1)." },
+        { status: 400 },
+      )
+    }
+    const fileName = year && semester ? `Mapa_de_Salas_${year}-${semester}.docx` : "Mapa_de_Salas.docx"
+
     // Caminho para o arquivo DOCX gerado pelo script Python
-    const docxPath = path.join(process.cwd(), "public", "Mapa_de_Salas.docx")
+    const docxPath = path.join(process.cwd(), "public", fileName)
 
     // Verifica se o arquivo existe
     if (!fs.existsSync(docxPath)) {
@@ -18,6 +47,12 @@ export async function GET() {
       )
     }
 
+    // Se o navegador já tem este mesmo documento, não relê nem reenvia o arquivo
+    const etag = etagDoDocumento(docxPath, fs.statSync(docxPath))
+    if (request.headers.get("if-none-match") === etag) {
+      return new NextResponse(null, { status: 304, headers: { ETag: etag, "Cache-Control": "no-cache" } })
+    }
+
     // Lê o arquivo
     const fileBuffer = fs.readFileSync(docxPath)
 
@@ -25,7 +60,9 @@ export async function GET() {
     return new NextResponse(fileBuffer, {
       headers: {
         "Content-Type": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        "Content-Disposition": "attachment; filename=Mapa_de_Salas.docx",
+        "Content-Disposition": `attachment; filename=${fileName}`,
+        ETag: etag,
+        "Cache-Control": "no-cache",
       },
     })
   } catch (error) {
@@ -9,6 +9,8 @@ export async function GET(request: NextRequest) {
   const encoder = new TextEncoder();
   const year = request.nextUrl.searchParams.get("year");
   const semester = request.nextUrl.searchParams.get("semester");
+  // mode=render só regenera o DOCX a partir do último snapshot, sem acessar o SIGAA
+  const renderOnly = request.nextUrl.searchParams.get("mode") === "render";
   let isClosed = false;
 
   // Utilitários seguros para escrita e fechamento
@@ -37,7 +39,7 @@ export async function GET(request: NextRequest) {
     safeWrite(`data: ${JSON.stringify({ log: message })}\n\n`);
   };
 
-  if (!year || !semester) {
+  if (!renderOnly && (!year || !semester || !/^\d{4}$/.test(year) || !/^\d$/.test(semester))) {
     safeWrite(`data: ${JSON.stringify({ success: false, message: "Parâmetros year e semester são obrigatórios." })}\n\n`);
     safeClose();
     return new Response(stream.readable, {
@@ -52,11 +54,17 @@ export async function GET(request: NextRequest) {
   (async () => {
     try {
       sendLog("Iniciando execução do script...");
+      // A coleta vai para o trabalhador do script (--enfileirar), que sobe sozinho se
+      // não estiver rodando: pedidos simultâneos do mesmo semestre viram uma única tarefa
+      const scriptArgs = [
+        ...(renderOnly ? ["--somente-docx"] : [year as string, semester as string, "--enfileirar"]),
+        "--progresso"
+      ];
+      const docxName = renderOnly ? "Mapa_de_Salas.docx" : `Mapa_de_Salas_${year}-${semester}.docx`;
       const pythonProcess = spawn("python", [
         "-u",
         "app/scripts/sigaa-scrapper.py",
-        year,
-        semester
+        ...scriptArgs
       ], {
         env: {
           ...process.env,
@@ -68,7 +76,8 @@ export async function GET(request: NextRequest) {
       });
 
 
-      // Encerra o processo caso o cliente aborte a requisição
+      // Encerra o processo caso o cliente aborte a requisição (a tarefa na fila
+      // continua, pois outros clientes podem estar acompanhando o mesmo semestre)
       request.signal.addEventListener("abort", () => {
         console.log("[API] Conexão abortada pelo cliente");
         try {
@@ -89,7 +98,20 @@ export async function GET(request: NextRequest) {
         stdoutBuffer = lines.pop() || "";
 
         lines.forEach((line) => {
-          if (line.trim()) sendLog(line.trim());
+          const trimmed = line.trim();
+          if (!trimmed) return;
+          // Linhas de métricas do script viram eventos estruturados em vez de log
+          const structured = trimmed.match(/^\[(PROGRESSO|METRICAS)\] (.*)$/);
+          if (structured) {
+            try {
+              const payload = JSON.parse(structured[2]);
+              safeWrite(`data: ${JSON.stringify(structured[1] === "PROGRESSO" ? { progress: payload } : { metrics: payload })}\n\n`);
+              return;
+            } catch {
+              // JSON inválido: segue como log comum
+            }
+          }
+          sendLog(trimmed);
         });
       });
 
@@ -109,7 +131,7 @@ export async function GET(request: NextRequest) {
 
         if (code === 0) {
           sendLog("Processamento concluído com sucesso!");
-          const docxPath = path.join(process.cwd(), "public", "Mapa_de_Salas.docx");
+          const docxPath = path.join(process.cwd(), "public", docxName);
 
           if (fs.existsSync(docxPath)) {
             const stats = fs.statSync(docxPath);
@@ -117,7 +139,7 @@ export async function GET(request: NextRequest) {
 
             safeWrite(`data: ${JSON.stringify({
               success: true,
-              docxPath: "Mapa_de_Salas.docx",
+              docxPath: docxName,
               lastModified
             })}\n\n`);
           } else {
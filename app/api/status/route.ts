@@ -1,17 +1,49 @@
 import fs from 'fs'
 import path from 'path'
-import { NextResponse } from 'next/server'
+import { NextResponse, type NextRequest } from 'next/server'
 
-export async function GET() {
-  const filePath = path.resolve('./public', 'Mapa_de_Salas.docx')
+const QUEUE_DIR = path.resolve('./.cache', 'fila')
+
+// Tarefa do trabalhador ainda na fila ou em andamento para o semestre, com a última etapa concluída
+function activeJob(year: string, semester: string) {
+  const marker = path.join(QUEUE_DIR, `semestre-${year}-${semester}.ativa`)
+  if (!fs.existsSync(marker)) return null
+  const id = fs.readFileSync(marker, 'utf-8').trim()
+  if (!id) return null
+
+  const processing = fs.existsSync(path.join(QUEUE_DIR, `${id}.processando`))
+  if (!processing && !fs.existsSync(path.join(QUEUE_DIR, `${id}.json`))) return null
+
+  let progress = null
+  const logPath = path.join(QUEUE_DIR, `${id}.log`)
+  if (fs.existsSync(logPath)) {
+    const lines = fs.readFileSync(logPath, 'utf-8').split('\n').filter((line) => line.startsWith('[PROGRESSO] '))
+    try {
+      progress = lines.length ? JSON.parse(lines[lines.length - 1].slice('[PROGRESSO] '.length)) : null
+    } catch {
+      progress = null
+    }
+  }
+  return { id, status: processing ? 'processando' : 'pendente', progress }
+}
+
+export async function GET(request: NextRequest) {
+  // Com year e semester, informa o documento daquele semestre e a coleta em andamento
+  const year = request.nextUrl.searchParams.get('year')
+  const semester = request.nextUrl.searchParams.get('semester')
+  const bySemester = /^\d{4}$/.test(year ?? '') && /^\d$/.test(semester ?? '')
+  const fileName = bySemester ? `Mapa_de_Salas_${year}-${semester}.docx` : 'Mapa_de_Salas.docx'
+  const filePath = path.resolve('./public', fileName)
+  const job = bySemester ? activeJob(year as string, semester as string) : null
 
   if (fs.existsSync(filePath)) {
     const stats = fs.statSync(filePath)
     return NextResponse.json({
       exists: true,
       lastModified: stats.mtime,
+      job,
     })
   }
 
-  return NextResponse.json({ exists: false })
+  return NextResponse.json({ exists: false, job })
 }
@@ -145,6 +145,8 @@ export default function Home() {
   const [lastGeneratedDate, setLastGeneratedDate] = useState<string | null>(null)
   const [selectedYear, setSelectedYear] = useState(new Date().getFullYear());
   const [selectedSemester, setSelectedSemester] = useState(1);
+  // Semestre do último documento gerado nesta sessão, para baixar o arquivo certo
+  const [generatedSemester, setGeneratedSemester] = useState<{ year: number; semester: number } | null>(null);
 
   // Efeito para animação de sucesso - otimizado
   useEffect(() => {
@@ -228,6 +230,7 @@ const fetchCronograma = useCallback(async () => {
         if (data.success) {
           setSuccess(true);
           setDownloadReady(true);
+          setGeneratedSemester({ year: selectedYear, semester: selectedSemester });
           setActiveTab("gerar");
           setLastGeneratedDate(new Date(data.lastModified).toLocaleString("pt-BR"))
           toast({ title: "Sucesso!", description: "Cronograma gerado" });
@@ -273,7 +276,8 @@ const fetchCronograma = useCallback(async () => {
     try {
       setLogs((prev) => [...prev, "Iniciando download do arquivo DOCX..."])
 
-      const response = await fetch("/api/download")
+      const query = generatedSemester ? `?year=${generatedSemester.year}&semester=${generatedSemester.semester}` : ""
+      const response = await fetch(`/api/download${query}`)
 
       if (!response.ok) {
         const errorData = await response.json().catch(() => ({}))
@@ -293,7 +297,9 @@ const fetchCronograma = useCallback(async () => {
       const url = window.URL.createObjectURL(blob)
       const a = document.createElement("a")
       a.href = url
-      a.download = "Mapa_de_Salas.docx"
+      a.download = generatedSemester
+        ? `Mapa_de_Salas_${generatedSemester.year}-${generatedSemester.semester}.docx`
+        : "Mapa_de_Salas.docx"
       document.body.appendChild(a)
       a.click()
 
@@ -316,7 +322,7 @@ const fetchCronograma = useCallback(async () => {
         variant: "destructive",
       })
     }
-  }, [toast])
+  }, [toast, generatedSemester])
 
   // Memoize o componente de partículas para evitar re-renderizações
    const SuccessParticles = useMemo(() => {
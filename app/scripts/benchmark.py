@@ -0,0 +1,835 @@
+"""
+Benchmarks offline do sigaa-scrapper.py.
+
+Uso:
+    python benchmark.py extracao --turmas 300
+    python benchmark.py http --turmas 300
+    python benchmark.py docx --salas 60
+    python benchmark.py micro --chamadas 20000
+    python benchmark.py gravar 2025 1
+    python benchmark.py suite --escalas 1,10,100
+"""
+import argparse
+import contextlib
+import copy
+import gzip
+import importlib.util
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+DIR_SCRIPTS = os.path.dirname(os.path.abspath(__file__))
+
+def carregar_scraper():
+    # O nome do script tem hífen, então não dá para usar import direto
+    caminho = os.path.join(DIR_SCRIPTS, "sigaa-scrapper.py")
+    spec = importlib.util.spec_from_file_location("sigaa_scrapper", caminho)
+    modulo = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = modulo  # o renderizador paralelo envia funções do módulo aos processos
+    spec.loader.exec_module(modulo)
+    return modulo
+
+# === FIXTURES SINTÉTICAS NO FORMATO DA LISTAGEM DO SIGAA ===
+SALAS_FIXTURE = ["FCTE - I1", "FCTE - I2", "FCTE - S1", "FCTE - S9", "FGA - LAB SS",
+                 "FCTE - I7 (LAB)", "FCTE - MOCAP", "FCTE - S2", "ICC ANF. 12"]
+HORARIOS_FIXTURE = ["35T23", "24M12", "246M34", "35T45", "2M12 4T34", "6T2345", "7M1234", "35N12"]
+PROFESSORES_FIXTURE = ["MARIA DA SILVA", "JOAO PEREIRA", "ANA SOUZA", "CARLOS LIMA", "BEATRIZ COSTA"]
+
+def gerar_html_listagem(num_turmas, semente=42, turmas_por_disciplina=3):
+    rnd = random.Random(semente)
+    linhas = [
+        "<html><head><title>SIGAA - Turmas</title></head><body>",
+        '<table class="listagem"><thead><tr>'
+        "<th>Código</th><th>Período</th><th>Docente</th><th>Horário</th>"
+        "<th>Vagas Ofertadas</th><th>Vagas Ocupadas</th><th>Situação</th><th>Local</th>"
+        "</tr></thead><tbody>",
+    ]
+    for i in range(num_turmas):
+        if i % turmas_por_disciplina == 0:
+            disc = i // turmas_por_disciplina
+            linhas.append(
+                '<tr class="agrupador"><td colspan="8">'
+                f'<span class="tituloDisciplina">FGA{disc:04d} - DISCIPLINA DE ENGENHARIA {disc}</span>'
+                "</td></tr>"
+            )
+        classe = "linhaPar" if i % 2 == 0 else "linhaImpar"
+        profs = rnd.sample(PROFESSORES_FIXTURE, rnd.choice([1, 1, 2]))
+        docentes = "<br>".join(f"{p} ({rnd.choice([30, 60])}h)" for p in profs)
+        linhas.append(
+            f'<tr class="{classe}">'
+            f'<td>{i % turmas_por_disciplina + 1:02d}</td>'
+            "<td>2025.1</td>"
+            f"<td>{docentes}</td>"
+            f'<td>{rnd.choice(HORARIOS_FIXTURE)} <span style="display: none">detalhe</span></td>'
+            "<td>60</td><td>45</td><td>ABERTA</td>"
+            f"<td>{rnd.choice(SALAS_FIXTURE)}</td>"
+            "</tr>"
+        )
+    linhas.append("</tbody></table></body></html>")
+    return "\n".join(linhas)
+
+DEPARTAMENTOS_FIXTURE = [
+    "-- SELECIONE --",
+    "CAMPUS UNB CEILÂNDIA: FACULDADE DE CIÊNCIAS E TECNOLOGIAS EM SAÚDE - BRASÍLIA",
+    "CAMPUS UNB GAMA: FACULDADE DE CIÊNCIAS E TECNOLOGIAS EM ENGENHARIA - BRASÍLIA",
+    "INSTITUTO DE FÍSICA - BRASÍLIA",
+    "INSTITUTO DE QUÍMICA - BRASÍLIA",
+    "DEPARTAMENTO DE MATEMÁTICA - BRASÍLIA",
+    "DEPARTAMENTO DE ENGENHARIA MECANICA - BRASÍLIA",
+    "DEPTO CIÊNCIAS DA COMPUTAÇÃO - BRASÍLIA",
+]
+
+def gerar_html_recursos(quantidade):
+    # Folhas de estilo, fontes, imagens e um "rastreador", como as páginas reais do SIGAA
+    partes = []
+    for i in range(quantidade):
+        partes.append(f'<link rel="stylesheet" href="/recursos/estilo{i}.css">'
+                      f'<link rel="preload" as="font" href="/recursos/fonte{i}.woff2" crossorigin>'
+                      f'<img src="/recursos/imagem{i}.png" alt="">')
+    partes.append('<img src="/recursos/www.google-analytics.com/collect.gif" alt="">')
+    return "".join(partes)
+
+def gerar_html_formulario(viewstate, conteudo="", recursos=""):
+    opcoes_depto = "".join(f'<option value="{100 + i}">{nome}</option>'
+                           for i, nome in enumerate(DEPARTAMENTOS_FIXTURE))
+    return (
+        f"<html><head>{recursos}</head><body>"
+        '<form id="formTurma" name="formTurma" method="post" action="/sigaa/public/turmas/listar.jsf">'
+        '<input type="hidden" name="formTurma" value="formTurma">'
+        '<select id="formTurma:inputNivel" name="formTurma:inputNivel">'
+        '<option value="0">-- SELECIONE --</option><option value="S">STRICTO SENSU</option>'
+        '<option value="G">GRADUAÇÃO</option></select>'
+        f'<select id="formTurma:inputDepto" name="formTurma:inputDepto">{opcoes_depto}</select>'
+        '<input type="text" id="formTurma:inputAno" name="formTurma:inputAno" value="2024">'
+        '<select id="formTurma:inputPeriodo" name="formTurma:inputPeriodo">'
+        '<option value="1" selected="selected">1</option><option value="2">2</option></select>'
+        '<input type="submit" name="formTurma:j_id_jsp_1370969402_11" value="Buscar">'
+        f'<input type="hidden" name="javax.faces.ViewState" id="javax.faces.ViewState" value="{viewstate}">'
+        "</form>"
+        f"{conteudo}</body></html>"
+    )
+
+# === SERVIDOR LOCAL QUE REPRODUZ O listar.jsf ===
+class ServidorSigaaStub:
+    """
+    Reproduz respostas gravadas do listar.jsf: GET abre uma sessão e devolve o
+    formulário, POST devolve a listagem do departamento pedido. Um ViewState
+    diferente do último emitido para a sessão é recusado, como faz o JSF com a
+    view expirada. `latencia` (s) simula o tempo de resposta do SIGAA. Com
+    `recursos`, cada página referencia esse número de CSS, fontes e imagens
+    (servidos em /recursos/ após `latencia_recursos` s cada). `falhas` e
+    `lentidao` são as frações de buscas (POST) respondidas com 503 ou com
+    `atraso_lento` s a mais, sorteadas com a `semente`.
+    """
+
+    def __init__(self, paginas, latencia=0.0, recursos=0, latencia_recursos=0.05,
+                 falhas=0.0, lentidao=0.0, atraso_lento=1.5, semente=1):
+        self.paginas = paginas  # valor de inputDepto -> HTML da listagem
+        self.latencia = latencia
+        self.html_recursos = gerar_html_recursos(recursos) if recursos else ""
+        self.latencia_recursos = latencia_recursos
+        self.recursos_servidos = 0
+        self.falhas = falhas
+        self.lentidao = lentidao
+        self.atraso_lento = atraso_lento
+        self.sorteio = random.Random(semente)
+        self.instantes = []  # perf_counter de cada POST recebido
+        self.erros_injetados = 0
+        self.contador = 0
+        self.viewstates = {}  # JSESSIONID -> último ViewState emitido
+        self.requisicoes = []
+        self.primeiro_acesso = None  # perf_counter do primeiro GET recebido
+        self.trava = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _sessao(self):
+                for parte in self.headers.get("Cookie", "").split(";"):
+                    nome, _, valor = parte.strip().partition("=")
+                    if nome == "JSESSIONID":
+                        return valor
+                return None
+
+            def _responder(self, status, html, sessao=None, tipo="text/html; charset=UTF-8"):
+                corpo = html.encode("utf-8") if isinstance(html, str) else html
+                self.send_response(status)
+                self.send_header("Content-Type", tipo)
+                self.send_header("Content-Length", str(len(corpo)))
+                if sessao:
+                    self.send_header("Set-Cookie", f"JSESSIONID={sessao}; Path=/")
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def do_GET(self):
+                if self.path.startswith("/recursos/"):
+                    time.sleep(stub.latencia_recursos)
+                    with stub.trava:
+                        stub.recursos_servidos += 1
+                    tipo = "text/css" if self.path.endswith(".css") else "application/octet-stream"
+                    self._responder(200, b"/* */" if tipo == "text/css" else bytes(64 * 1024), tipo=tipo)
+                    return
+                with stub.trava:
+                    if stub.primeiro_acesso is None:
+                        stub.primeiro_acesso = time.perf_counter()
+                time.sleep(stub.latencia)
+                sessao = stub._nova_sessao()
+                self._responder(200, gerar_html_formulario(stub._novo_viewstate(sessao), "", stub.html_recursos),
+                                sessao)
+
+            def do_POST(self):
+                tamanho = int(self.headers.get("Content-Length", 0))
+                campos = {k: v[0] for k, v in parse_qs(self.rfile.read(tamanho).decode("utf-8")).items()}
+                sessao = self._sessao()
+                with stub.trava:
+                    stub.instantes.append(time.perf_counter())
+                    stub.requisicoes.append(campos)
+                    esperado = stub.viewstates.get(sessao)
+                    sorteio = stub.sorteio.random()
+                    if sorteio < stub.falhas:
+                        stub.erros_injetados += 1
+                if sorteio < stub.falhas:
+                    time.sleep(stub.latencia)
+                    self._responder(503, "<html><body>Serviço indisponível</body></html>")
+                    return
+                time.sleep(stub.latencia + (stub.atraso_lento if sorteio < stub.falhas + stub.lentidao else 0))
+                if esperado is None or campos.get("javax.faces.ViewState") != esperado:
+                    self._responder(200, "<html><body>Sua sessão expirou.</body></html>")
+                    return
+                listagem = stub.paginas.get(campos.get("formTurma:inputDepto"), "")
+                self._responder(200, gerar_html_formulario(stub._novo_viewstate(sessao), listagem,
+                                                           stub.html_recursos))
+
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.servidor.server_address[1]}/sigaa/public/turmas/listar.jsf"
+
+    def _nova_sessao(self):
+        with self.trava:
+            self.contador += 1
+            return f"S{self.contador}"
+
+    def _novo_viewstate(self, sessao):
+        with self.trava:
+            self.contador += 1
+            self.viewstates[sessao] = f"j_id{self.contador}"
+            return self.viewstates[sessao]
+
+    def __enter__(self):
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.servidor.shutdown()
+        self.servidor.server_close()
+
+def paginas_por_departamento(num_turmas):
+    # O departamento da FCTE (índice 2) e os externos recebem listagens distintas
+    return {str(100 + i): gerar_html_listagem(num_turmas, semente=i)
+            for i in range(2, len(DEPARTAMENTOS_FIXTURE))}
+
+def salvar_fixture(html, diretorio, nome):
+    caminho = os.path.join(diretorio, nome)
+    with open(caminho, "w", encoding="utf-8") as f:
+        f.write(html)
+    return caminho
+
+def cronometrar(funcao, repeticoes=1):
+    melhor = float("inf")
+    resultado = None
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor, resultado
+
+def congelar(cron):
+    return {s: {d: list(a) for d, a in dias.items()} for s, dias in cron.items()}
+
+# === EXTRAÇÃO: SNAPSHOT x WEBDRIVER ===
+def bench_extracao(args):
+    scraper = carregar_scraper()
+    html = gerar_html_listagem(args.turmas)
+    diretorio = tempfile.mkdtemp(prefix="sigaa-bench-")
+    caminho = salvar_fixture(html, diretorio, f"listagem_{args.turmas}.html")
+    print(f"Fixture: {caminho} ({args.turmas} turmas)")
+
+    t_snapshot, cron_snapshot = cronometrar(
+        lambda: scraper.parsear_tabela_turmas(html, apenas_fcte=True), args.repeticoes)
+    print(f"snapshot (page_source + parse offline): {t_snapshot * 1000:.1f} ms")
+
+    try:
+        driver, _ = scraper.configurar_driver(url="file://" + caminho)
+    except Exception as e:
+        print(f"Navegador indisponível, modo webdriver não medido: {e}")
+        return 0
+    try:
+        t_snap_driver, cron_snap_driver = cronometrar(
+            lambda: scraper.extrair_dados(driver, apenas_fcte=True, modo="snapshot"), args.repeticoes)
+        t_webdriver, cron_webdriver = cronometrar(
+            lambda: scraper.extrair_dados(driver, apenas_fcte=True, modo="webdriver"), 1)
+    finally:
+        driver.quit()
+    print(f"snapshot via driver: {t_snap_driver * 1000:.1f} ms")
+    print(f"webdriver por célula: {t_webdriver * 1000:.1f} ms")
+    print(f"speedup: {t_webdriver / t_snap_driver:.1f}x")
+    if congelar(cron_snap_driver) != congelar(cron_webdriver):
+        print("[ERRO] Os dois modos produziram cronogramas diferentes!")
+        return 1
+    print("Cronogramas idênticos nos dois modos.")
+    return 0
+
+# === BACKEND HTTP CONTRA O STUB ===
+def cron_esperado(scraper, paginas):
+    esperado = scraper.novo_cronograma()
+    for i, (_, apenas_fcte) in enumerate(scraper.departamentos_da_busca()):
+        pagina = paginas[str(100 + scraper.DEPARTAMENTO_FCTE + i)]
+        scraper.mesclar_cronogramas(esperado, scraper.parsear_tabela_turmas(pagina, apenas_fcte))
+    return esperado
+
+def bench_http(args):
+    scraper = carregar_scraper()
+    paginas = paginas_por_departamento(args.turmas)
+    esperado = congelar(cron_esperado(scraper, paginas))
+    falhou = False
+    for concorrencia in sorted({1, args.concorrencia}):
+        with ServidorSigaaStub(paginas, args.latencia) as stub:
+            t0 = time.perf_counter()
+            cron = scraper.coletar_departamentos("2025", "1", "http", concorrencia=concorrencia, url=stub.url)
+            total = time.perf_counter() - t0
+        print(f"concorrência {concorrencia}: {len(stub.requisicoes)} buscas em {total * 1000:.1f} ms")
+        recusadas = [r for r in stub.requisicoes if r.get("formTurma:inputAno") != "2025"]
+        if recusadas or congelar(cron) != esperado:
+            print(f"[ERRO] Concorrência {concorrencia} não reproduziu as buscas esperadas.")
+            falhou = True
+    if not falhou:
+        print("Backend HTTP reproduziu todas as buscas com o ViewState correto.")
+    return 1 if falhou else 0
+
+# === NAVEGADOR: PERFIL COMPLETO x ENXUTO ===
+def medir_navegador(scraper, paginas, url, rodadas):
+    # Abre o Chrome no stub, busca cada departamento `rodadas` vezes e devolve
+    # (cronograma, memória em MB) com as páginas medidas em METRICAS
+    scraper.METRICAS.reiniciar()
+    cron = scraper.novo_cronograma()
+    backend = scraper.BackendSelenium(url)
+    try:
+        backend.definir_ano_e_periodo("2025", "1")
+        for rodada in range(rodadas):
+            for depto, apenas_fcte in scraper.departamentos_da_busca():
+                if not backend.buscar_departamento(depto):
+                    raise RuntimeError(f"busca de {scraper.descrever_departamento(depto)} falhou")
+                if rodada == 0:
+                    scraper.mesclar_cronogramas(cron, scraper.parsear_tabela_turmas(backend.html_resultados(),
+                                                                                    apenas_fcte))
+        memoria = scraper.memoria_navegador_mb(backend.driver)
+    finally:
+        backend.fechar()
+    return cron, memoria
+
+def bench_navegador(args):
+    scraper = carregar_scraper()
+    paginas = paginas_por_departamento(args.turmas)
+    esperado = congelar(cron_esperado(scraper, paginas))
+    medida = "RSS" if importlib.util.find_spec("psutil") else "heap JS (instale psutil para o RSS)"
+    falhou = False
+    for enxuto in (False, True):
+        nome = "enxuto" if enxuto else "completo"
+        scraper.PERFIL_ENXUTO = enxuto
+        with ServidorSigaaStub(paginas, args.latencia, args.recursos, args.latencia_recursos) as stub:
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    cron, memoria = medir_navegador(scraper, paginas, stub.url, args.rodadas)
+            except Exception as e:
+                print(f"[ERRO] Perfil {nome}: {str(e).strip().splitlines()[0] if str(e).strip() else e!r}")
+                return 1
+        etapa = scraper.METRICAS.resumo()["etapas"]["carregar_pagina"]
+        memoria = f"{memoria:.0f} MB" if memoria is not None else "?"
+        print(f"{nome:9s} {etapa['chamadas']} páginas: média {etapa['total_s'] / etapa['chamadas'] * 1000:6.0f} ms, "
+              f"máx {etapa['max_s'] * 1000:6.0f} ms | memória ({medida}) {memoria} | "
+              f"{stub.recursos_servidos} recursos baixados")
+        if congelar(cron) != esperado:
+            print(f"[ERRO] O perfil {nome} não extraiu o mesmo cronograma.")
+            falhou = True
+    scraper.PERFIL_ENXUTO = True
+    return 1 if falhou else 0
+
+# === AGENDADOR: TAXA, AIMD E NOVAS TENTATIVAS SOB FALHAS ===
+def pico_por_segundo(instantes):
+    # Maior número de requisições dentro de qualquer janela de 1 s
+    instantes = sorted(instantes)
+    pico, inicio = 0, 0
+    for fim, t in enumerate(instantes):
+        while t - instantes[inicio] >= 1.0:
+            inicio += 1
+        pico = max(pico, fim - inicio + 1)
+    return pico
+
+def bench_agendador(args):
+    scraper = carregar_scraper()
+    scraper.ESPERA_NOVA_TENTATIVA = args.espera
+    paginas = paginas_por_departamento(args.turmas)
+    esperado = congelar(cron_esperado(scraper, paginas))
+    falhou = False
+    cenarios = [("sem falhas", 0.0, 0.0), ("com 503 e lentidão", args.falhas, args.lentidao)]
+    for nome, falhas, lentidao in cenarios:
+        agendador = scraper.AgendadorBuscas(args.concorrencia, args.taxa)
+        reportadas = 0
+        with ServidorSigaaStub(paginas, args.latencia, falhas=falhas, lentidao=lentidao,
+                               atraso_lento=args.atraso_lento) as stub:
+            t0 = time.perf_counter()
+            for rodada in range(args.rodadas):
+                try:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        cron = scraper.coletar_departamentos("2025", "1", "http", concorrencia=args.concorrencia,
+                                                             url=stub.url, agendador=agendador)
+                except RuntimeError:
+                    reportadas += 1  # falha explícita depois das novas tentativas: aceitável, mas contada
+                    continue
+                if congelar(cron) != esperado:
+                    print(f"[ERRO] {nome}: a rodada {rodada + 1} não reproduziu o cronograma esperado.")
+                    falhou = True
+            total = time.perf_counter() - t0
+        pico = pico_por_segundo(stub.instantes)
+        print(f"{nome:20s} {len(stub.instantes)} buscas ({stub.erros_injetados} com 503) em {total:.1f}s | "
+              f"pico {pico}/s (limite {args.taxa:g}/s + rajada {scraper.RAJADA_BUSCAS}) | "
+              f"{reportadas} coleta(s) com falha reportada")
+        print(f"{'':20s} {agendador.resumo()}")
+        if args.taxa and pico > args.taxa + scraper.RAJADA_BUSCAS:
+            print(f"[ERRO] {nome}: o limite de taxa foi ultrapassado.")
+            falhou = True
+
+    # Só lentidão, numa coleta de um semestre: como em executar_scraping, o agendador é novo e a
+    # referência de cada departamento vem do índice gravado pela coleta anterior (saudável)
+    caminho_indice = os.path.join(tempfile.mkdtemp(prefix="sigaa-bench-"), "departamentos.json")
+    for nome, lentidao in [("coleta anterior", 0.0), ("só lentidão", 1.0)]:
+        indice = scraper.IndiceDepartamentos(caminho_indice)
+        agendador = scraper.AgendadorBuscas(args.concorrencia, args.taxa, latencias=indice.latencias)
+        with ServidorSigaaStub(paginas, args.latencia, lentidao=lentidao, atraso_lento=args.atraso_lento) as stub:
+            with contextlib.redirect_stdout(io.StringIO()):
+                cron = scraper.coletar_departamentos("2025", "1", "http", concorrencia=args.concorrencia,
+                                                     url=stub.url, indice=indice, agendador=agendador)
+        print(f"{nome:20s} {agendador.resumo()}")
+        if congelar(cron) != esperado:
+            print(f"[ERRO] {nome}: a coleta não reproduziu o cronograma esperado.")
+            falhou = True
+    if args.concorrencia > 1 and agendador.concorrencia.minimo_atingido >= args.concorrencia:
+        print("[ERRO] A lentidão sem erros não reduziu a concorrência.")
+        falhou = True
+    return 1 if falhou else 0
+
+# === PARTIDA: DO INÍCIO DO PROCESSO À PRIMEIRA REQUISIÇÃO ===
+def medir_partida(script, limite=60.0):
+    # O stub segura o primeiro GET (latência alta) e o processo é encerrado
+    # assim que ele chega, antes de qualquer busca ou arquivo gravado.
+    with ServidorSigaaStub({}, latencia=limite) as stub:
+        env = dict(os.environ, SIGAA_URL=stub.url)
+        t0 = time.perf_counter()
+        processo = subprocess.Popen([sys.executable, script, "2025", "1", "--backend", "http", "--no-cache"],
+                                    env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            while stub.primeiro_acesso is None and processo.poll() is None:
+                if time.perf_counter() - t0 > limite:
+                    break
+                time.sleep(0.001)
+        finally:
+            processo.kill()
+            processo.wait()
+        return None if stub.primeiro_acesso is None else stub.primeiro_acesso - t0
+
+def bench_partida(args):
+    script = args.script or os.path.join(DIR_SCRIPTS, "sigaa-scrapper.py")
+    tempos = []
+    for _ in range(args.repeticoes):
+        tempo = medir_partida(script)
+        if tempo is None:
+            print("[ERRO] O script terminou sem fazer nenhuma requisição ao stub.")
+            return 1
+        tempos.append(tempo)
+    tempos.sort()
+    print(f"primeira requisição: mediana {tempos[len(tempos) // 2] * 1000:.0f} ms "
+          f"(mín {tempos[0] * 1000:.0f} ms, máx {tempos[-1] * 1000:.0f} ms, {len(tempos)} partidas)")
+
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-c", f"import importlib.util as u; s = u.spec_from_file_location('s', {script!r}); "
+                    "s.loader.exec_module(u.module_from_spec(s))"], check=True)
+    print(f"importação do módulo (com o interpretador): {(time.perf_counter() - t0) * 1000:.0f} ms")
+    return 0
+
+# === DOCX: PYTHON-DOCX x XML PRONTO ===
+HORAS_FIXTURE = ["08h00", "09h50", "10h00", "11h50", "12h00", "13h50", "14h00", "15h50",
+                 "16h00", "17h50", "18h00", "19h50"]
+
+def gerar_cronograma(scraper, num_salas, aulas_por_sala=20, semente=7):
+    rnd = random.Random(semente)
+    cron = scraper.novo_cronograma()
+    for s in range(num_salas):
+        sala = f"FCTE - SALA {s:03d}"
+        for a in range(aulas_por_sala):
+            i = rnd.randrange(0, len(HORAS_FIXTURE), 2)
+            fim = HORAS_FIXTURE[min(i + rnd.choice([1, 3]), len(HORAS_FIXTURE) - 1)]
+            cron[sala][rnd.choice(scraper.DIAS_ORDEM)].append(scraper.Aula(
+                scraper.horario_para_minutos(HORAS_FIXTURE[i]), scraper.horario_para_minutos(fim),
+                f"FGA{a:04d}", f"{a % 4 + 1:02d}", f"- TÓPICOS ESPECIAIS EM ENGENHARIA {a}",
+                rnd.choice(PROFESSORES_FIXTURE).title(),
+            ))
+    return cron
+
+def bench_docx(args):
+    scraper = carregar_scraper()
+    cron = gerar_cronograma(scraper, args.salas)
+    diretorio = tempfile.mkdtemp(prefix="sigaa-bench-")
+    # os renderizadores são comparados montando todas as salas; o cache de páginas é medido à parte
+    scraper.PAGINAS_EM_CACHE = False
+    tempos = {}
+    for nome, funcao in scraper.RENDERIZADORES.items():
+        caminho = os.path.join(diretorio, f"{nome}.docx")
+        with contextlib.redirect_stdout(io.StringIO()):
+            tempos[nome], _ = cronometrar(lambda: funcao(cron, caminho), args.repeticoes)
+        print(f"{nome:12s} {args.salas} salas: {tempos[nome] * 1000:8.1f} ms ({args.salas / tempos[nome]:.1f} salas/s)")
+    print(f"speedup xml: {tempos['python-docx'] / tempos['xml']:.1f}x")
+    print(f"speedup paralelo ({os.cpu_count()} núcleos): {tempos['xml'] / tempos['paralelo']:.1f}x sobre xml")
+
+    scraper.PAGINAS_EM_CACHE = True
+    scraper.CachePaginasSalas.__init__.__defaults__ = (os.path.join(diretorio, "paginas"),)
+    caminho = os.path.join(diretorio, "cache.docx")
+    alterado = scraper.novo_cronograma()
+    scraper.mesclar_cronogramas(alterado, cron)
+    sala = min(alterado)
+    alterado[sala][scraper.DIAS_ORDEM[0]].append(scraper.Aula(
+        scraper.horario_para_minutos("18h00"), scraper.horario_para_minutos("19h50"),
+        "FGA9999", "01", "- AULA ALTERADA", "Professor Alterado"))
+    with contextlib.redirect_stdout(io.StringIO()):
+        t_frio, _ = cronometrar(lambda: scraper.gerar_docx_xml(cron, caminho), 1)
+        t_igual, _ = cronometrar(lambda: scraper.gerar_docx_xml(cron, caminho), 1)
+        t_uma, _ = cronometrar(lambda: scraper.gerar_docx_xml(alterado, caminho), 1)
+    print(f"cache de páginas: primeira geração {t_frio * 1000:.1f} ms | 1 sala alterada {t_uma * 1000:.1f} ms | "
+          f"nada alterado {t_igual * 1000:.1f} ms")
+    return 0
+
+# === MICRO: FUNÇÕES QUENTES DA CONVERSÃO ===
+def cargas_micro(scraper, chamadas, semente=11):
+    rnd = random.Random(semente)
+    codigos = [c for h in HORARIOS_FIXTURE for c in h.split()] + ["2M12345", "35T3456", "246N1234", "7T6"]
+    disciplinas = [f"{rnd.choice(list(scraper.ABBR_DISCIPLINAS))} e {rnd.choice(list(scraper.ABBR_DISCIPLINAS))} {i}"
+                   for i in range(200)]
+    salas = list(scraper.MAPEAMENTO_SALAS_COMPLETAS) + ["I10", "S1 (LAB)", "LAB SS", "SALA 42"]
+    return {
+        "converter_codigo": (scraper.converter_codigo, [rnd.choice(codigos) for _ in range(chamadas)]),
+        "abbreviar_disciplina": (scraper.abbreviar_disciplina, [rnd.choice(disciplinas) for _ in range(chamadas)]),
+        "nome_sala_completo": (scraper.nome_sala_completo, [rnd.choice(salas) for _ in range(chamadas)]),
+        "horario_para_minutos": (scraper.horario_para_minutos, [rnd.choice(HORAS_FIXTURE) for _ in range(chamadas)]),
+    }
+
+@contextlib.contextmanager
+def sem_memoizacao(scraper):
+    """
+    Troca, no módulo do scraper, toda função com lru_cache pela original
+    (__wrapped__), para que as funções chamadas por dentro (converter_codigo
+    -> converter_codigo_minutos -> faixas_dos_blocos...) também rodem sem memo.
+    """
+    memoizadas = {nome: f for nome, f in vars(scraper).items()
+                  if callable(f) and hasattr(f, "cache_clear") and hasattr(f, "__wrapped__")}
+    try:
+        for nome, f in memoizadas.items():
+            setattr(scraper, nome, f.__wrapped__)
+        yield
+    finally:
+        for nome, f in memoizadas.items():
+            setattr(scraper, nome, f)
+
+def bench_micro(args):
+    scraper = carregar_scraper()
+    falhou = False
+    for nome, (funcao, entradas) in cargas_micro(scraper, args.chamadas).items():
+        # __wrapped__ é a função sem o lru_cache: custo de cada chamada "fria"
+        sem_memo = funcao.__wrapped__
+        with contextlib.redirect_stdout(io.StringIO()):
+            with sem_memoizacao(scraper):
+                t_frio, r_frio = cronometrar(lambda: [sem_memo(e) for e in entradas], args.repeticoes)
+            t_quente, r_quente = cronometrar(lambda: [funcao(e) for e in entradas], args.repeticoes)
+        if r_frio != r_quente:
+            print(f"[ERRO] {nome}: resultados diferentes com e sem memoização!")
+            falhou = True
+        print(f"{nome:22s} sem memo {t_frio / len(entradas) * 1e6:7.2f} µs/chamada | "
+              f"memoizado {t_quente / len(entradas) * 1e6:6.2f} µs/chamada ({t_frio / t_quente:.1f}x)")
+
+    html = gerar_html_listagem(args.turmas)
+    t_parse, _ = cronometrar(lambda: scraper.parsear_tabela_turmas(html, True), args.repeticoes)
+    print(f"parsear_tabela_turmas {args.turmas} turmas: {t_parse * 1000:.1f} ms")
+    return 1 if falhou else 0
+
+# === SUÍTE OFFLINE: FIXTURES GRAVADAS, ESCALAS E LIMITES DE REGRESSÃO ===
+DIR_BENCHMARK = os.path.join(os.path.dirname(os.path.dirname(DIR_SCRIPTS)), ".cache", "benchmark")
+DIR_FIXTURES = os.path.join(DIR_BENCHMARK, "fixtures")
+ARQUIVO_RESULTADOS = os.path.join(DIR_BENCHMARK, "resultados.jsonl")
+ETAPAS_SUITE = ["coleta", "extracao", "mescla", "docx"]
+
+def extrair_listagem(html):
+    # Só a tabela 'listagem' da página gravada; o resto (ViewState, menus) não interessa
+    import lxml.etree
+    import lxml.html
+    try:
+        tabelas = lxml.html.fromstring(html).xpath('//table[contains(concat(" ", normalize-space(@class), " "), " listagem ")]')
+    except (lxml.etree.ParserError, ValueError):
+        return ""
+    return lxml.etree.tostring(tabelas[0], encoding="unicode") if tabelas else ""
+
+def gravar_fixtures(scraper, ano, periodo, destino):
+    """
+    Copia do cache em disco do scraper (páginas reais de uma coleta anterior)
+    a listagem de cada departamento de departamentos_da_busca() para `destino`.
+    """
+    cache = scraper.CachePaginas()
+    os.makedirs(destino, exist_ok=True)
+    indice = []
+    for i, (depto, _) in enumerate(scraper.departamentos_da_busca()):
+        html = cache.obter(ano, periodo, depto)
+        if html is None:
+            raise RuntimeError(f"Departamento {scraper.descrever_departamento(depto)} não está no cache; "
+                               f"rode antes: python sigaa-scrapper.py {ano} {periodo} --refresh")
+        arquivo = f"{i:02d}.html.gz"
+        with gzip.open(os.path.join(destino, arquivo), "wt", encoding="utf-8") as f:
+            f.write(extrair_listagem(html))
+        indice.append({"departamento": str(depto), "arquivo": arquivo})
+    with open(os.path.join(destino, "departamentos.json"), "w", encoding="utf-8") as f:
+        json.dump({"ano": ano, "periodo": periodo, "departamentos": indice}, f, ensure_ascii=False, indent=2)
+    return len(indice)
+
+def ler_fixtures(diretorio):
+    with open(os.path.join(diretorio, "departamentos.json"), encoding="utf-8") as f:
+        indice = json.load(f)
+    listagens = []
+    for entrada in indice["departamentos"]:
+        with gzip.open(os.path.join(diretorio, entrada["arquivo"]), "rt", encoding="utf-8") as f:
+            listagens.append(f.read())
+    return listagens
+
+def escalar_listagem(listagem, fator):
+    """
+    Repete as linhas da tabela `fator` vezes. Nas cópias, o código de cada
+    disciplina ganha um prefixo (R1, R2...) para virarem turmas distintas.
+    """
+    if fator == 1 or not listagem:
+        return listagem
+    import lxml.etree
+    import lxml.html
+    tabela = lxml.html.fragment_fromstring(listagem)
+    corpo = tabela.find("tbody") if tabela.find("tbody") is not None else tabela
+    linhas = [tr for tr in corpo.findall("tr")]
+    for copia in range(1, fator):
+        for tr in linhas:
+            nova = copy.deepcopy(tr)
+            for titulo in nova.xpath('.//*[contains(@class, "tituloDisciplina")]'):
+                titulo.text = f"R{copia}{titulo.text or ''}"
+            corpo.append(nova)
+    return lxml.etree.tostring(tabela, encoding="unicode")
+
+def paginas_da_suite(listagens, base_turmas, escala):
+    # Chaves no formato do ServidorSigaaStub: valor de inputDepto na ordem de departamentos_da_busca()
+    if listagens is None:
+        return {chave: gerar_html_listagem(base_turmas * escala, semente=int(chave))
+                for chave in paginas_por_departamento(0)}
+    return {str(102 + i): escalar_listagem(listagem, escala) for i, listagem in enumerate(listagens)}
+
+def commit_atual():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=DIR_SCRIPTS,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        sujo = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=DIR_SCRIPTS,
+                              capture_output=True, text=True, check=True).stdout.strip()
+        return commit + ("+" if sujo else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+
+def medir_escala(scraper, paginas, repeticoes, diretorio):
+    deptos = scraper.departamentos_da_busca()
+    ordenadas = [(paginas[str(102 + i)], apenas_fcte) for i, (_, apenas_fcte) in enumerate(deptos)]
+    tempos = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ServidorSigaaStub(paginas) as stub:
+            tempos["coleta"], cron_coletado = cronometrar(
+                lambda: scraper.coletar_departamentos("2025", "1", "http", url=stub.url), repeticoes)
+        tempos["extracao"], crons = cronometrar(
+            lambda: [scraper.parsear_tabela_turmas(html, apenas_fcte) for html, apenas_fcte in ordenadas], repeticoes)
+
+        def mesclar():
+            cron = scraper.novo_cronograma()
+            for cron_ex in crons:
+                scraper.mesclar_cronogramas(cron, cron_ex)
+            return cron
+        tempos["mescla"], cron = cronometrar(mesclar, repeticoes)
+        tempos["docx"], _ = cronometrar(
+            lambda: scraper.gerar_docx_xml(cron, os.path.join(diretorio, "suite.docx")), repeticoes)
+    if congelar(cron_coletado) != congelar(cron):
+        raise RuntimeError("A coleta pelo servidor local não reproduziu o cronograma das páginas gravadas.")
+    turmas = sum(html.count("linhaPar") + html.count("linhaImpar") for html, _ in ordenadas)
+    aulas = sum(len(a) for dias in cron.values() for a in dias.values())
+    return tempos, {"turmas": turmas, "aulas": aulas, "salas": len(cron)}
+
+def ler_resultados(caminho):
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            return [json.loads(linha) for linha in f if linha.strip()]
+    except OSError:
+        return []
+
+def linha_de_base(anteriores, commit, escala, origem, base=None):
+    # Último resultado da mesma escala/origem de outro commit (ou do commit pedido em `base`)
+    for registro in reversed(anteriores):
+        if registro["escala"] != escala or registro["origem"] != origem:
+            continue
+        if (base and registro["commit"].rstrip("+") == base) or (not base and registro["commit"] != commit):
+            return registro
+    return None
+
+def comparar(atual, base, limite, tolerancia_ms):
+    regressoes = []
+    for etapa in ETAPAS_SUITE:
+        antes, agora = base["etapas"].get(etapa), atual["etapas"][etapa]
+        if antes is None:
+            continue
+        if agora > antes * (1 + limite) and (agora - antes) * 1000 > tolerancia_ms:
+            regressoes.append(f"{etapa} {antes * 1000:.1f} -> {agora * 1000:.1f} ms (+{(agora / antes - 1) * 100:.0f}%)")
+    return regressoes
+
+def bench_suite(args):
+    scraper = carregar_scraper()
+    scraper.PAGINAS_EM_CACHE = False
+    listagens = None
+    origem = "sintetica"
+    if args.fixtures and os.path.exists(os.path.join(args.fixtures, "departamentos.json")):
+        listagens = ler_fixtures(args.fixtures)
+        origem = "gravada"
+    elif args.fixtures != DIR_FIXTURES:
+        print(f"[ERRO] Fixtures não encontradas em {args.fixtures} (use: python benchmark.py gravar ANO PERIODO)")
+        return 1
+    print(f"Fixtures: {origem}" + (f" ({args.fixtures})" if listagens else f" ({args.turmas} turmas por departamento)"))
+
+    commit = commit_atual()
+    anteriores = ler_resultados(args.resultados)
+    diretorio = tempfile.mkdtemp(prefix="sigaa-suite-")
+    falhou = False
+    novos = []
+    for escala in [int(e) for e in args.escalas.split(",")]:
+        paginas = paginas_da_suite(listagens, args.turmas, escala)
+        tempos, tamanho = medir_escala(scraper, paginas, args.repeticoes, diretorio)
+        registro = {"commit": commit, "data": datetime.now().isoformat(timespec="seconds"), "origem": origem,
+                    "escala": escala, **tamanho, "etapas": {e: round(t, 5) for e, t in tempos.items()}}
+        novos.append(registro)
+        print(f"{escala:>4}x ({tamanho['turmas']} turmas, {tamanho['aulas']} aulas): " +
+              " | ".join(f"{e} {tempos[e] * 1000:8.1f} ms" for e in ETAPAS_SUITE))
+        base = linha_de_base(anteriores, commit, escala, origem, args.base)
+        if base is None:
+            continue
+        regressoes = comparar(registro, base, args.limite, args.tolerancia_ms)
+        for regressao in regressoes:
+            print(f"[REGRESSÃO] {escala}x em relação a {base['commit']}: {regressao}")
+        falhou = falhou or bool(regressoes)
+
+    if not args.nao_salvar:
+        os.makedirs(os.path.dirname(os.path.abspath(args.resultados)), exist_ok=True)
+        with open(args.resultados, "a", encoding="utf-8") as f:
+            for registro in novos:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        print(f"Resultados de {commit} gravados em {args.resultados}")
+    if falhou:
+        print(f"[ERRO] Alguma etapa ficou mais de {args.limite * 100:.0f}% mais lenta.")
+    return 1 if falhou else 0
+
+def bench_gravar(args):
+    scraper = carregar_scraper()
+    try:
+        total = gravar_fixtures(scraper, args.ano, args.periodo, args.destino)
+    except RuntimeError as e:
+        print(f"[ERRO] {e}")
+        return 1
+    print(f"{total} departamento(s) gravado(s) em {args.destino}")
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks offline do scraper do SIGAA")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("extracao", help="compara extração por snapshot e por WebDriver")
+    p.add_argument("--turmas", type=int, default=300)
+    p.add_argument("--repeticoes", type=int, default=3)
+    p.set_defaults(funcao=bench_extracao)
+
+    p = sub.add_parser("http", help="executa o backend HTTP contra um stub local do listar.jsf")
+    p.add_argument("--turmas", type=int, default=300)
+    p.add_argument("--concorrencia", type=int, default=3)
+    p.add_argument("--latencia", type=float, default=0.2, help="atraso simulado por resposta do stub (s)")
+    p.set_defaults(funcao=bench_http)
+
+    p = sub.add_parser("navegador", help="compara o Chrome com perfil completo e enxuto (requer Chrome)")
+    p.add_argument("--turmas", type=int, default=100)
+    p.add_argument("--rodadas", type=int, default=3, help="quantas vezes buscar cada departamento")
+    p.add_argument("--recursos", type=int, default=8, help="CSS, fontes e imagens referenciados por página")
+    p.add_argument("--latencia", type=float, default=0.05)
+    p.add_argument("--latencia-recursos", type=float, default=0.1)
+    p.set_defaults(funcao=bench_navegador)
+
+    p = sub.add_parser("agendador", help="coleta contra um stub que injeta 503 e lentidão, com limite de taxa e AIMD; "
+                       "e uma coleta de um semestre só com lentidão, contra a latência gravada no índice")
+    p.add_argument("--turmas", type=int, default=50)
+    p.add_argument("--rodadas", type=int, default=5, help="coletas seguidas com o mesmo agendador")
+    p.add_argument("--concorrencia", type=int, default=4)
+    p.add_argument("--taxa", type=float, default=8.0, help="buscas por segundo (0 = sem limite)")
+    p.add_argument("--falhas", type=float, default=0.15, help="fração de buscas respondidas com 503")
+    p.add_argument("--lentidao", type=float, default=0.1, help="fração de buscas com atraso extra")
+    p.add_argument("--atraso-lento", type=float, default=1.5)
+    p.add_argument("--latencia", type=float, default=0.05)
+    p.add_argument("--espera", type=float, default=0.2, help="espera antes da 2ª tentativa (s)")
+    p.set_defaults(funcao=bench_agendador)
+
+    p = sub.add_parser("partida", help="mede o tempo do início do processo até a primeira requisição ao SIGAA")
+    p.add_argument("--repeticoes", type=int, default=5)
+    p.add_argument("--script", help="outra versão do sigaa-scrapper.py, para comparar")
+    p.set_defaults(funcao=bench_partida)
+
+    p = sub.add_parser("docx", help="compara gerar_docx (python-docx) com o renderizador por XML")
+    p.add_argument("--salas", type=int, default=60)
+    p.add_argument("--repeticoes", type=int, default=1)
+    p.set_defaults(funcao=bench_docx)
+
+    p = sub.add_parser("micro", help="mede as tabelas de conversão e a memoização das funções quentes")
+    p.add_argument("--chamadas", type=int, default=20000)
+    p.add_argument("--turmas", type=int, default=300)
+    p.add_argument("--repeticoes", type=int, default=3)
+    p.set_defaults(funcao=bench_micro)
+
+    p = sub.add_parser("gravar", help="grava como fixtures as páginas reais que estão no cache do scraper")
+    p.add_argument("ano")
+    p.add_argument("periodo")
+    p.add_argument("--destino", default=DIR_FIXTURES)
+    p.set_defaults(funcao=bench_gravar)
+
+    p = sub.add_parser("suite", help="coleta, extração, mescla e DOCX contra um SIGAA local, em várias escalas")
+    p.add_argument("--fixtures", default=DIR_FIXTURES,
+                   help="diretório gravado com 'gravar' (sem ele, usa listagens sintéticas)")
+    p.add_argument("--turmas", type=int, default=100, help="turmas por departamento na escala 1x sintética")
+    p.add_argument("--escalas", default="1,10,100")
+    p.add_argument("--repeticoes", type=int, default=2)
+    p.add_argument("--resultados", default=ARQUIVO_RESULTADOS)
+    p.add_argument("--base", metavar="COMMIT", help="compara com este commit (padrão: o último outro commit medido)")
+    p.add_argument("--limite", type=float, default=0.25, help="fração de piora que reprova uma etapa (padrão: 0.25)")
+    p.add_argument("--tolerancia-ms", type=float, default=5.0, help="ignora pioras menores que isso (padrão: 5 ms)")
+    p.add_argument("--nao-salvar", action="store_true", help="só compara, sem gravar o resultado")
+    p.set_defaults(funcao=bench_suite)
+
+    args = parser.parse_args()
+    sys.exit(args.funcao(args))
+
+if __name__ == "__main__":
+    main()
@@ -1,51 +1,365 @@
-from selenium import webdriver
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, ElementClickInterceptedException
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import Select, WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-from docx import Document
-from docx.shared import Pt, Cm, Inches
-from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-from docx.enum.table import WD_TABLE_ALIGNMENT, WD_ALIGN_VERTICAL
-from docx.oxml.ns import qn
-from collections import defaultdict
-import re, time
-from datetime import datetime, timedelta
+import time
+INICIO_PROCESSO = time.perf_counter()  # referência do tempo até a primeira requisição ao SIGAA
+
+from xml.sax.saxutils import escape as xml_escape
+from collections import defaultdict, deque
+from bisect import bisect_left
+import re
+from datetime import datetime
+from functools import lru_cache
 import traceback
 import sys
 import io
 import os
-from bs4 import BeautifulSoup
+import lxml.etree
+from urllib.parse import urljoin
+import argparse
+import contextlib
+import csv
+import gzip
+import hashlib
+import json
+import threading
+import queue
+import random
+import shutil
+import subprocess
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# === IMPORTAÇÕES SOB DEMANDA ===
+# Selenium, python-docx e requests pesam na partida e nem todo modo usa os
+# três (o backend http não abre navegador, as consultas não geram DOCX):
+# cada um é importado na primeira etapa que precisa dele.
+def carregar_selenium():
+    global webdriver, By, Select, WebDriverWait, EC, Service, Options
+    global TimeoutException, NoSuchElementException, ElementClickInterceptedException
+    global StaleElementReferenceException, WebDriverException
+    if "webdriver" in globals():
+        return
+    from selenium import webdriver
+    from selenium.common.exceptions import (TimeoutException, NoSuchElementException,
+                                            ElementClickInterceptedException, StaleElementReferenceException,
+                                            WebDriverException)
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support.ui import Select, WebDriverWait
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+
+def carregar_docx():
+    global Document, Pt, Cm, Inches, WD_PARAGRAPH_ALIGNMENT, WD_TABLE_ALIGNMENT, WD_ALIGN_VERTICAL
+    global qn, nsdecls, parse_xml
+    if "Document" in globals():
+        return
+    from docx import Document
+    from docx.shared import Pt, Cm, Inches
+    from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+    from docx.enum.table import WD_TABLE_ALIGNMENT, WD_ALIGN_VERTICAL
+    from docx.oxml.ns import qn, nsdecls
+    from docx.oxml import parse_xml
+
+def carregar_requests():
+    global requests, HTTPAdapter, Retry
+    if "requests" in globals():
+        return
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+def configurar_saida_utf8():
+    # Saída em UTF-8 e linha a linha, para a rota /api/executar ler o log ao vivo
+    for fluxo in (sys.stdin, sys.stdout, sys.stderr):
+        if hasattr(fluxo, "reconfigure"):
+            fluxo.reconfigure(encoding="utf-8")
+    for fluxo in (sys.stdout, sys.stderr):
+        if hasattr(fluxo, "reconfigure"):
+            fluxo.reconfigure(line_buffering=True)
+
+URL_TURMAS = os.environ.get("SIGAA_URL", "https://sigaa.unb.br/sigaa/public/turmas/listar.jsf?aba=p-ensino")
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+# === MÉTRICAS DA EXECUÇÃO ===
+class Metricas:
+    """
+    Cronômetros e contadores por etapa de uma execução, seguros entre threads.
+    `etapa(nome)` mede um trecho, `contar(nome)` soma num contador e
+    `medir(nome, valor)` guarda o maior valor visto; resumo() devolve tudo
+    pronto para JSON. Com `progresso` ligado, cada etapa
+    concluída também sai como uma linha "[PROGRESSO] {json}", que a rota
+    /api/executar repassa ao navegador como evento.
+    """
 
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
-sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
-sys.stdin.reconfigure(encoding='utf-8')
-sys.stdout.reconfigure(encoding='utf-8', line_buffering=True)
-sys.stderr.reconfigure(encoding='utf-8', line_buffering=True)
-sys.stdout = os.fdopen(sys.stdout.fileno(), 'w', buffering=1)
-sys.stderr = os.fdopen(sys.stderr.fileno(), 'w', buffering=1)
+    def __init__(self):
+        self.trava = threading.Lock()
+        self.progresso = False
+        self.ate_primeira_requisicao = None
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self.trava:
+            self.inicio = time.perf_counter()
+            self.etapas = {}
+            self.contadores = defaultdict(int)
+            self.maximos = {}
+
+    @contextlib.contextmanager
+    def etapa(self, nome, **detalhes):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            duracao = time.perf_counter() - inicio
+            with self.trava:
+                etapa = self.etapas.setdefault(nome, {"chamadas": 0, "total_s": 0.0, "max_s": 0.0})
+                etapa["chamadas"] += 1
+                etapa["total_s"] += duracao
+                etapa["max_s"] = max(etapa["max_s"], duracao)
+            self.emitir(nome, duracao_s=round(duracao, 4), **detalhes)
+
+    def contar(self, nome, n=1):
+        with self.trava:
+            self.contadores[nome] += n
+
+    def medir(self, nome, valor):
+        if valor is None:
+            return
+        with self.trava:
+            self.maximos[nome] = round(max(self.maximos.get(nome, valor), valor), 1)
+
+    def primeira_requisicao(self):
+        # Tempo da partida do processo até a primeira requisição ao SIGAA; só conta uma vez
+        with self.trava:
+            if self.ate_primeira_requisicao is not None:
+                return
+            self.ate_primeira_requisicao = time.perf_counter() - INICIO_PROCESSO
+        print(f"Primeira requisição ao SIGAA {self.ate_primeira_requisicao:.2f}s após o início do script.")
+        self.emitir("primeira_requisicao", duracao_s=round(self.ate_primeira_requisicao, 4))
+
+    def emitir(self, etapa, **dados):
+        if self.progresso:
+            print(f"[PROGRESSO] {json.dumps({'etapa': etapa, **dados}, ensure_ascii=False)}")
+
+    def resumo(self):
+        with self.trava:
+            return {
+                "total_s": round(time.perf_counter() - self.inicio, 4),
+                "etapas": {nome: {"chamadas": e["chamadas"], "total_s": round(e["total_s"], 4),
+                                  "max_s": round(e["max_s"], 4)}
+                           for nome, e in self.etapas.items()},
+                "contadores": dict(self.contadores),
+                "maximos": dict(self.maximos),
+                "primeira_requisicao_s": (None if self.ate_primeira_requisicao is None
+                                          else round(self.ate_primeira_requisicao, 4)),
+            }
+
+    def imprimir_resumo(self):
+        resumo = self.resumo()
+        etapas = ", ".join(f"{nome} {e['total_s']:.2f}s" for nome, e in
+                           sorted(resumo["etapas"].items(), key=lambda item: -item[1]["total_s"]))
+        print(f"Tempo total {resumo['total_s']:.2f}s; por etapa: {etapas or 'nenhuma'}")
+        print(f"[METRICAS] {json.dumps(resumo, ensure_ascii=False)}")
+        return resumo
+
+METRICAS = Metricas()
 
 # === CONFIGURAÇÃO DO DRIVER ===
-def configurar_driver():
+def contar_chamadas_webdriver(driver):
+    # Todo comando (find_element, .text, clique...) passa por driver.execute
+    executar = driver.execute
+
+    def executar_contando(comando, parametros=None):
+        METRICAS.contar("chamadas_webdriver")
+        return executar(comando, parametros)
+    driver.execute = executar_contando
+
+ARQUIVO_CHROMEDRIVER = os.path.join(BASE_DIR, ".cache", "chromedriver.json")
+_trava_chromedriver = threading.Lock()
+
+def resolver_chromedriver(renovar=False):
+    """
+    Caminho do chromedriver sem ir à rede a cada execução: usa a variável
+    CHROMEDRIVER, se definida, ou o caminho fixado em .cache/chromedriver.json
+    pela primeira resolução do webdriver_manager. `renovar` ignora o fixado
+    (p.ex. quando o Chrome foi atualizado e o driver antigo não abre mais).
+    """
+    if os.environ.get("CHROMEDRIVER"):
+        return os.environ["CHROMEDRIVER"]
+    with _trava_chromedriver:
+        if not renovar:
+            try:
+                with open(ARQUIVO_CHROMEDRIVER, encoding="utf-8") as f:
+                    caminho = json.load(f)["caminho"]
+                if os.access(caminho, os.X_OK):
+                    return caminho
+            except (OSError, ValueError, KeyError):
+                pass
+        print("Resolvendo a versão do chromedriver (requer internet)...")
+        with METRICAS.etapa("resolver_chromedriver"):
+            from webdriver_manager.chrome import ChromeDriverManager
+            caminho = ChromeDriverManager().install()
+        try:
+            os.makedirs(os.path.dirname(ARQUIVO_CHROMEDRIVER), exist_ok=True)
+            with open(ARQUIVO_CHROMEDRIVER, "w", encoding="utf-8") as f:
+                json.dump({"caminho": caminho, "resolvido_em": time.time()}, f)
+        except OSError as e:
+            print(f"[AVISO] Não foi possível fixar o chromedriver em cache: {e}")
+        return caminho
+
+# O scraper só lê o formulário e a tabela 'listagem': imagens, estilos,
+# fontes e rastreadores são baixados e renderizados à toa.
+PERFIL_ENXUTO = True  # --navegador-completo desliga
+RECURSOS_BLOQUEADOS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.ico", "*.webp", "*.bmp",
+    "*.css", "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*hotjar.com*",
+]
+ARGUMENTOS_ENXUTOS = [
+    "--blink-settings=imagesEnabled=false",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-component-update",
+    "--disable-features=Translate,MediaRouter,OptimizationHints",
+    "--mute-audio",
+    "--no-first-run",
+    "--renderer-process-limit=2",
+    "--window-size=1280,800",
+]
+
+def bloquear_recursos(driver):
+    # Bloqueio pelo DevTools: vale para todas as navegações desta aba
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": RECURSOS_BLOQUEADOS})
+    except (WebDriverException, AttributeError) as e:
+        print(f"[AVISO] Não foi possível bloquear imagens/CSS/fontes no navegador: {e}")
+
+def configurar_driver(url=URL_TURMAS, enxuto=None):
+    """
+    Abre o Chrome headless no `url`. Com o perfil enxuto (padrão:
+    PERFIL_ENXUTO), imagens, CSS, fontes e rastreadores são bloqueados e o
+    driver.get volta assim que o DOM está pronto (page_load_strategy
+    "eager"), sem esperar o resto da página.
+    """
     print("Configurando o driver do Chrome...")
+    enxuto = PERFIL_ENXUTO if enxuto is None else enxuto
     try:
-        options = Options()
-        options.add_argument("--headless")
-        options.add_argument("--no-sandbox")
-        options.add_argument("--disable-dev-shm-usage")
-        options.add_argument("--disable-gpu")
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=options)
-        driver.get("https://sigaa.unb.br/sigaa/public/turmas/listar.jsf?aba=p-ensino")
-        return driver, WebDriverWait(driver, 10)
+        with METRICAS.etapa("configurar_driver"):
+            carregar_selenium()
+            options = Options()
+            options.add_argument("--headless")
+            options.add_argument("--no-sandbox")
+            options.add_argument("--disable-dev-shm-usage")
+            options.add_argument("--disable-gpu")
+            if enxuto:
+                options.page_load_strategy = "eager"
+                for argumento in ARGUMENTOS_ENXUTOS:
+                    options.add_argument(argumento)
+                options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+            try:
+                driver = webdriver.Chrome(service=Service(resolver_chromedriver()), options=options)
+            except WebDriverException as e:
+                if os.environ.get("CHROMEDRIVER"):
+                    raise
+                print(f"[AVISO] O chromedriver em cache não abriu o Chrome ({e.msg}); resolvendo de novo...")
+                driver = webdriver.Chrome(service=Service(resolver_chromedriver(renovar=True)), options=options)
+            contar_chamadas_webdriver(driver)
+            if enxuto:
+                bloquear_recursos(driver)
+            METRICAS.primeira_requisicao()
+            with METRICAS.etapa("carregar_pagina"):
+                driver.get(url)
+        METRICAS.contar("navegadores_abertos")
+        return driver, EsperaAdaptativa(driver)
     except Exception as e:
         print(f"ERRO ao configurar o driver: {str(e)}")
         print(traceback.format_exc())
         raise
 
+# === ESPERA ADAPTATIVA ===
+class EsperaAdaptativa:
+    """
+    Substitui o WebDriverWait(driver, 10) fixo: cada espera é nomeada por
+    etapa, sua duração é registrada e o timeout da etapa passa a ser um
+    múltiplo do p95 observado (limitado entre `minimo` e `maximo`). Uma espera
+    que estoura o timeout também é registrada e dobra o timeout da etapa até a
+    próxima espera bem-sucedida, para o SIGAA que ficou lento não falhar em
+    todas as tentativas com o limite aprendido quando ele estava rápido.
+    """
+
+    def __init__(self, driver, timeout_inicial=10, minimo=5, maximo=60, fator=3.0, janela=20):
+        self.driver = driver
+        self.timeout_inicial = timeout_inicial
+        self.minimo = minimo
+        self.maximo = maximo
+        self.fator = fator
+        self.latencias = defaultdict(lambda: deque(maxlen=janela))
+        self.estouros = {}
+
+    def timeout(self, etapa):
+        amostras = sorted(self.latencias[etapa])
+        if len(amostras) < 3:
+            limite = self.timeout_inicial
+        else:
+            p95 = amostras[int(0.95 * (len(amostras) - 1))]
+            limite = max(p95 * self.fator, self.minimo)
+        return min(max(limite, self.estouros.get(etapa, 0)), self.maximo)
+
+    def ate(self, etapa, condicao):
+        limite = self.timeout(etapa)
+        inicio = time.perf_counter()
+        try:
+            resultado = WebDriverWait(self.driver, limite, poll_frequency=0.1).until(condicao)
+        except TimeoutException:
+            self.latencias[etapa].append(time.perf_counter() - inicio)
+            self.estouros[etapa] = min(limite * 2, self.maximo)
+            METRICAS.contar("esperas_estouradas")
+            raise
+        self.latencias[etapa].append(time.perf_counter() - inicio)
+        self.estouros.pop(etapa, None)
+        return resultado
+
+    def until(self, condicao):
+        # Compatível com WebDriverWait.until para as esperas por elemento
+        return self.ate("elemento", condicao)
+
+    def resumo(self):
+        partes = []
+        for etapa, amostras in sorted(self.latencias.items()):
+            if amostras:
+                media = sum(amostras) / len(amostras)
+                partes.append(f"{etapa}: {len(amostras)}x média {media:.2f}s, timeout atual {self.timeout(etapa):.1f}s")
+        return "; ".join(partes)
+
+def _resultados_prontos(tabela_anterior, botao):
+    """
+    Condição de espera após clicar em Buscar: a tabela 'listagem' anterior (ou,
+    sem ela, o próprio botão) precisa ter sido substituída e o DOM da nova
+    página precisa estar pronto (imagens e estilos não importam).
+    """
+    referencia = tabela_anterior if tabela_anterior is not None else botao
+
+    def condicao(driver):
+        try:
+            referencia.is_enabled()
+            return False
+        except StaleElementReferenceException:
+            pass
+        if driver.execute_script("return document.readyState") == "loading":
+            return False
+        return bool(driver.find_elements(By.CLASS_NAME, "listagem") or
+                    driver.find_elements(By.ID, "formTurma:inputDepto"))
+    return condicao
+
+def clicar_buscar_e_aguardar(wait):
+    botao = wait.until(EC.element_to_be_clickable((By.XPATH, "//input[@value='Buscar']")))
+    anteriores = wait.driver.find_elements(By.CLASS_NAME, "listagem")
+    with METRICAS.etapa("carregar_pagina"):
+        botao.click()
+        wait.ate("busca", _resultados_prontos(anteriores[0] if anteriores else None, botao))
+
 # === FECHAR O MODAL DE COOKIES ===
 def fechar_modal_cookies(wait):
     print("Verificando modal de cookies...")
@@ -60,36 +374,52 @@ def fechar_modal_cookies(wait):
 def selecionar_departamento_por_indice(wait, index):
     print("[1/6] Processando departamento:  CAMPUS UNB GAMA: FACULDADE DE CIÊNCIAS E TECNOLOGIAS EM ENGENHARIA - BRASÍLIA")
     try:
-        Select(wait.until(EC.presence_of_element_located((By.ID, "formTurma:inputNivel")))).select_by_index(2)
-        Select(wait.until(EC.presence_of_element_located((By.ID, "formTurma:inputDepto")))).select_by_index(index)
-        wait.until(EC.element_to_be_clickable((By.XPATH, "//input[@value='Buscar']"))).click()
-        time.sleep(1)
+        with METRICAS.etapa("selecionar_departamento_por_indice", departamento=index):
+            Select(wait.until(EC.presence_of_element_located((By.ID, "formTurma:inputNivel")))).select_by_index(2)
+            Select(wait.until(EC.presence_of_element_located((By.ID, "formTurma:inputDepto")))).select_by_index(index)
+            clicar_buscar_e_aguardar(wait)
+        return True
     except (TimeoutException, NoSuchElementException, ElementClickInterceptedException, IndexError) as e:
         print(f"[ERRO] Falha ao selecionar departamento por índice {index}: {e}")
     except Exception as e:
         print(f"[ERRO INESPERADO] {e}")
+    return False
+
+# Opções (valor, texto) do select de departamentos numa só chamada ao navegador
+JS_OPCOES_DEPARTAMENTOS = ("return Array.from(document.getElementById('formTurma:inputDepto').options, "
+                           "o => [o.value, o.text.trim()]);")
+
+def opcoes_departamentos(driver):
+    return [tuple(opcao) for opcao in driver.execute_script(JS_OPCOES_DEPARTAMENTOS)]
 
 def selecionar_departamento_por_nome(wait, nome):
     try:
-        Select(wait.until(EC.presence_of_element_located((By.ID, "formTurma:inputNivel")))).select_by_index(2)
-        select_depto = Select(wait.until(EC.presence_of_element_located((By.ID, "formTurma:inputDepto"))))
-        for option in select_depto.options:
-            if nome.lower() in option.text.lower():
-                select_depto.select_by_visible_text(option.text)
-                break
-        else:
-            raise ValueError(f"Departamento com nome '{nome}' não encontrado.")
-        
-        wait.until(EC.element_to_be_clickable((By.XPATH, "//input[@value='Buscar']"))).click()
-        time.sleep(1)
+        with METRICAS.etapa("selecionar_departamento_por_nome", departamento=nome):
+            Select(wait.until(EC.presence_of_element_located((By.ID, "formTurma:inputNivel")))).select_by_index(2)
+            select_depto = Select(wait.until(EC.presence_of_element_located((By.ID, "formTurma:inputDepto"))))
+            # Lê todos os textos numa só chamada; o nome exato tem prioridade sobre o que o contém
+            textos = [texto for _, texto in opcoes_departamentos(wait.driver)]
+            indice = textos.index(nome) if nome in textos else next(
+                (i for i, texto in enumerate(textos) if nome.lower() in texto.lower()), None)
+            if indice is None:
+                raise ValueError(f"Departamento com nome '{nome}' não encontrado.")
+            select_depto.select_by_index(indice)
+
+            clicar_buscar_e_aguardar(wait)
+        return True
     except (TimeoutException, NoSuchElementException, ElementClickInterceptedException) as e:
         print(f"[ERRO] Falha ao selecionar departamento por nome '{nome}': {e}")
     except ValueError as e:
         print(f"[ERRO] {e}")
     except Exception as e:
         print(f"[ERRO INESPERADO] {e}")
+    return False
 
 def definir_ano_e_periodo(driver, wait, ano: str, periodo: str):
+    """
+    Preenche ano e período no formulário e confere os valores que ficaram.
+    Retorna False se não conseguiu: buscar assim traria o semestre padrão.
+    """
     try:
         print(f"Definindo parâmetros: Ano {ano}, Período {periodo}...")
 
@@ -100,9 +430,17 @@ def definir_ano_e_periodo(driver, wait, ano: str, periodo: str):
         periodo_select = Select(wait.until(EC.presence_of_element_located((By.ID, "formTurma:inputPeriodo"))))
         periodo_select.select_by_value(periodo)
 
+        definidos = (ano_input.get_attribute("value"), periodo_select.first_selected_option.get_attribute("value"))
+        if definidos != (str(ano), str(periodo)):
+            print(f"[ERRO] O formulário ficou com ano/período {definidos[0]}.{definidos[1]} "
+                  f"em vez de {ano}.{periodo}.")
+            return False
+
         print("Ano e período configurados corretamente.")
+        return True
     except Exception as e:
         print(f"[ERRO] Falha ao definir ano/período: {e}")
+    return False
 
 # === LÓGICA DE CÓDIGOS DE HORÁRIO SUPORTANDO MULTI-TURNOS ===
 HORARIOS_BASE = {
@@ -136,40 +474,56 @@ def agrupar_consecutivos_numeros(nums):
         print(f"[ERRO INESPERADO] Erro desconhecido ao agrupar: {e}")
         return []
 
-def converter_codigo(codigo):
+PADRAO_CODIGO = re.compile(r"(\d+)([MTN]+)(\d+)")
+DIAS_SEMANA = {'2': 'Segunda', '3': 'Terça', '4': 'Quarta', '5': 'Quinta', '6': 'Sexta', '7': 'Sábado'}
+
+# (turno, bloco) -> minuto de início, p.ex. ('T', 2) -> 840 (14h00)
+MINUTOS_BLOCO = {
+    (t, b): int(h[:2]) * 60 + int(h[3:])
+    for t, blocos in HORARIOS_BASE.items()
+    for b, h in blocos.items()
+}
+
+def formatar_minutos(minutos):
+    return f"{minutos // 60:02d}h{minutos % 60:02d}"
+
+@lru_cache(maxsize=None)
+def blocos_dos_turnos(turnos_str):
+    # Sequência contínua de (turno, bloco) dos turnos do código, p.ex. "MT" -> M1..M5, T1..T6
+    flatten = []
+    for t in turnos_str:
+        if t in HORARIOS_BASE:
+            for b in sorted(HORARIOS_BASE[t].keys()):
+                flatten.append((t, b))
+    return tuple(flatten)
+
+@lru_cache(maxsize=None)
+def faixas_dos_blocos(turnos_str, blocos_str):
+    """
+    Faixas (início, fim) em minutos de uma combinação turnos+blocos. Memoizada:
+    a oferta de um semestre usa poucas dezenas de combinações distintas.
+    """
+    flatten = blocos_dos_turnos(turnos_str)
+    indices = [int(ch) - 1 for ch in blocos_str if 0 <= int(ch) - 1 < len(flatten)]
+    faixas = []
+    for g in agrupar_consecutivos_numeros(indices):
+        inicio = MINUTOS_BLOCO[flatten[g[0]]]
+        faixas.append((inicio, inicio + (len(g) - 1) * 60 + 50))
+    return tuple(faixas)
+
+@lru_cache(maxsize=4096)
+def converter_codigo_minutos(codigo):
+    """
+    Como converter_codigo, mas com as faixas em minutos: ((dias), ((início, fim), ...)).
+    """
     try:
-        pattern = re.compile(r"(\d+)([MTN]+)(\d+)")
-        m = pattern.match(codigo.strip())
+        m = PADRAO_CODIGO.match(codigo.strip())
         if not m:
             return None
 
         dias_str, turnos_str, blocos_str = m.groups()
-        dias_semana = {'2': 'Segunda', '3': 'Terça', '4': 'Quarta', '5': 'Quinta', '6': 'Sexta', '7': 'Sábado'}
-        dias = [dias_semana[d] for d in dias_str if d in dias_semana]
-
-        flatten = []
-        for t in turnos_str:
-            if t in HORARIOS_BASE:
-                for b in sorted(HORARIOS_BASE[t].keys()):
-                    flatten.append((t, b))
-
-        indices = [int(ch) - 1 for ch in blocos_str if 0 <= int(ch) - 1 < len(flatten)]
-
-        if not indices:
-            return dias, []
-
-        grupos = agrupar_consecutivos_numeros(indices)
-
-        periodos = []
-        for g in grupos:
-            start_idx = g[0]
-            dur_min = (len(g) - 1) * 60 + 50
-            t0, b0 = flatten[start_idx]
-            inicio = datetime.strptime(HORARIOS_BASE[t0][b0], "%H:%M")
-            fim = inicio + timedelta(minutes=dur_min)
-            periodos.append(f"{inicio.strftime('%Hh%M')}–{fim.strftime('%Hh%M')}")
-
-        return dias, periodos
+        dias = tuple(DIAS_SEMANA[d] for d in dias_str if d in DIAS_SEMANA)
+        return dias, faixas_dos_blocos(turnos_str, blocos_str)
 
     except (KeyError, ValueError, IndexError) as e:
         print(f"[ERRO] Código de horário malformado ou inválido: '{codigo}'. Detalhes: {e}")
@@ -178,17 +532,195 @@ def converter_codigo(codigo):
         print(f"[ERRO INESPERADO] Falha ao processar código '{codigo}': {e}")
         return None
 
+@lru_cache(maxsize=4096)
+def converter_codigo(codigo):
+    convertido = converter_codigo_minutos(codigo)
+    if not convertido:
+        return None
+    dias, faixas = convertido
+    return dias, tuple(f"{formatar_minutos(i)}–{formatar_minutos(f)}" for i, f in faixas)
+
 # === EXTRAÇÃO DE DADOS ===
-def extrair_dados(driver, apenas_fcte=False):
+DIAS_ORDEM = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado']
+INDICE_DIA = {dia: i for i, dia in enumerate(DIAS_ORDEM)}
+
+def novo_cronograma():
+    return defaultdict(lambda: defaultdict(list))
+
+class Aula:
+    """
+    Uma aula do cronograma (sala e dia são as chaves do cronograma). Início e
+    fim ficam em minutos desde 00h00 e os textos são internados, então a mesma
+    disciplina ou docente em várias salas aponta para uma única string. O
+    "08h00" só é formatado na hora de renderizar ou exportar.
+    """
+    __slots__ = ("inicio", "fim", "codigo", "turma", "disciplina", "docente")
+
+    def __init__(self, inicio, fim, codigo, turma, disciplina, docente):
+        self.inicio = inicio
+        self.fim = fim
+        self.codigo = sys.intern(codigo)
+        self.turma = sys.intern(turma)
+        self.disciplina = sys.intern(disciplina)
+        self.docente = sys.intern(docente)
+
+    @classmethod
+    def de_dict(cls, d):
+        # Formato serializado: {'inicio': "08h00", 'fim': "09h50", 'codigo': ..., ...}
+        return cls(horario_para_minutos(d['inicio']), horario_para_minutos(d['fim']),
+                   d['codigo'], d['turma'], d['disciplina'], d['docente'])
+
+    def como_dict(self):
+        return {
+            'inicio': formatar_minutos(self.inicio),
+            'fim': formatar_minutos(self.fim),
+            'codigo': self.codigo,
+            'turma': self.turma,
+            'disciplina': self.disciplina,
+            'docente': self.docente,
+        }
+
+    def mesma_turma(self, outra):
+        return (self.codigo == outra.codigo and self.turma == outra.turma and
+                self.disciplina == outra.disciplina and self.docente == outra.docente)
+
+    def copia(self):
+        return Aula(self.inicio, self.fim, self.codigo, self.turma, self.disciplina, self.docente)
+
+    def _campos(self):
+        return (self.inicio, self.fim, self.codigo, self.turma, self.disciplina, self.docente)
+
+    def __eq__(self, outra):
+        if not isinstance(outra, Aula):
+            return NotImplemented
+        return self._campos() == outra._campos()
+
+    __hash__ = None  # mutável: adicionar_evento estende o fim
+
+    def __repr__(self):
+        return (f"Aula({formatar_minutos(self.inicio)}–{formatar_minutos(self.fim)}, "
+                f"{self.codigo}, turma {self.turma})")
+
+def processar_turma(cron, codigo_disciplina, nome_disciplina, turma, lista_professores, texto_horario, raw_sala):
+    """
+    Converte uma linha de turma já lida (textos simples) em eventos e os
+    acrescenta ao cronograma, mesclando horários contínuos da mesma turma.
+    Devolve os eventos gerados, como (sala, dia, evento), antes da mesclagem.
+    """
+    eventos = eventos_da_turma(codigo_disciplina, nome_disciplina, turma, lista_professores, texto_horario, raw_sala)
+    for sala, dia, aula in eventos:
+        adicionar_evento(cron, sala, dia, aula.copia())
+    return eventos
+
+def eventos_da_turma(codigo_disciplina, nome_disciplina, turma, lista_professores, texto_horario, raw_sala):
+    # Uma linha de turma -> [(sala, dia, Aula)], na ordem dia/horário, sem mesclar
+    professores_str = ", ".join(lista_professores)
+    cods = re.findall(r'\d+[MTN]+\d+', texto_horario)
+
+    clean = re.sub(r'^(?:FCTE|FGA)\s*-\s*', '', raw_sala)
+    clean = re.sub(r'\s*\([^)]*\)', '', clean).strip()
+    salas = [clean] if clean == 'NIT/LDS' else [s.strip() for s in clean.split('/')]
+
+    eventos = []
+    for cod_idx, cod in enumerate(cods):
+        convertido = converter_codigo_minutos(cod)
+        if not convertido:
+            continue
+        dias_list, faixas = convertido
+        for dia in dias_list:
+            for inicio, fim in faixas:
+                eventos.append((dia, inicio, fim, cod_idx))
+
+    eventos_ordenados = sorted(eventos, key=lambda x: (INDICE_DIA.get(x[0], 99), x[1]))
+
+    num_eventos = len(eventos_ordenados)
+    dias_unicos = sorted(set(e[0] for e in eventos_ordenados), key=INDICE_DIA.__getitem__)
+    num_dias = len(dias_unicos)
+
+    # Verificar se a disciplina é inconsistente
+    if not (
+        len(salas) == len(cods) or
+        len(salas) == num_dias or
+        len(salas) == num_eventos or
+        len(salas) == 1
+    ):
+        print(f"[DISCIPLINA_INCONSISTENTE] Código: {codigo_disciplina}, Turma: {turma}, Nome: {nome_disciplina}, Docente: {professores_str}, Códigos de horário: {cods}, Salas detectadas: {salas}, Dias únicos: {dias_unicos}")
+        print("[DISCIPLINA_INCONSISTENTE] Nenhuma das combinações esperadas é válida, significa que o número de salas não corresponde à quantidade de códigos de horários, dias ou eventos da disciplina, e também não é uma única sala.")
+        print("[DISCIPLINA_INCONSISTENTE] Favor verificar turma e adicionar ao documento manualmente!")
+        METRICAS.contar("turmas_inconsistentes")
+        return []
+
+    eventos_gerados = []
+    for idx, evento in enumerate(eventos_ordenados):
+        dia, inicio, fim, cod_idx = evento
+
+        if len(salas) == len(cods):
+            sala = salas[cod_idx]
+        elif len(salas) == num_dias:
+            sala_idx = dias_unicos.index(dia)
+            sala = salas[sala_idx]
+        elif len(salas) == num_eventos:
+            sala = salas[idx]
+        elif len(salas) == 1:
+            sala = salas[0]
+
+        sala_completa = sys.intern(f"FCTE - {sala.strip()}")
+        eventos_gerados.append((sala_completa, dia,
+                                Aula(inicio, fim, codigo_disciplina, turma, nome_disciplina, professores_str)))
+    return eventos_gerados
+
+def adicionar_evento(cron, sala_completa, dia, evento_novo):
+    anexar_mesclando(cron[sala_completa][dia], evento_novo)
+
+def anexar_mesclando(eventos_dia, evento_novo):
+    # Verifica se existe evento anterior contínuo e idêntico (exceto horários)
+    if eventos_dia:
+        ultimo = eventos_dia[-1]
+        if (
+            ultimo.mesma_turma(evento_novo) and
+            ultimo.fim in (evento_novo.inicio - 10, evento_novo.inicio)
+        ):
+            # Mesclar horários: estende o fim
+            ultimo.fim = evento_novo.fim
+        else:
+            eventos_dia.append(evento_novo)
+    else:
+        eventos_dia.append(evento_novo)
+
+def limpar_professores(linhas):
+    return [
+        re.sub(r'\s*\(\d+h\)', '', linha).strip().lower().title()
+        for linha in linhas if linha.strip()
+    ]
+
+def extrair_dados(driver, apenas_fcte=False, modo="snapshot"):
+    """
+    Lê a tabela 'listagem' da página atual.
+
+    modo="snapshot" captura driver.page_source uma única vez e analisa o HTML
+    offline; modo="webdriver" percorre linhas e células pelo WebDriver (uma
+    chamada remota por acesso, bem mais lento em departamentos grandes).
+    """
+    if modo == "snapshot":
+        print("Extraindo dados da tabela...")
+        try:
+            html = driver.page_source
+        except Exception as e:
+            print(f"[ERRO CRÍTICO] Falha ao extrair dados da tabela: {e}")
+            return novo_cronograma()
+        return parsear_tabela_turmas(html, apenas_fcte)
+    return extrair_dados_webdriver(driver, apenas_fcte)
+
+def extrair_dados_webdriver(driver, apenas_fcte=False):
+    from bs4 import BeautifulSoup
     print("Extraindo dados da tabela...")
     try:
         table = driver.find_element(By.CLASS_NAME, "listagem")
         rows = table.find_elements(By.TAG_NAME, "tr")
-        cron = defaultdict(lambda: defaultdict(list))
+        cron = novo_cronograma()
 
         codigo_disciplina = ""
         nome_disciplina = ""
-        DIAS_ORDEM = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado']
 
         for row in rows[1:]:
             try:
@@ -203,123 +735,598 @@ def extrair_dados(driver, apenas_fcte=False):
             if not any(cl in row.get_attribute("class") for cl in ['linhaPar', 'linhaImpar']):
                 continue
 
+            METRICAS.contar("linhas_vistas")
             try:
                 cells = row.find_elements(By.TAG_NAME, "td")
                 if len(cells) < 8:
+                    METRICAS.contar("linhas_ignoradas")
                     continue
 
                 raw_sala = cells[7].text.strip().upper()
                 if apenas_fcte and not raw_sala.startswith(('FCTE', 'FGA')):
+                    METRICAS.contar("linhas_ignoradas")
                     continue
 
                 turma = cells[0].text.strip()
                 html_professores = cells[2].get_attribute("innerHTML")
                 soup = BeautifulSoup(html_professores, "html.parser")
-                linhas = soup.stripped_strings
-                lista_professores = [
-                    re.sub(r'\s*\(\d+h\)', '', linha).strip().lower().title()
-                    for linha in linhas if linha.strip()
-                ]
-                professores_str = ", ".join(lista_professores)
-                cods = re.findall(r'\d+[MTN]+\d+', cells[3].text.strip())
-
-                clean = re.sub(r'^(?:FCTE|FGA)\s*-\s*', '', raw_sala)
-                clean = re.sub(r'\s*\([^)]*\)', '', clean).strip()
-                salas = [clean] if clean == 'NIT/LDS' else [s.strip() for s in clean.split('/')]             
-                   
-                eventos = []
-                for cod_idx, cod in enumerate(cods):
-                    convertido = converter_codigo(cod)
-                    if not convertido:
-                        continue
-                    dias_list, periodos_list = convertido
-                    for dia in dias_list:
-                        for per in periodos_list:
-                            inicio_str = per.split('–')[0].strip()
-                            try:
-                                if 'h' in inicio_str:
-                                    h, m = inicio_str.split('h')
-                                    total_min = int(h)*60 + int(m)
-                                else:
-                                    total_min = int(inicio_str)*60
-                            except:
-                                total_min = 0
-                            eventos.append((dia, per, total_min, cod_idx))
-
-                eventos_ordenados = sorted(
-                    eventos, 
-                    key=lambda x: (DIAS_ORDEM.index(x[0]) if x[0] in DIAS_ORDEM else 99, x[2])
-                )
-                
-                num_eventos = len(eventos_ordenados)
-                dias_unicos = sorted(set(e[0] for e in eventos_ordenados), 
-                                    key=lambda d: DIAS_ORDEM.index(d))
-                num_dias = len(dias_unicos)
-
-                # Verificar se a disciplina é inconsistente
-                if not (
-                    len(salas) == len(cods) or
-                    len(salas) == num_dias or
-                    len(salas) == num_eventos or
-                    len(salas) == 1
-                ):
-                    print(f"[DISCIPLINA_INCONSISTENTE] Código: {codigo_disciplina}, Turma: {turma}, Nome: {nome_disciplina}, Docente: {professores_str}, Códigos de horário: {cods}, Salas detectadas: {salas}, Dias únicos: {dias_unicos}")
-                    print("[DISCIPLINA_INCONSISTENTE] Nenhuma das combinações esperadas é válida, significa que o número de salas não corresponde à quantidade de códigos de horários, dias ou eventos da disciplina, e também não é uma única sala.")
-                    print("[DISCIPLINA_INCONSISTENTE] Favor verificar turma e adicionar ao documento manualmente!")
-                    continue
+                lista_professores = limpar_professores(soup.stripped_strings)
+                processar_turma(cron, codigo_disciplina, nome_disciplina, turma,
+                                lista_professores, cells[3].text.strip(), raw_sala)
 
-                for idx, evento in enumerate(eventos_ordenados):
-                    dia, per, _, cod_idx = evento
-
-                    if len(salas) == len(cods):
-                        sala = salas[cod_idx]
-                    elif len(salas) == num_dias:
-                        sala_idx = dias_unicos.index(dia)
-                        sala = salas[sala_idx]
-                    elif len(salas) == num_eventos:
-                        sala = salas[idx]
-                    elif len(salas) == 1:
-                        sala = salas[0]
-
-                    inicio, fim = per.split('–')
-                    sala_completa = f"FCTE - {sala.strip()}"
-                    evento_novo = {
-                        'inicio': inicio.strip(),
-                        'fim': fim.strip(),
-                        'codigo': codigo_disciplina,
-                        'turma': turma,
-                        'disciplina': nome_disciplina,
-                        'docente': professores_str
-                    }
-
-                    # Verifica se existe evento anterior contínuo e idêntico (exceto horários)
-                    eventos_dia = cron[sala_completa][dia]
-                    if eventos_dia:
-                        ultimo = eventos_dia[-1]
-                        if (
-                            ultimo['codigo'] == evento_novo['codigo'] and
-                            ultimo['turma'] == evento_novo['turma'] and
-                            ultimo['disciplina'] == evento_novo['disciplina'] and
-                            ultimo['docente'] == evento_novo['docente'] and
-                            horario_para_minutos(ultimo['fim']) in [horario_para_minutos(evento_novo['inicio']) - 10,
-                                                                    horario_para_minutos(evento_novo['inicio'])]
-                        ):
-                            # Mesclar horários: estende o fim
-                            ultimo['fim'] = evento_novo['fim']
-                        else:
-                            eventos_dia.append(evento_novo)
-                    else:
-                        eventos_dia.append(evento_novo)
-         
             except Exception as e:
                 print(f"[ERRO] Falha ao processar linha de turma: {e}")
         return cron
     except NoSuchElementException:
         print("Não foram encontrados resultados para a busca com estes parâmetros.")
-        return defaultdict(lambda: defaultdict(list))
+        return novo_cronograma()
     except Exception as e:
         print(f"[ERRO CRÍTICO] Falha ao extrair dados da tabela: {e}")
-        return defaultdict(lambda: defaultdict(list))
+        return novo_cronograma()
+
+# === LEITURA OFFLINE DO HTML (SNAPSHOT) ===
+TAGS_BLOCO = {"div", "p", "tr", "table", "li", "ul", "ol"}
+TAGS_SEM_TEXTO = {"script", "style", "template"}
+XPATH_TITULO = './/*[contains(concat(" ", normalize-space(@class), " "), " tituloDisciplina ")]'
+
+def _elemento_oculto(elemento):
+    estilo = (elemento.get("style") or "").replace(" ", "").lower()
+    return elemento.tag in ("script", "style") or "display:none" in estilo or "visibility:hidden" in estilo
+
+def _coletar_texto(elemento, partes):
+    if elemento.text:
+        partes.append(elemento.text)
+    for filho in elemento:
+        if isinstance(filho.tag, str):  # comentários e instruções não contam
+            if filho.tag == "br":
+                partes.append("\n")
+            elif not _elemento_oculto(filho):
+                bloco = filho.tag in TAGS_BLOCO
+                if bloco:
+                    partes.append("\n")
+                _coletar_texto(filho, partes)
+                if bloco:
+                    partes.append("\n")
+        if filho.tail:
+            partes.append(filho.tail)
+
+def texto_visivel(elemento):
+    """
+    Aproxima o WebElement.text do Selenium: ignora elementos ocultos, quebra
+    linha em <br>/blocos e colapsa espaços de cada linha.
+    """
+    partes = []
+    _coletar_texto(elemento, partes)
+    linhas = (" ".join(linha.split()) for linha in "".join(partes).split("\n"))
+    return "\n".join(linha for linha in linhas if linha)
+
+def textos_do_elemento(elemento):
+    # Todos os textos do elemento e descendentes, já aparados e sem os vazios
+    if elemento.text and elemento.tag not in TAGS_SEM_TEXTO and elemento.text.strip():
+        yield elemento.text.strip()
+    for filho in elemento:
+        if isinstance(filho.tag, str):
+            yield from textos_do_elemento(filho)
+        if filho.tail and filho.tail.strip():
+            yield filho.tail.strip()
+
+def _eh_listagem(elemento):
+    return elemento.tag == "table" and "listagem" in (elemento.get("class") or "").split()
+
+def iterar_linhas_turmas(html, apenas_fcte=False):
+    """
+    Percorre a tabela 'listagem' do HTML e produz, para cada turma, a tupla
+    (codigo, nome, turma, professores, horario, sala) com os textos já limpos.
+
+    A página é lida em fluxo (lxml.etree.iterparse): cada <tr> é tratado
+    assim que termina e descartado em seguida, então a memória não cresce
+    com o tamanho da listagem.
+    """
+    codigo_disciplina = ""
+    nome_disciplina = ""
+    tabela = None      # a primeira table.listagem, enquanto está aberta
+    encerrada = False
+    primeira_linha = None
+
+    dados = html.encode("utf-8") if isinstance(html, str) else html
+    for evento, elemento in lxml.etree.iterparse(io.BytesIO(dados), events=("start", "end"),
+                                                 html=True, encoding="utf-8", recover=True):
+        if evento == "start":
+            if tabela is None and not encerrada and _eh_listagem(elemento):
+                tabela = elemento
+            elif tabela is not None and primeira_linha is None and elemento.tag == "tr":
+                primeira_linha = elemento  # cabeçalho
+            continue
+        if elemento is tabela:
+            tabela, encerrada = None, True
+            continue
+        if tabela is None or elemento.tag != "tr":
+            continue
+        pai = elemento.getparent()
+        if pai is not tabela and pai.getparent() is not tabela:
+            continue  # <tr> aninhado: lido junto com a linha que o contém
+
+        # Linhas aninhadas são lidas na ordem do documento, como no Selenium
+        for row in elemento.iter("tr"):
+            linha = _ler_linha_turma(row, primeira_linha, apenas_fcte)
+            if linha is None:
+                continue
+            if linha[0] == "titulo":
+                codigo_disciplina, nome_disciplina = linha[1]
+                continue
+            yield (codigo_disciplina, nome_disciplina) + linha[1]
+
+        # Linha de primeiro nível já lida: libera ela e as anteriores
+        elemento.clear(keep_tail=True)
+        while elemento.getprevious() is not None:
+            del pai[0]
+
+    if not encerrada and tabela is None:
+        print("Não foram encontrados resultados para a busca com estes parâmetros.")
+
+def _ler_linha_turma(row, cabecalho, apenas_fcte):
+    # ("titulo", (codigo, nome)), ("turma", (turma, professores, horario, sala)) ou None
+    if row is cabecalho:
+        return None
+    titulos = row.xpath(XPATH_TITULO)
+    if titulos:
+        partes = texto_visivel(titulos[0]).strip().split(" ", 1)
+        return ("titulo", tuple(partes)) if len(partes) == 2 else None
+
+    classes = " ".join((row.get("class") or "").split())
+    if not any(cl in classes for cl in ['linhaPar', 'linhaImpar']):
+        return None
+
+    METRICAS.contar("linhas_vistas")
+    try:
+        cells = row.findall(".//td")
+        if len(cells) < 8:
+            METRICAS.contar("linhas_ignoradas")
+            return None
+
+        raw_sala = texto_visivel(cells[7]).strip().upper()
+        if apenas_fcte and not raw_sala.startswith(('FCTE', 'FGA')):
+            METRICAS.contar("linhas_ignoradas")
+            return None
+
+        turma = texto_visivel(cells[0]).strip()
+        lista_professores = limpar_professores(textos_do_elemento(cells[2]))
+        horario = texto_visivel(cells[3]).strip()
+    except Exception as e:
+        print(f"[ERRO] Falha ao processar linha de turma: {e}")
+        return None
+    return "turma", (turma, lista_professores, horario, raw_sala)
+
+class DestinoSalas:
+    """
+    Destino em fluxo dos eventos: cada (sala, dia) guarda uma lista por
+    departamento (`ordem`) e os eventos contínuos da mesma turma são mesclados
+    já na chegada. Vários trabalhadores podem entregar ao mesmo tempo; o
+    cronograma final junta as partes na ordem dos departamentos, igual à
+    mesclagem de cronogramas inteiros que ele substitui.
+    """
+    def __init__(self):
+        self.salas = {}       # sala -> {dia: {ordem: [Aula]}}
+        self.chegada = {}     # (sala, dia, ordem) -> sequência da primeira chegada
+        self._seq = 0
+        self._trava = threading.Lock()
+
+    def _partes(self, ordem, sala, dia):
+        partes = self.salas.setdefault(sala, {}).setdefault(dia, {})
+        if ordem not in partes:
+            self.chegada[sala, dia, ordem] = self._seq
+            self._seq += 1
+            partes[ordem] = []
+        return partes[ordem]
+
+    def receber(self, ordem, sala, dia, aula):
+        with self._trava:
+            anexar_mesclando(self._partes(ordem, sala, dia), aula)
+
+    def absorver(self, ordem, cron):
+        # Cronograma já montado (extração webdriver, incremental ou diário)
+        with self._trava:
+            for sala, dias in cron.items():
+                for dia, aulas in dias.items():
+                    self._partes(ordem, sala, dia).extend(aulas)
+
+    def parte(self, ordem):
+        # Só o cronograma do departamento `ordem`, na ordem em que chegou
+        with self._trava:
+            pares = sorted((seq, sala, dia) for (sala, dia, o), seq in self.chegada.items() if o == ordem)
+            cron = novo_cronograma()
+            for _, sala, dia in pares:
+                cron[sala][dia].extend(self.salas[sala][dia][ordem])
+            return cron
+
+    def contar(self, ordem):
+        # Quantas aulas o departamento `ordem` trouxe
+        with self._trava:
+            return sum(len(self.salas[sala][dia][o]) for sala, dia, o in self.chegada if o == ordem)
+
+    def descartar(self, ordem):
+        # Desfaz uma tentativa que falhou no meio do departamento
+        with self._trava:
+            for sala, dia, o in [k for k in self.chegada if k[2] == ordem]:
+                del self.chegada[sala, dia, o]
+                dias = self.salas[sala]
+                del dias[dia][o]
+                if not dias[dia]:
+                    del dias[dia]
+                if not dias:
+                    del self.salas[sala]
+
+    def cronograma(self):
+        # Salas e dias na ordem em que apareceriam mesclando departamento a departamento
+        chaves = {}
+        for (sala, dia, ordem), seq in self.chegada.items():
+            for k in (sala, (sala, dia)):
+                chaves[k] = min(chaves.get(k, (ordem, seq)), (ordem, seq))
+        cron = novo_cronograma()
+        for sala in sorted(self.salas, key=chaves.__getitem__):
+            dias = self.salas[sala]
+            for dia in sorted(dias, key=lambda d: chaves[sala, d]):
+                for ordem in sorted(dias[dia]):
+                    cron[sala][dia].extend(dias[dia][ordem])
+        return cron
+
+def encaminhar_tabela(html, apenas_fcte, destino, ordem=0):
+    """
+    Lê a listagem em fluxo e entrega cada evento ao destino assim que a sua
+    linha termina, sem montar um cronograma intermediário.
+    """
+    try:
+        for linha in iterar_linhas_turmas(html, apenas_fcte):
+            try:
+                for sala, dia, aula in eventos_da_turma(*linha):
+                    destino.receber(ordem, sala, dia, aula)
+            except Exception as e:
+                print(f"[ERRO] Falha ao processar linha de turma: {e}")
+    except Exception as e:
+        print(f"[ERRO CRÍTICO] Falha ao extrair dados da tabela: {e}")
+
+def parsear_tabela_turmas(html, apenas_fcte=False):
+    """
+    Produz o mesmo cronograma de extrair_dados_webdriver a partir do HTML
+    completo da página de resultados, sem nenhuma chamada ao navegador.
+    """
+    destino = DestinoSalas()
+    encaminhar_tabela(html, apenas_fcte, destino)
+    return destino.cronograma()
+
+# === BACKENDS DE COLETA ===
+class BackendSelenium:
+    """
+    Coleta pelo Chrome headless, clicando no formulário como um usuário.
+    """
+    nome = "selenium"
+
+    def __init__(self, url=URL_TURMAS):
+        self.url = url
+        self.driver, self.wait = configurar_driver(url)
+        fechar_modal_cookies(self.wait)
+        self.tarefas = 0
+        self.memoria_inicial = memoria_navegador_mb(self.driver)
+        METRICAS.medir("memoria_navegador_mb", self.memoria_inicial)
+
+    def saudavel(self):
+        # O navegador responde e está no formulário de busca?
+        try:
+            pronto = self.driver.execute_script("return document.readyState") != "loading"
+            return pronto and bool(self.driver.find_elements(By.ID, "formTurma:inputAno"))
+        except WebDriverException:
+            return False
+
+    def preparar(self):
+        """
+        Volta ao listar.jsf limpo para a próxima tarefa. O modal de cookies
+        normalmente não reaparece; só é fechado se estiver visível, para não
+        esperar o timeout à toa.
+        """
+        with METRICAS.etapa("carregar_pagina"):
+            self.driver.get(self.url)
+        modais = self.driver.find_elements(By.ID, "sigaa-cookie-consent")
+        if modais and modais[0].is_displayed():
+            fechar_modal_cookies(self.wait)
+
+    def definir_ano_e_periodo(self, ano, periodo):
+        return definir_ano_e_periodo(self.driver, self.wait, ano, periodo)
+
+    def buscar_departamento(self, depto):
+        if isinstance(depto, int):
+            return selecionar_departamento_por_indice(self.wait, depto)
+        return selecionar_departamento_por_nome(self.wait, depto)
+
+    def listar_departamentos(self):
+        return opcoes_departamentos(self.driver)
+
+    def html_resultados(self):
+        return self.driver.page_source
+
+    def extrair(self, apenas_fcte=False, modo="snapshot"):
+        return extrair_dados(self.driver, apenas_fcte, modo)
+
+    def fechar(self):
+        resumo = self.wait.resumo()
+        memoria = memoria_navegador_mb(self.driver)
+        METRICAS.medir("memoria_navegador_mb", memoria)
+        if memoria is not None:
+            resumo = f"{resumo}; " if resumo else ""
+            resumo += f"memória {memoria:.0f} MB"
+        if resumo:
+            print(f"Latências do navegador: {resumo}")
+        self.driver.quit()
+
+TIMEOUT_HTTP = 30
+CAMPO_VIEWSTATE = "javax.faces.ViewState"
+
+def criar_sessao_http(conexoes=4):
+    carregar_requests()
+    sessao = requests.Session()
+    adaptador = HTTPAdapter(
+        pool_connections=conexoes,
+        pool_maxsize=conexoes,
+        # Só falhas de conexão são repetidas aqui; um 5xx volta como erro para o
+        # AgendadorBuscas reduzir o ritmo e a coleta tentar de novo com espera
+        max_retries=Retry(total=3, backoff_factor=0.5, status=0, allowed_methods=None),
+    )
+    sessao.mount("http://", adaptador)
+    sessao.mount("https://", adaptador)
+    sessao.headers["User-Agent"] = "Mozilla/5.0 (X11; Linux x86_64) sigaa-scrapper"
+    return sessao
+
+class BackendHttp:
+    """
+    Coleta sem navegador: reproduz o POST do formulário JSF 'formTurma' de
+    listar.jsf, repassando o javax.faces.ViewState de cada resposta para o
+    próximo envio, sobre uma única requests.Session.
+    """
+    nome = "http"
+
+    def __init__(self, url=URL_TURMAS, sessao=None):
+        print("Abrindo sessão HTTP com o SIGAA...")
+        self.url = url
+        self.sessao = sessao or criar_sessao_http()
+        self.acao = url
+        self.campos = {}
+        self.opcoes = {}
+        self.botao_buscar = None
+        self.html = ""
+        METRICAS.primeira_requisicao()
+        resposta = self.sessao.get(url, timeout=TIMEOUT_HTTP)
+        resposta.raise_for_status()
+        if not self._ler_formulario(resposta.text):
+            raise RuntimeError("Formulário 'formTurma' não encontrado na página de turmas.")
+
+    def _ler_formulario(self, html):
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(html, "lxml")
+        form = soup.find("form", id="formTurma")
+        if form is None:
+            return False
+
+        self.acao = urljoin(self.url, form.get("action") or self.url)
+        campos = {}
+        for inp in form.find_all("input"):
+            nome = inp.get("name")
+            tipo = (inp.get("type") or "text").lower()
+            if not nome:
+                continue
+            if tipo in ("submit", "button", "image", "reset"):
+                if (inp.get("value") or "").strip() == "Buscar":
+                    self.botao_buscar = (nome, inp.get("value"))
+                continue
+            if tipo in ("checkbox", "radio") and not inp.has_attr("checked"):
+                continue
+            campos[nome] = inp.get("value") or ""
+
+        opcoes = {}
+        for sel in form.find_all("select"):
+            nome = sel.get("name")
+            if not nome:
+                continue
+            lista = [(op.get("value", op.get_text(strip=True)), op.get_text(" ", strip=True))
+                     for op in sel.find_all("option")]
+            opcoes[nome] = lista
+            escolhida = sel.find("option", selected=True)
+            if escolhida is not None:
+                campos[nome] = escolhida.get("value", escolhida.get_text(strip=True))
+            elif lista:
+                campos[nome] = lista[0][0]
+
+        # Mantém ano/período já definidos; o resto vem da resposta mais recente
+        for nome in ("formTurma:inputAno", "formTurma:inputPeriodo"):
+            if nome in self.campos:
+                campos[nome] = self.campos[nome]
+        self.campos = campos
+        self.opcoes = opcoes
+        return True
+
+    def definir_ano_e_periodo(self, ano, periodo):
+        print(f"Definindo parâmetros: Ano {ano}, Período {periodo}...")
+        self.campos["formTurma:inputAno"] = ano
+        self.campos["formTurma:inputPeriodo"] = periodo
+        print("Ano e período configurados corretamente.")
+        return True
+
+    def listar_departamentos(self):
+        return list(self.opcoes.get("formTurma:inputDepto", []))
+
+    def _valor_departamento(self, depto):
+        opcoes = self.opcoes.get("formTurma:inputDepto", [])
+        if isinstance(depto, int):
+            return opcoes[depto][0]
+        for valor, texto in opcoes:
+            if texto == depto:
+                return valor
+        for valor, texto in opcoes:
+            if depto.lower() in texto.lower():
+                return valor
+        raise ValueError(f"Departamento com nome '{depto}' não encontrado.")
+
+    def buscar_departamento(self, depto):
+        with METRICAS.etapa("buscar_departamento_http", departamento=descrever_departamento(depto)):
+            return self._buscar_departamento(depto)
+
+    def _buscar_departamento(self, depto):
+        self.html = ""
+        try:
+            dados = dict(self.campos)
+            dados["formTurma:inputNivel"] = self.opcoes["formTurma:inputNivel"][2][0]
+            dados["formTurma:inputDepto"] = self._valor_departamento(depto)
+            if self.botao_buscar:
+                dados[self.botao_buscar[0]] = self.botao_buscar[1]
+            if CAMPO_VIEWSTATE not in dados:
+                print("[AVISO] javax.faces.ViewState ausente; a busca pode ser recusada pelo SIGAA.")
+
+            resposta = self.sessao.post(self.acao, data=dados, timeout=TIMEOUT_HTTP)
+            resposta.raise_for_status()
+            self.html = resposta.text
+            if not self._ler_formulario(self.html):
+                print(f"[ERRO] Resposta inesperada do SIGAA para '{depto}' (sessão expirada?)")
+                return False
+            return True
+        except (KeyError, IndexError) as e:
+            print(f"[ERRO] Falha ao selecionar departamento '{depto}': opção inexistente ({e})")
+        except ValueError as e:
+            print(f"[ERRO] {e}")
+        except requests.RequestException as e:
+            print(f"[ERRO] Falha na requisição ao SIGAA para '{depto}': {e}")
+        return False
+
+    def html_resultados(self):
+        return self.html
+
+    def extrair(self, apenas_fcte=False, modo="snapshot"):
+        print("Extraindo dados da tabela...")
+        return parsear_tabela_turmas(self.html, apenas_fcte)
+
+    def fechar(self):
+        self.sessao.close()
+
+BACKENDS = {
+    BackendSelenium.nome: BackendSelenium,
+    BackendHttp.nome: BackendHttp,
+}
+
+def criar_backend(nome, url=URL_TURMAS):
+    if nome not in BACKENDS:
+        raise ValueError(f"Backend desconhecido: '{nome}'. Opções: {', '.join(BACKENDS)}")
+    return BACKENDS[nome](url)
+
+# === POOL DE NAVEGADORES AQUECIDOS ===
+def memoria_navegador_mb(driver):
+    """
+    Memória do navegador em MB: RSS do chromedriver e de todos os processos
+    do Chrome se o psutil estiver instalado; senão, o heap JS da página.
+    Devolve None se não der para medir.
+    """
+    try:
+        import psutil
+        raiz = psutil.Process(driver.service.process.pid)
+        return sum(p.memory_info().rss for p in [raiz] + raiz.children(recursive=True)) / 2**20
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    try:
+        heap = driver.execute_script("return performance.memory ? performance.memory.usedJSHeapSize : null")
+        return heap / 2**20 if heap else None
+    except WebDriverException:
+        return None
+
+class PoolNavegadores:
+    """
+    Mantém até `tamanho` navegadores abertos no listar.jsf, com o modal de
+    cookies já fechado, para que cada coleta não pague a instalação do
+    chromedriver e a partida a frio do Chrome. Cada navegador é verificado
+    ao sair do pool e reciclado depois de `max_tarefas` usos ou se a memória
+    crescer mais que `max_crescimento_mb` desde que foi aberto.
+    """
+
+    def __init__(self, tamanho=2, url=URL_TURMAS, max_tarefas=20, max_crescimento_mb=300):
+        self.tamanho = tamanho
+        self.url = url
+        self.max_tarefas = max_tarefas
+        self.max_crescimento_mb = max_crescimento_mb
+        self.livres = deque()
+        self.abertos = 0
+        self.condicao = threading.Condition()
+
+    def aquecer(self):
+        while True:
+            with self.condicao:
+                if self.abertos >= self.tamanho:
+                    return
+                self.abertos += 1
+            try:
+                backend = BackendSelenium(self.url)
+            except Exception:
+                self._descontar()
+                raise
+            with self.condicao:
+                self.livres.append(backend)
+                self.condicao.notify()
+
+    def _descontar(self):
+        with self.condicao:
+            self.abertos -= 1
+            self.condicao.notify()
+
+    def _descartar(self, backend, motivo):
+        print(f"[POOL] Reciclando navegador ({motivo}).")
+        try:
+            backend.driver.quit()
+        except Exception:
+            pass
+        self._descontar()
+
+    def obter(self):
+        while True:
+            with self.condicao:
+                while not self.livres and self.abertos >= self.tamanho:
+                    self.condicao.wait()
+                backend = self.livres.popleft() if self.livres else None
+                if backend is None:
+                    self.abertos += 1
+            if backend is None:
+                try:
+                    return BackendSelenium(self.url)
+                except Exception:
+                    self._descontar()
+                    raise
+            if backend.saudavel():
+                return backend
+            self._descartar(backend, "não respondeu à verificação")
+
+    def devolver(self, backend):
+        backend.tarefas += 1
+        memoria = memoria_navegador_mb(backend.driver)
+        METRICAS.medir("memoria_navegador_mb", memoria)
+        motivo = None
+        if backend.tarefas >= self.max_tarefas:
+            motivo = f"{backend.tarefas} tarefas"
+        elif (memoria is not None and backend.memoria_inicial is not None
+              and memoria - backend.memoria_inicial > self.max_crescimento_mb):
+            motivo = f"memória cresceu de {backend.memoria_inicial:.0f} para {memoria:.0f} MB"
+        else:
+            try:
+                backend.preparar()
+            except Exception as e:
+                motivo = f"falha ao voltar ao formulário: {e}"
+        if motivo:
+            self._descartar(backend, motivo)
+            return
+        with self.condicao:
+            self.livres.append(backend)
+            self.condicao.notify()
+
+    def fechar(self):
+        with self.condicao:
+            livres, self.livres = list(self.livres), deque()
+        for backend in livres:
+            backend.fechar()
+            self._descontar()
 
 # === CRIAÇÃO DO DOCUMENTO DINÂMICO ===
 HORARIOS_FIXOS = [
@@ -332,9 +1339,12 @@ HORARIOS_FIXOS = [
 ]
 
 # Função utilitária para converter horário em minutos
+@lru_cache(maxsize=None)
 def horario_para_minutos(horario):
     return int(horario[:2]) * 60 + int(horario[3:])
 
+HORARIOS_FIXOS_MINUTOS = [(horario_para_minutos(i), horario_para_minutos(f)) for i, f in HORARIOS_FIXOS]
+
 # === FONTE ===
 def set_font_times_new_roman(doc):
     style = doc.styles['Normal']
@@ -425,14 +1435,23 @@ MAPEAMENTO_SALAS_COMPLETAS = {
     "TERMO SUP": "LAB. TERMOFLUIDOS – 25 – UED"
 }
 
+# Uma única alternância com todos os termos (os mais longos primeiro) e a
+# abreviação indexada pelo termo em minúsculas. As tabelas abaixo são montadas
+# uma vez na carga do módulo a partir de ABBR_DISCIPLINAS e
+# MAPEAMENTO_SALAS_COMPLETAS; as funções que as usam são memoizadas.
+PADRAO_ABBR = re.compile(
+    r"\b(" + "|".join(re.escape(t) for t in sorted(ABBR_DISCIPLINAS, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE,
+)
+ABBR_POR_TERMO = {termo.lower(): abbr for termo, abbr in ABBR_DISCIPLINAS.items()}
+CHAVES_SALAS_POR_TAMANHO = tuple(sorted(MAPEAMENTO_SALAS_COMPLETAS.keys(), key=len, reverse=True))
+
+@lru_cache(maxsize=4096)
 def abbreviar_disciplina(nome_completo: str) -> str:
     """
     Substitui ocorrências de termos completos por suas abreviações (case-insensitive).
     """
-    for completo, abbr in ABBR_DISCIPLINAS.items():
-        pattern = rf"(?i)\b{re.escape(completo)}\b"
-        nome_completo = re.sub(pattern, abbr, nome_completo)
-    return nome_completo
+    return PADRAO_ABBR.sub(lambda m: ABBR_POR_TERMO[m.group(1).lower()], nome_completo)
 
 def primeiro_ultimo_nome(nome_completo):
     partes = nome_completo.strip().split()
@@ -442,27 +1461,26 @@ def primeiro_ultimo_nome(nome_completo):
         return partes[0]
     return f"{partes[0]} {partes[-1]}"
 
+@lru_cache(maxsize=None)
 def nome_sala_completo(sala: str) -> str:
     # Prioriza igualdade exata
     if sala in MAPEAMENTO_SALAS_COMPLETAS:
         return MAPEAMENTO_SALAS_COMPLETAS[sala]
 
     # Depois tenta correspondência parcial, priorizando chaves maiores
-    for k in sorted(MAPEAMENTO_SALAS_COMPLETAS.keys(), key=len, reverse=True):
+    for k in CHAVES_SALAS_POR_TAMANHO:
         if k in sala:
             return MAPEAMENTO_SALAS_COMPLETAS[k]
     return sala  # fallback
 
 # === GERAÇÃO DO DOCX ===
-def gerar_docx(cronogramas, filename="Mapa_de_Salas.docx"):
-    print(f"Gerando DOCX: {filename}")
-    print(f"Total de salas a processar: {len(cronogramas)}")
+def criar_documento_base():
+    carregar_docx()
     doc = Document()
     section = doc.sections[0]
     header = section.header
     paragraph = header.paragraphs[0]
     paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
-    BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
     imagem_path = os.path.join(BASE_DIR, "public", "Imagem1.png")
 
     run = paragraph.add_run()
@@ -470,9 +1488,52 @@ def gerar_docx(cronogramas, filename="Mapa_de_Salas.docx"):
 
     set_font_times_new_roman(doc)
     definir_margens(doc, 0.5)
+    return doc
+
+def blocos_da_aula(mi, mf):
+    """
+    Para uma aula de `mi` a `mf` minutos, gera (idx, modo) para cada bloco de
+    HORARIOS_FIXOS que ela ocupa: modo "ambas" ocupa as duas meias-linhas do
+    bloco, "primeira"/"segunda" só uma delas.
+    """
+    for idx, (bi, bf) in enumerate(HORARIOS_FIXOS_MINUTOS):
+        blocos = [(bi, bi + 50), (bi + 50, bf)]
+
+        ocup1 = mi < blocos[0][1] and mf > blocos[0][0]
+        ocup2 = mi < blocos[1][1] and mf > blocos[1][0]
+
+        excecao_m5_t1 = mi == 720 and mf == 830 and bi == 720 
+        excecao_t6_n1 = mi == 1080 and mf == 1190 and bi == 1080  
+
+        if (ocup1 and ocup2) or excecao_m5_t1 or excecao_t6_n1:
+            yield idx, "ambas"
+        elif ocup1:
+            yield idx, "primeira"
+        elif ocup2:
+            yield idx, "segunda"
+
+def horarios_em_ordem(horarios):
+    """
+    Os dias de uma sala na ordem da semana e as aulas de cada dia ordenadas
+    por horário e textos. A coleta insere dias e aulas na ordem em que chegam
+    e o snapshot os relê já ordenados; como a última aula desenhada num bloco
+    é a que aparece, todos os renderizadores desenham nesta ordem.
+    """
+    return {dia: sorted(horarios[dia], key=lambda a: (a.inicio, a.fim, a.codigo, a.turma, a.disciplina, a.docente))
+            for dia in sorted(horarios, key=lambda d: INDICE_DIA.get(d, 99))}
+
+def gerar_docx(cronogramas, filename="Mapa_de_Salas.docx"):
+    with METRICAS.etapa("gerar_docx", salas=len(cronogramas)):
+        _gerar_docx(cronogramas, filename)
+
+def _gerar_docx(cronogramas, filename):
+    print(f"Gerando DOCX: {filename}")
+    print(f"Total de salas a processar: {len(cronogramas)}")
+    doc = criar_documento_base()
 
     for i, (sala, horarios) in enumerate(sorted(cronogramas.items()), start=1):
         print(f"[{i}/{len(cronogramas)}] Processando sala: {sala}")
+        horarios = horarios_em_ordem(horarios)
         nome = nome_sala_completo(sala)
         par = doc.add_paragraph()
         par.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
@@ -525,55 +1586,46 @@ def gerar_docx(cronogramas, filename="Mapa_de_Salas.docx"):
             cell_h.vertical_alignment = WD_ALIGN_VERTICAL.CENTER
 
         celulas_ocupadas = set()
+        pares_mesclados = set()
 
         for dia, aulas in horarios.items():
             if dia not in dias_semana:
                 continue
             col = dias_semana.index(dia)
             for aula in aulas:
-                mi, mf = horario_para_minutos(aula['inicio']), horario_para_minutos(aula['fim'])
-                for idx, (bi_str, bf_str) in enumerate(HORARIOS_FIXOS):
-                    bi, bf = horario_para_minutos(bi_str), horario_para_minutos(bf_str)
-                    blocos = [(bi, bi + 50), (bi + 50, bf)]
+                for idx, modo in blocos_da_aula(aula.inicio, aula.fim):
                     row1 = idx * 2 + 1
                     row2 = idx * 2 + 2
 
-                    ocup1 = mi < blocos[0][1] and mf > blocos[0][0]
-                    ocup2 = mi < blocos[1][1] and mf > blocos[1][0]
-
-                    excecao_m5_t1 = mi == 720 and mf == 830 and bi == 720 
-                    excecao_t6_n1 = mi == 1080 and mf == 1190 and bi == 1080  
-
-                    if (ocup1 and ocup2) or excecao_m5_t1 or excecao_t6_n1:
+                    if modo == "ambas":
                         cell = tabela.cell(row1, col).merge(tabela.cell(row2, col))
+                        pares_mesclados.add((row1, col))
                         celulas_ocupadas.add((row1, col))
                         celulas_ocupadas.add((row2, col))
-                    elif ocup1:
+                    elif modo == "primeira":
                         cell = tabela.cell(row1, col)
                         celulas_ocupadas.add((row1, col))
-                    elif ocup2:
+                    else:
                         cell = tabela.cell(row2, col)
                         celulas_ocupadas.add((row2, col))
-                    else:
-                        continue
 
                     p = cell.paragraphs[0]
                     p.clear()
-                    run_codigo = p.add_run(aula['codigo'])
+                    run_codigo = p.add_run(aula.codigo)
                     run_codigo.bold = True
                     run_codigo.font.size = Pt(14)
                     p.add_run('\n')
-                    run_turma = p.add_run(f"TURMA {aula['turma']}")
+                    run_turma = p.add_run(f"TURMA {aula.turma}")
                     run_turma.bold = True
                     run_turma.font.size = Pt(13)
                     p.add_run('\n')
-                    nome_original = aula['disciplina'].lstrip('-').strip().lower().title()
+                    nome_original = aula.disciplina.lstrip('-').strip().lower().title()
                     nome_abbr = abbreviar_disciplina(nome_original)
                     run_disc = p.add_run(nome_abbr)
                     run_disc.italic = True
                     run_disc.font.size = Pt(12)
                     p.add_run('\n')
-                    nome_prof = primeiro_ultimo_nome(aula['docente'])
+                    nome_prof = primeiro_ultimo_nome(aula.docente)
                     run_prof = p.add_run(f"Prof. {nome_prof}")
                     run_prof.font.size = Pt(10)
                     p.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
@@ -586,62 +1638,2122 @@ def gerar_docx(cronogramas, filename="Mapa_de_Salas.docx"):
                 if ((row1, col) not in celulas_ocupadas) and ((row2, col) not in celulas_ocupadas):
                     try:
                         tabela.cell(row1, col).merge(tabela.cell(row2, col))
+                        pares_mesclados.add((row1, col))
                     except:
                         pass 
                     
         doc.add_paragraph()
+        METRICAS.contar("salas_renderizadas")
+        METRICAS.contar("celulas_mescladas", len(pares_mesclados))
 
     doc.save(filename)
     print(f"Documento gerado: {filename}")
 
+# === GERAÇÃO DO DOCX POR XML PRONTO ===
+# Mesmo documento de gerar_docx, mas cada tabela é montada como um fragmento
+# OOXML em texto (com os vMerge já resolvidos) e inserida de uma vez no corpo,
+# em vez de centenas de chamadas a tabela.cell()/merge()/add_run().
+XML_JC_CENTRO = '<w:pPr><w:jc w:val="center"/></w:pPr>'
+XML_QUEBRA_PAGINA = '<w:p><w:r><w:br w:type="page"/></w:r></w:p>'
+XML_TBLPR = (
+    '<w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:type="auto" w:w="0"/><w:jc w:val="center"/>'
+    '<w:tblLayout w:type="fixed"/><w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" '
+    'w:lastRow="0" w:noHBand="0" w:noVBand="1" w:val="04A0"/></w:tblPr>'
+)
+
+def _xml_conteudo_run(texto):
+    # Igual ao run.text do python-docx: \t vira <w:tab/>, \n e \r viram <w:br/>
+    partes = []
+    for trecho in re.split(r"([\t\n\r])", texto):
+        if trecho == "\t":
+            partes.append("<w:tab/>")
+        elif trecho in ("\n", "\r"):
+            partes.append("<w:br/>")
+        elif trecho:
+            espaco = ' xml:space="preserve"' if len(trecho.strip()) < len(trecho) else ""
+            partes.append(f"<w:t{espaco}>{xml_escape(trecho)}</w:t>")
+    return "".join(partes)
+
+def _xml_run(texto, negrito=False, italico=False, tamanho=None, fonte=None):
+    rpr = ""
+    if fonte:
+        rpr += f'<w:rFonts w:ascii="{fonte}" w:hAnsi="{fonte}"/>'
+    if negrito:
+        rpr += "<w:b/>"
+    if italico:
+        rpr += "<w:i/>"
+    if tamanho:
+        rpr += f'<w:sz w:val="{tamanho * 2}"/>'
+    rpr = f"<w:rPr>{rpr}</w:rPr>" if rpr else ""
+    conteudo = _xml_conteudo_run(texto)
+    if not rpr and not conteudo:
+        return "<w:r/>"
+    return f"<w:r>{rpr}{conteudo}</w:r>"
+
+XML_BR = _xml_run("\n")
+
+def _textos_aula(aula):
+    # Os quatro textos que a célula de uma aula mostra
+    nome_original = aula.disciplina.lstrip('-').strip().lower().title()
+    return (aula.codigo, f"TURMA {aula.turma}", abbreviar_disciplina(nome_original),
+            f"Prof. {primeiro_ultimo_nome(aula.docente)}")
+
+def _xml_paragrafo_aula(aula):
+    codigo, turma, disciplina, professor = _textos_aula(aula)
+    return (
+        f"<w:p>{XML_JC_CENTRO}"
+        f"{_xml_run(codigo, negrito=True, tamanho=14)}{XML_BR}"
+        f"{_xml_run(turma, negrito=True, tamanho=13)}{XML_BR}"
+        f"{_xml_run(disciplina, italico=True, tamanho=12)}{XML_BR}"
+        f"{_xml_run(professor, tamanho=10)}"
+        "</w:p>"
+    )
+
+def _xml_celula(largura, paragrafos, vmerge=None, valign=False):
+    tcpr = f'<w:tcW w:type="dxa" w:w="{largura}"/>'
+    if vmerge == "restart":
+        tcpr += '<w:vMerge w:val="restart"/>'
+    elif vmerge == "continue":
+        tcpr += "<w:vMerge/>"
+    if valign:
+        tcpr += '<w:vAlign w:val="center"/>'
+    corpo = "".join(p if p is not None else "<w:p/>" for p in paragrafos)
+    return f"<w:tc><w:tcPr>{tcpr}</w:tcPr>{corpo}</w:tc>"
+
+class _CelulaXml:
+    __slots__ = ("paragrafos", "valign")
+
+    def __init__(self):
+        self.paragrafos = [None]  # None = <w:p/> vazio
+        self.valign = False
+
+class _ParCelulasXml:
+    """
+    As duas meias-linhas de um bloco de HORARIOS_FIXOS numa coluna. Reproduz o
+    merge do python-docx: ao mesclar, o conteúdo da célula de baixo (se
+    houver) é movido para a de cima, e depois disso tabela.cell() das duas
+    linhas devolve a célula de cima.
+    """
+    __slots__ = ("cima", "baixo", "mesclado")
+
+    def __init__(self):
+        self.cima = _CelulaXml()
+        self.baixo = _CelulaXml()
+        self.mesclado = False
+
+    def mesclar(self):
+        if self.mesclado:
+            return self.cima
+        if self.baixo.paragrafos != [None]:
+            if self.cima.paragrafos[-1] is None:
+                self.cima.paragrafos.pop()
+            self.cima.paragrafos.extend(self.baixo.paragrafos)
+            self.baixo.paragrafos = [None]
+        self.mesclado = True
+        return self.cima
+
+    def celula(self, segunda):
+        return self.baixo if segunda and not self.mesclado else self.cima
+
+def _xml_linha_cabecalho(dias_semana, larguras):
+    celulas = "".join(
+        _xml_celula(larguras[idx], [f"<w:p>{XML_JC_CENTRO}<w:r/>{_xml_run(dia.upper(), negrito=True, tamanho=10)}</w:p>"],
+                    valign=True)
+        for idx, dia in enumerate(dias_semana)
+    )
+    return f"<w:tr>{celulas}</w:tr>"
+
+def _xml_celula_horario(inicio, fim, largura):
+    paragrafo = (
+        f"<w:p>{XML_JC_CENTRO}{_xml_run(inicio, negrito=True, tamanho=16)}{XML_BR}"
+        f"{_xml_run('às', negrito=True, tamanho=16)}{XML_BR}{_xml_run(fim, negrito=True, tamanho=16)}</w:p>"
+    )
+    return _xml_celula(largura, [paragrafo], "restart", valign=True)
+
+def _xml_tabela_sala(horarios, largura_coluna):
+    # Devolve o XML da tabela e quantos blocos foram mesclados
+    dias_base = ["Horário", "Segunda", "Terça", "Quarta", "Quinta", "Sexta"]
+    dias_semana = dias_base + (["Sábado"] if "Sábado" in horarios else [])
+    larguras = [LARGURA_COLUNA_HORARIO] + [largura_coluna] * (len(dias_semana) - 1)
+    pares = [[_ParCelulasXml() for _ in dias_semana] for _ in HORARIOS_FIXOS]
+
+    for dia, aulas in horarios.items():
+        if dia not in dias_semana:
+            continue
+        col = dias_semana.index(dia)
+        for aula in aulas:
+            paragrafo = None
+            for idx, modo in blocos_da_aula(aula.inicio, aula.fim):
+                par = pares[idx][col]
+                celula = par.mesclar() if modo == "ambas" else par.celula(modo == "segunda")
+                if paragrafo is None:
+                    paragrafo = _xml_paragrafo_aula(aula)
+                celula.paragrafos[0] = paragrafo
+                celula.valign = True
+
+    # Blocos vazios viram uma célula só; nos ocupados, o que sobrou não é mesclado
+    mesclados = 0
+    partes = [f"<w:tbl>{XML_TBLPR}<w:tblGrid>",
+              "".join(f'<w:gridCol w:w="{largura_coluna}"/>' for _ in dias_semana),
+              "</w:tblGrid>", _xml_linha_cabecalho(dias_semana, larguras)]
+    for idx, (inicio, fim) in enumerate(HORARIOS_FIXOS):
+        linha1 = [_xml_celula_horario(inicio, fim, LARGURA_COLUNA_HORARIO)]
+        linha2 = [_xml_celula(LARGURA_COLUNA_HORARIO, [None], "continue")]
+        for col in range(1, len(dias_semana)):
+            par = pares[idx][col]
+            ocupado = par.mesclado or par.cima.valign or par.baixo.valign
+            if not ocupado:
+                par.mesclado = True
+            mesclados += par.mesclado
+            vmerge_cima, vmerge_baixo = ("restart", "continue") if par.mesclado else (None, None)
+            linha1.append(_xml_celula(largura_coluna, par.cima.paragrafos, vmerge_cima, par.cima.valign))
+            linha2.append(_xml_celula(largura_coluna, par.baixo.paragrafos, vmerge_baixo, par.baixo.valign))
+        partes.append(f"<w:tr>{''.join(linha1)}</w:tr><w:tr>{''.join(linha2)}</w:tr>")
+    partes.append("</w:tbl>")
+    return "".join(partes), mesclados
+
+def emu_para_twips(emu):
+    # O mesmo que Emu(emu).twips do python-docx, sem importá-lo nos processos do renderizador paralelo
+    return int(round(emu / 635))
+
+def xml_pagina_sala(sala, horarios, largura_bloco):
+    """
+    Fragmento do corpo do documento para uma sala: título, tabela, quebra de
+    página e o parágrafo vazio final, na mesma ordem de gerar_docx. Devolve
+    (xml, células mescladas).
+    """
+    dias = 7 if "Sábado" in horarios else 6
+    largura_coluna = emu_para_twips(largura_bloco // dias)
+    titulo = (f"<w:p>{XML_JC_CENTRO}"
+              f"{_xml_run(nome_sala_completo(sala), negrito=True, tamanho=14, fonte='Times New Roman')}</w:p>")
+    tabela, mesclados = _xml_tabela_sala(horarios, largura_coluna)
+    return f"{titulo}{tabela}{XML_QUEBRA_PAGINA}<w:p/>", mesclados
+
+LARGURA_COLUNA_HORARIO = emu_para_twips(int(2.2 * 360000))  # Cm(2.2)
+
+def largura_util(doc):
+    section = doc.sections[-1]
+    return section.page_width - section.left_margin - section.right_margin
+
+def anexar_xml_ao_corpo(doc, xml):
+    corpo = doc.element.body
+    fragmento = parse_xml(f"<w:body {nsdecls('w')}>{xml}</w:body>")
+    sect_pr = corpo.sectPr
+    for elemento in list(fragmento):
+        if sect_pr is not None:
+            sect_pr.addprevious(elemento)
+        else:
+            corpo.append(elemento)
+
+def imprimir_taxa_salas(num_salas, inicio):
+    duracao = max(time.perf_counter() - inicio, 1e-9)
+    print(f"{num_salas} salas renderizadas em {duracao:.2f}s ({num_salas / duracao:.1f} salas/s)")
+
+# === PÁGINAS DAS SALAS EM CACHE, ENDEREÇADAS PELO CONTEÚDO ===
+# Cada página de sala fica guardada sob o hash do que ela mostra: ao gerar o
+# DOCX de novo, só as salas que mudaram são montadas, e um manifesto ao lado
+# do documento registra o hash de cada sala.
+DIR_PAGINAS = os.path.join(BASE_DIR, ".cache", "salas")
+VERSAO_PAGINA = 2              # aumente ao mudar o XML gerado por xml_pagina_sala
+RETENCAO_PAGINAS_DIAS = 30     # páginas sem uso há mais tempo são apagadas do cache
+PAGINAS_EM_CACHE = True        # --docx-sem-cache desliga
+
+def impressao_pagina_sala(sala, horarios, largura_bloco):
+    """
+    Hash da página de uma sala a partir do que ela mostra: título, largura e,
+    dia a dia, o horário e os textos já formatados de cada aula, na ordem em
+    que são desenhados (horarios_em_ordem), então a mesma sala tem o mesmo
+    hash vinda da coleta ou do snapshot. Mudar uma abreviação ou o nome de
+    uma sala só invalida as páginas afetadas.
+    """
+    normalizado = [VERSAO_PAGINA, nome_sala_completo(sala), largura_bloco,
+                   [[dia, [[aula.inicio, aula.fim, *_textos_aula(aula)] for aula in aulas]]
+                    for dia, aulas in horarios_em_ordem(horarios).items()]]
+    return hashlib.sha256(json.dumps(normalizado, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+class CachePaginasSalas:
+    """
+    Páginas de xml_pagina_sala em disco, uma por hash em
+    `diretorio`/ab/abcdef....json (XML e células mescladas). Ler uma página
+    renova a data do arquivo; podar() apaga as que ficaram
+    RETENCAO_PAGINAS_DIAS sem uso.
+    """
+
+    def __init__(self, diretorio=DIR_PAGINAS):
+        self.diretorio = diretorio
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, chave[:2], f"{chave}.json")
+
+    def obter(self, chave):
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, encoding="utf-8") as f:
+                dados = json.load(f)
+            os.utime(caminho)
+            return dados["xml"], dados["celulas_mescladas"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def salvar(self, chave, xml, mesclados):
+        caminho = self._caminho(chave)
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump({"xml": xml, "celulas_mescladas": mesclados}, f, ensure_ascii=False)
+            os.replace(temporario, caminho)
+        except OSError as e:
+            print(f"[AVISO] Não foi possível guardar a página da sala no cache: {e}")
+
+    def podar(self, dias=RETENCAO_PAGINAS_DIAS):
+        limite = time.time() - dias * 86400
+        for raiz, _, arquivos in os.walk(self.diretorio):
+            for nome in arquivos:
+                caminho = os.path.join(raiz, nome)
+                try:
+                    if os.path.getmtime(caminho) < limite:
+                        os.remove(caminho)
+                except OSError:
+                    pass
+
+def caminho_manifesto(filename):
+    return os.path.splitext(filename)[0] + ".manifesto.json"
+
+def impressao_documento(chaves):
+    # O documento depende das páginas das salas e da imagem do cabeçalho
+    try:
+        imagem = os.stat(os.path.join(BASE_DIR, "public", "Imagem1.png"))
+        cabecalho = f"{imagem.st_size}:{imagem.st_mtime_ns}"
+    except OSError:
+        cabecalho = ""
+    return hashlib.sha256("\n".join([str(VERSAO_PAGINA), cabecalho, *chaves]).encode("utf-8")).hexdigest()
+
+def documento_em_dia(filename, impressao):
+    # O DOCX já foi gerado com essas mesmas páginas e ninguém o regravou depois?
+    manifesto = caminho_manifesto(filename)
+    try:
+        with open(manifesto, encoding="utf-8") as f:
+            anterior = json.load(f).get("impressao")
+        return anterior == impressao and os.path.getmtime(manifesto) >= os.path.getmtime(filename)
+    except (OSError, ValueError, AttributeError):
+        return False
+
+def gravar_manifesto(filename, impressao, salas, chaves):
+    dados = {
+        "documento": os.path.basename(filename),
+        "versao": VERSAO_PAGINA,
+        "impressao": impressao,
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "salas": [{"sala": sala, "hash": chave} for (sala, _), chave in zip(salas, chaves)],
+    }
+    caminho = caminho_manifesto(filename)
+    try:
+        with open(caminho + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(dados, f, ensure_ascii=False, indent=1)
+        os.replace(caminho + ".tmp", caminho)
+    except OSError as e:
+        print(f"[AVISO] Não foi possível gravar o manifesto do documento: {e}")
+
+def _xml_lote_de_salas(salas, largura_bloco):
+    # Roda num processo filho: devolve (xml, células mescladas) de cada sala,
+    # já que os contadores do METRICAS do filho não voltam ao pai
+    return [xml_pagina_sala(sala, horarios, largura_bloco) for sala, horarios in salas]
+
+def paginas_das_salas(salas, largura_bloco, cache=None, processos=1):
+    """
+    XML da página de cada sala de `salas` (lista ordenada de (sala,
+    horarios)) e o hash de cada uma. As páginas que já estão no `cache` são
+    reaproveitadas; só as outras são montadas, aqui mesmo ou, com
+    `processos` > 1, num pool de processos, e então guardadas no cache.
+    """
+    chaves = [impressao_pagina_sala(sala, horarios, largura_bloco) for sala, horarios in salas]
+    paginas = [cache.obter(chave) if cache is not None else None for chave in chaves]
+    faltando = [i for i, pagina in enumerate(paginas) if pagina is None]
+    if len(faltando) < len(salas):
+        print(f"[CACHE] {len(salas) - len(faltando)} sala(s) sem mudanças; montando {len(faltando)}.")
+        METRICAS.contar("salas_do_cache", len(salas) - len(faltando))
+
+    processos = min(processos, len(faltando))
+    if processos > 1:
+        print(f"Montando {len(faltando)} salas em {processos} processos")
+        pendentes = [(salas[i][0], {dia: list(aulas) for dia, aulas in salas[i][1].items()}) for i in faltando]
+        # Alguns lotes por processo equilibram salas com muitas e poucas aulas
+        tamanho = -(-len(pendentes) // (processos * 4))
+        lotes = [pendentes[k:k + tamanho] for k in range(0, len(pendentes), tamanho)]
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            montadas = [pagina for lote in executor.map(_xml_lote_de_salas, lotes, [largura_bloco] * len(lotes))
+                        for pagina in lote]
+    else:
+        montadas = (xml_pagina_sala(salas[i][0], salas[i][1], largura_bloco) for i in faltando)
+
+    for n, (i, pagina) in enumerate(zip(faltando, montadas), start=1):
+        print(f"[{n}/{len(faltando)}] Processando sala: {salas[i][0]}")
+        paginas[i] = pagina
+        METRICAS.contar("salas_renderizadas")
+        if cache is not None:
+            cache.salvar(chaves[i], *pagina)
+    METRICAS.contar("celulas_mescladas", sum(mesclados for _, mesclados in paginas))
+    return [xml for xml, _ in paginas], chaves
+
+def _gerar_docx_por_paginas(cronogramas, filename, processos=1):
+    """
+    Monta (ou reaproveita do cache) a página de cada sala, anexa todas ao
+    documento base de uma vez e grava o manifesto. Se nenhuma página mudou
+    desde o último DOCX gravado neste caminho, o arquivo fica como está.
+    """
+    salas = [(sala, horarios_em_ordem(horarios)) for sala, horarios in sorted(cronogramas.items())]
+    print(f"Gerando DOCX: {filename}")
+    print(f"Total de salas a processar: {len(salas)}")
+    inicio = time.perf_counter()
+    detalhes = {"processos": processos} if processos > 1 else {}
+    with METRICAS.etapa("gerar_docx", salas=len(salas), **detalhes):
+        doc = criar_documento_base()
+        largura_bloco = largura_util(doc)
+        cache = CachePaginasSalas() if PAGINAS_EM_CACHE else None
+        paginas, chaves = paginas_das_salas(salas, largura_bloco, cache, processos)
+        impressao = impressao_documento(chaves)
+        if cache is not None and documento_em_dia(filename, impressao):
+            print(f"[CACHE] Nenhuma sala mudou desde a última geração; {filename} mantido.")
+        else:
+            anexar_xml_ao_corpo(doc, "".join(paginas))
+            doc.save(filename)
+            gravar_manifesto(filename, impressao, salas, chaves)
+        if cache is not None:
+            cache.podar()
+    imprimir_taxa_salas(len(salas), inicio)
+    print(f"Documento gerado: {filename}")
+
+def gerar_docx_xml(cronogramas, filename="Mapa_de_Salas.docx"):
+    _gerar_docx_por_paginas(cronogramas, filename)
+
+# Processos do renderizador "paralelo" (None = um por núcleo)
+PROCESSOS_DOCX = None
+
+def gerar_docx_paralelo(cronogramas, filename="Mapa_de_Salas.docx", processos=None):
+    """
+    Igual a gerar_docx_xml, mas as páginas das salas que não estão no cache
+    são montadas em um pool de processos. O documento base (imagem do
+    cabeçalho, margens) é criado só no processo principal, que anexa as
+    páginas na ordem das salas: o document.xml sai idêntico ao do
+    renderizador serial.
+    """
+    processos = processos or PROCESSOS_DOCX or os.cpu_count() or 1
+    _gerar_docx_por_paginas(cronogramas, filename, processos)
+
+RENDERIZADORES = {
+    "xml": gerar_docx_xml,
+    "paralelo": gerar_docx_paralelo,
+    "python-docx": gerar_docx,
+}
+
+# === CACHE EM DISCO DAS PÁGINAS DE RESULTADO ===
+DIR_CACHE = os.path.join(BASE_DIR, ".cache", "sigaa")
+TTL_CACHE_HORAS = 6
+TAMANHO_MAXIMO_CACHE = 200 * 1024 * 1024
+
+def semestre_encerrado(ano, periodo, hoje=None):
+    """
+    Um semestre que já terminou não muda mais de oferta, então sua página
+    pode ficar no cache para sempre. 1º período termina em julho, 2º em dezembro.
+    """
+    hoje = hoje or datetime.now()
+    try:
+        ano, periodo = int(ano), int(periodo)
+    except (TypeError, ValueError):
+        return False
+    periodo_atual = 1 if hoje.month <= 7 else 2
+    return (ano, periodo) < (hoje.year, periodo_atual)
+
+class CachePaginas:
+    """
+    Guarda o HTML bruto de cada busca em `diretorio`, chaveado por
+    (ano, período, departamento). Entradas de semestres em andamento expiram
+    após `ttl_horas`; ao passar de `tamanho_maximo` bytes, as entradas usadas
+    há mais tempo são removidas primeiro.
+    """
+
+    def __init__(self, diretorio=DIR_CACHE, ttl_horas=TTL_CACHE_HORAS, tamanho_maximo=TAMANHO_MAXIMO_CACHE):
+        self.diretorio = diretorio
+        self.ttl = ttl_horas * 3600
+        self.tamanho_maximo = tamanho_maximo
+        self.trava = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+
+    def _caminhos(self, ano, periodo, depto):
+        chave = hashlib.sha1(f"{ano}|{periodo}|{depto}".encode("utf-8")).hexdigest()[:16]
+        base = os.path.join(self.diretorio, f"{ano}-{periodo}-{chave}")
+        return base + ".html.gz", base + ".json"
+
+    def obter(self, ano, periodo, depto):
+        caminho_html, caminho_meta = self._caminhos(ano, periodo, depto)
+        try:
+            with open(caminho_meta, encoding="utf-8") as f:
+                meta = json.load(f)
+            if not semestre_encerrado(ano, periodo) and time.time() - meta["salvo_em"] > self.ttl:
+                return None
+            with gzip.open(caminho_html, "rt", encoding="utf-8") as f:
+                html = f.read()
+        except (OSError, ValueError, KeyError):
+            return None
+        os.utime(caminho_meta)  # marca o uso para a remoção por antiguidade
+        return html
+
+    def salvar(self, ano, periodo, depto, html):
+        caminho_html, caminho_meta = self._caminhos(ano, periodo, depto)
+        meta = {"ano": ano, "periodo": periodo, "departamento": str(depto), "salvo_em": time.time()}
+        try:
+            with gzip.open(caminho_html + ".tmp", "wt", encoding="utf-8") as f:
+                f.write(html)
+            os.replace(caminho_html + ".tmp", caminho_html)
+            with open(caminho_meta + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            os.replace(caminho_meta + ".tmp", caminho_meta)
+        except OSError as e:
+            print(f"[AVISO] Não foi possível gravar o cache de '{depto}': {e}")
+            return
+        self._limitar_tamanho()
+
+    def _entradas(self):
+        entradas = []
+        for nome in os.listdir(self.diretorio):
+            if nome.endswith(".json"):
+                base = os.path.join(self.diretorio, nome[:-len(".json")])
+                try:
+                    tamanho = os.path.getsize(base + ".json") + os.path.getsize(base + ".html.gz")
+                    entradas.append((os.path.getmtime(base + ".json"), tamanho, base))
+                except OSError:
+                    continue
+        return entradas
+
+    def _limitar_tamanho(self):
+        with self.trava:
+            entradas = sorted(self._entradas())
+            total = sum(t for _, t, _ in entradas)
+            while entradas and total > self.tamanho_maximo:
+                _, tamanho, base = entradas.pop(0)
+                self._remover(base)
+                total -= tamanho
+
+    def _remover(self, base):
+        for sufixo in (".json", ".html.gz"):
+            try:
+                os.remove(base + sufixo)
+            except OSError:
+                pass
+
+    def invalidar(self, ano=None, periodo=None):
+        prefixo = f"{ano}-{periodo}-" if ano and periodo else ""
+        removidas = 0
+        with self.trava:
+            for _, _, base in self._entradas():
+                if os.path.basename(base).startswith(prefixo):
+                    self._remover(base)
+                    removidas += 1
+        return removidas
+
+# === RECOLETA INCREMENTAL ===
+def impressao_digital(*partes):
+    return hashlib.sha1("\x1f".join(str(p) for p in partes).encode("utf-8")).hexdigest()
+
+def impressao_tabela(html):
+    """
+    Hash só da tabela 'listagem' (o resto da página muda a cada resposta,
+    p.ex. o ViewState). Usa lxml direto, bem mais barato que montar a árvore
+    do BeautifulSoup.
+    """
+    import lxml.html
+    try:
+        arvore = lxml.html.fromstring(html)
+    except (lxml.etree.ParserError, ValueError):
+        return impressao_digital("")
+    tabelas = arvore.xpath('//table[contains(concat(" ", normalize-space(@class), " "), " listagem ")]')
+    if not tabelas:
+        return impressao_digital("")
+    return hashlib.sha1(lxml.etree.tostring(tabelas[0], encoding="utf-8")).hexdigest()
+
+def impressao_cronograma_sala(dias):
+    return impressao_digital(json.dumps({dia: [a.como_dict() for a in aulas] for dia, aulas in dias.items() if aulas},
+                                        sort_keys=True, ensure_ascii=False))
+
+class EstadoIncremental:
+    """
+    Guarda, por (ano, período), a impressão digital da tabela de cada
+    departamento e os eventos gerados por cada linha de turma na última
+    execução. Departamentos com a mesma tabela reaproveitam tudo; nos
+    alterados só as linhas novas passam por processar_turma.
+    """
+
+    def __init__(self, ano, periodo, diretorio=os.path.join(DIR_CACHE, "incremental")):
+        os.makedirs(diretorio, exist_ok=True)
+        self.caminho = os.path.join(diretorio, f"{ano}-{periodo}.json")
+        self.departamentos = {}
+        self.salas = {}
+        self.trava = threading.Lock()
+        try:
+            with open(self.caminho, encoding="utf-8") as f:
+                dados = json.load(f)
+            self.departamentos = dados.get("departamentos", {})
+            self.salas = dados.get("salas", {})
+        except (OSError, ValueError):
+            pass
+
+    def extrair(self, depto, html, apenas_fcte=False):
+        chave = str(depto)
+        anterior = self.departamentos.get(chave, {})
+        impressao = impressao_tabela(html)
+        cron = novo_cronograma()
+
+        if anterior.get("tabela") == impressao:
+            print(f"[INCREMENTAL] {descrever_departamento(depto)} sem alterações, reaproveitando a execução anterior.")
+            for _, eventos in anterior["linhas"]:
+                for sala, dia, evento in eventos:
+                    adicionar_evento(cron, sala, dia, Aula.de_dict(evento))
+            return cron
+
+        linhas_anteriores = dict((fp, eventos) for fp, eventos in anterior.get("linhas", []))
+        linhas = []
+        reaproveitadas = 0
+        for linha in iterar_linhas_turmas(html, apenas_fcte):
+            fp = impressao_digital(*linha)
+            eventos = linhas_anteriores.get(fp)
+            try:
+                if eventos is not None:
+                    reaproveitadas += 1
+                    for sala, dia, evento in eventos:
+                        adicionar_evento(cron, sala, dia, Aula.de_dict(evento))
+                else:
+                    eventos = [[sala, dia, aula.como_dict()] for sala, dia, aula in processar_turma(cron, *linha)]
+            except Exception as e:
+                print(f"[ERRO] Falha ao processar linha de turma: {e}")
+                continue
+            if eventos:
+                linhas.append([fp, eventos])
+        print(f"[INCREMENTAL] {descrever_departamento(depto)} alterado: "
+              f"{len(linhas) - reaproveitadas} turma(s) processada(s), {reaproveitadas} reaproveitada(s).")
+        with self.trava:
+            self.departamentos[chave] = {"tabela": impressao, "linhas": linhas}
+        return cron
+
+    def resumo_mudancas(self, cron_main):
+        """
+        Compara o cronograma de cada sala com o da execução anterior e devolve
+        {"novas": [...], "alteradas": [...], "removidas": [...]}.
+        """
+        atuais = {sala: impressao_cronograma_sala(dias) for sala, dias in cron_main.items()}
+        mudancas = {
+            "novas": sorted(s for s in atuais if s not in self.salas),
+            "alteradas": sorted(s for s in atuais if s in self.salas and self.salas[s] != atuais[s]),
+            "removidas": sorted(s for s in self.salas if s not in atuais),
+        }
+        self.salas = atuais
+        return mudancas
+
+    def salvar(self):
+        with self.trava:
+            dados = {"departamentos": self.departamentos, "salas": self.salas}
+        with open(self.caminho + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(dados, f, ensure_ascii=False)
+        os.replace(self.caminho + ".tmp", self.caminho)
+
+def imprimir_mudancas(mudancas):
+    total = sum(len(v) for v in mudancas.values())
+    if not total:
+        print("[MUDANÇAS] Nenhuma sala mudou desde a última execução.")
+        return
+    print(f"[MUDANÇAS] {total} sala(s) afetada(s) desde a última execução:")
+    for tipo, salas in mudancas.items():
+        for sala in salas:
+            print(f"[MUDANÇAS]   {tipo[:-1]}: {sala}")
+
+# === DIÁRIO DA COLETA (RETOMADA APÓS QUEDA) ===
+class DiarioColeta:
+    """
+    Diário de uma coleta de (ano, período): cada departamento extraído vira
+    uma linha JSON assim que termina. Se o Chrome ou o SIGAA cair no meio, a
+    próxima execução retoma dos departamentos que faltam em vez de repetir
+    tudo. O diário é apagado quando a coleta termina; de semestre em
+    andamento, é descartado se não for tocado por `ttl_horas`. Com
+    `retomar=False` o diário anterior é ignorado e começa vazio.
+    """
+
+    def __init__(self, ano, periodo, retomar=True, diretorio=os.path.join(DIR_CACHE, "diario"),
+                 ttl_horas=TTL_CACHE_HORAS):
+        os.makedirs(diretorio, exist_ok=True)
+        self.caminho = os.path.join(diretorio, f"{ano}-{periodo}.jsonl")
+        self.departamentos = {}  # str(depto) -> cronograma salvo
+        self.trava = threading.Lock()
+        try:
+            expirado = (not semestre_encerrado(ano, periodo)
+                        and time.time() - os.path.getmtime(self.caminho) > ttl_horas * 3600)
+            if expirado or not retomar:
+                os.remove(self.caminho)
+                return
+            with open(self.caminho, encoding="utf-8") as f:
+                for linha in f:
+                    try:
+                        registro = json.loads(linha)
+                    except ValueError:
+                        continue  # linha cortada por uma queda durante a gravação
+                    cron = novo_cronograma()
+                    for sala, dia, evento in registro["eventos"]:
+                        cron[sala][dia].append(Aula.de_dict(evento))
+                    self.departamentos[registro["departamento"]] = cron
+        except OSError:
+            pass
+
+    def concluido(self, depto):
+        return self.departamentos.get(str(depto))
+
+    def registrar(self, depto, cron):
+        registro = {
+            "departamento": str(depto),
+            "salvo_em": time.time(),
+            "eventos": [[sala, dia, aula.como_dict()] for sala, dias in cron.items()
+                        for dia, aulas in dias.items() for aula in aulas],
+        }
+        linha = json.dumps(registro, ensure_ascii=False)
+        with self.trava:
+            try:
+                with open(self.caminho, "a", encoding="utf-8") as f:
+                    f.write(linha + "\n")
+                    f.flush()
+                    os.fsync(f.fileno())
+            except OSError as e:
+                print(f"[AVISO] Não foi possível gravar o diário de '{depto}': {e}")
+
+    def encerrar(self):
+        try:
+            os.remove(self.caminho)
+        except OSError:
+            pass
+
+# === EXPORTAÇÃO ESTRUTURADA DOS EVENTOS ===
+COLUNAS_EVENTOS = ["room", "day", "start", "end", "code", "turma", "discipline", "docente"]
+FORMATOS_EXPORTACAO = {".jsonl": "jsonl", ".json": "jsonl", ".csv": "csv", ".parquet": "parquet"}
+LOTE_PARQUET = 5000
+
+def formato_por_extensao(caminho):
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao not in FORMATOS_EXPORTACAO:
+        raise ValueError(f"Extensão '{extensao}' não suportada. Use uma de: {', '.join(FORMATOS_EXPORTACAO)}")
+    return FORMATOS_EXPORTACAO[extensao]
+
+def iterar_eventos(cron):
+    # Uma linha por aula já mesclada, na ordem sala -> dia da semana -> horário
+    for sala in sorted(cron):
+        dias = cron[sala]
+        for dia in sorted(dias, key=lambda d: INDICE_DIA.get(d, 99)):
+            for aula in dias[dia]:
+                yield {
+                    "room": sala,
+                    "day": dia,
+                    "start": formatar_minutos(aula.inicio),
+                    "end": formatar_minutos(aula.fim),
+                    "code": aula.codigo,
+                    "turma": aula.turma,
+                    "discipline": aula.disciplina,
+                    "docente": aula.docente,
+                }
+
+def _gravar_parquet(eventos, caminho):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Exportar em Parquet requer o pacote pyarrow (pip install pyarrow).")
+    esquema = pa.schema([(coluna, pa.string()) for coluna in COLUNAS_EVENTOS])
+    with pq.ParquetWriter(caminho, esquema) as escritor:
+        lote = []
+        for evento in eventos:
+            lote.append(evento)
+            if len(lote) >= LOTE_PARQUET:
+                escritor.write_table(pa.Table.from_pylist(lote, schema=esquema))
+                lote = []
+        if lote:
+            escritor.write_table(pa.Table.from_pylist(lote, schema=esquema))
+
+def exportar_eventos(eventos, caminho, formato=None):
+    """
+    Grava a tabela normalizada de eventos (uma linha por aula) em JSON Lines,
+    CSV ou Parquet, linha a linha (em lotes no Parquet), sem montar a tabela
+    inteira em memória. `eventos` pode ser um cronograma ou um iterável de
+    dicionários com COLUNAS_EVENTOS. Devolve o número de linhas gravadas.
+    """
+    formato = formato or formato_por_extensao(caminho)
+    with METRICAS.etapa("exportar_eventos", formato=formato):
+        return _exportar_eventos(eventos, caminho, formato)
+
+def _exportar_eventos(eventos, caminho, formato):
+    if isinstance(eventos, dict):
+        eventos = iterar_eventos(eventos)
+    total = 0
+
+    def contar(iteravel):
+        nonlocal total
+        for evento in iteravel:
+            total += 1
+            yield evento
+
+    diretorio = os.path.dirname(os.path.abspath(caminho))
+    os.makedirs(diretorio, exist_ok=True)
+    temporario = caminho + ".tmp"
+    if formato == "jsonl":
+        with open(temporario, "w", encoding="utf-8") as f:
+            for evento in contar(eventos):
+                f.write(json.dumps(evento, ensure_ascii=False))
+                f.write("\n")
+    elif formato == "csv":
+        with open(temporario, "w", encoding="utf-8", newline="") as f:
+            escritor = csv.DictWriter(f, fieldnames=COLUNAS_EVENTOS)
+            escritor.writeheader()
+            for evento in contar(eventos):
+                escritor.writerow(evento)
+    elif formato == "parquet":
+        _gravar_parquet(contar(eventos), temporario)
+    else:
+        raise ValueError(f"Formato de exportação desconhecido: '{formato}'")
+    os.replace(temporario, caminho)
+    print(f"Eventos exportados ({formato}, {total} linhas): {caminho}")
+    return total
+
+def ler_eventos(caminho, formato=None):
+    """
+    Lê de volta, linha a linha, um arquivo gravado por exportar_eventos.
+    """
+    formato = formato or formato_por_extensao(caminho)
+    if formato == "jsonl":
+        with open(caminho, encoding="utf-8") as f:
+            for linha in f:
+                if linha.strip():
+                    yield json.loads(linha)
+    elif formato == "csv":
+        with open(caminho, encoding="utf-8", newline="") as f:
+            yield from csv.DictReader(f)
+    elif formato == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Ler Parquet requer o pacote pyarrow (pip install pyarrow).")
+        for lote in pq.ParquetFile(caminho).iter_batches(columns=COLUNAS_EVENTOS):
+            yield from lote.to_pylist()
+    else:
+        raise ValueError(f"Formato de exportação desconhecido: '{formato}'")
+
+def carregar_eventos(caminho, formato=None):
+    """
+    Remonta o cronograma sala -> dia -> aulas a partir de um arquivo exportado,
+    pronto para gerar_docx, sem precisar do SIGAA.
+    """
+    cron = novo_cronograma()
+    for evento in ler_eventos(caminho, formato):
+        cron[sys.intern(evento["room"])][evento["day"]].append(Aula(
+            horario_para_minutos(evento["start"]), horario_para_minutos(evento["end"]),
+            evento["code"], evento["turma"], evento["discipline"], evento["docente"],
+        ))
+    return cron
+
+# === ÍNDICE DE OCUPAÇÃO DAS SALAS ===
+# Janela padrão das consultas de horários livres: do primeiro ao último bloco do mapa
+JANELA_OCUPACAO = (HORARIOS_FIXOS_MINUTOS[0][0], HORARIOS_FIXOS_MINUTOS[-1][1])
+
+class IndiceOcupacao:
+    """
+    Índice sala -> dia -> aulas ordenadas pelo início, guardando também o
+    maior fim de cada prefixo. "A sala está ocupada entre X e Y?" sai com uma
+    busca binária, e listar as k aulas que se sobrepõem custa O(log n + k).
+    """
+
+    def __init__(self, cron):
+        self.salas = {}
+        for sala, dias in cron.items():
+            por_dia = {}
+            for dia, aulas in dias.items():
+                if not aulas:
+                    continue
+                ordenadas = sorted(aulas, key=lambda a: (a.inicio, a.fim))
+                maior_fim, acumulado = 0, []
+                for aula in ordenadas:
+                    maior_fim = max(maior_fim, aula.fim)
+                    acumulado.append(maior_fim)
+                por_dia[dia] = (ordenadas, [a.inicio for a in ordenadas], acumulado)
+            if por_dia:
+                self.salas[sala] = por_dia
+
+    def sala(self, nome):
+        # Aceita tanto "FCTE - I1" quanto só "I1"
+        if nome in self.salas:
+            return nome
+        return f"FCTE - {nome.strip()}" if f"FCTE - {nome.strip()}" in self.salas else nome
+
+    def sobrepostas(self, sala, dia, inicio, fim):
+        entrada = self.salas.get(sala, {}).get(dia)
+        if not entrada:
+            return []
+        aulas, inicios, maior_fim = entrada
+        # Só as aulas que começam antes de `fim` podem se sobrepor; voltando a
+        # partir da última delas, para quando nenhuma anterior passa de `inicio`
+        i = bisect_left(inicios, fim) - 1
+        encontradas = []
+        while i >= 0 and maior_fim[i] > inicio:
+            if aulas[i].fim > inicio:
+                encontradas.append(aulas[i])
+            i -= 1
+        return encontradas[::-1]
+
+    def ocupada(self, sala, dia, inicio, fim):
+        entrada = self.salas.get(sala, {}).get(dia)
+        if not entrada:
+            return False
+        _, inicios, maior_fim = entrada
+        i = bisect_left(inicios, fim)
+        return i > 0 and maior_fim[i - 1] > inicio
+
+    def salas_livres(self, dia, inicio, fim):
+        return [sala for sala in sorted(self.salas) if not self.ocupada(sala, dia, inicio, fim)]
+
+    def horarios_livres(self, sala, dia, inicio=JANELA_OCUPACAO[0], fim=JANELA_OCUPACAO[1]):
+        livres, cursor = [], inicio
+        for aula in self.sobrepostas(sala, dia, inicio, fim):
+            if aula.inicio > cursor:
+                livres.append((cursor, aula.inicio))
+            cursor = max(cursor, aula.fim)
+        if cursor < fim:
+            livres.append((cursor, fim))
+        return livres
+
+    def conflitos(self):
+        """
+        Gera (sala, dia, aula, outra) para cada par de aulas que ocupam a mesma
+        sala ao mesmo tempo. Aulas encostadas (uma termina quando a outra
+        começa) não contam.
+        """
+        for sala in sorted(self.salas):
+            dias = self.salas[sala]
+            for dia in sorted(dias, key=lambda d: INDICE_DIA.get(d, 99)):
+                ativas = []
+                for aula in dias[dia][0]:
+                    ativas = [a for a in ativas if a.fim > aula.inicio]
+                    for outra in ativas:
+                        yield sala, dia, outra, aula
+                    ativas.append(aula)
+
+def descrever_aula(aula):
+    return f"{formatar_minutos(aula.inicio)}–{formatar_minutos(aula.fim)} {aula.codigo} turma {aula.turma}"
+
+def imprimir_conflitos(conflitos):
+    conflitos = list(conflitos)
+    if conflitos:
+        print(f"[CONFLITO] {len(conflitos)} choque(s) de horário na mesma sala "
+              "(no DOCX, a última aula sobrescreve a outra na célula):")
+    for sala, dia, aula, outra in conflitos:
+        print(f"[CONFLITO]   {sala}, {dia}: {descrever_aula(aula)} x {descrever_aula(outra)}")
+    return len(conflitos)
+
+def ler_horario(texto):
+    # "14h00", "14:00", "14h" ou "14" -> minutos
+    m = re.fullmatch(r"(\d{1,2})(?:[h:](\d{2})?)?", texto.strip().lower())
+    if not m:
+        raise ValueError(f"Horário inválido: '{texto}' (use p.ex. 14h00)")
+    return int(m.group(1)) * 60 + int(m.group(2) or 0)
+
+def _sem_acentos(texto):
+    return unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode().lower()
+
+def ler_dia(texto):
+    # Nome do dia (com ou sem acento, ao menos 3 letras) ou dígito do SIGAA (2 = Segunda)
+    if texto in DIAS_SEMANA:
+        return DIAS_SEMANA[texto]
+    alvo = _sem_acentos(texto.strip())
+    for dia in DIAS_ORDEM:
+        if len(alvo) >= 3 and _sem_acentos(dia).startswith(alvo):
+            return dia
+    raise ValueError(f"Dia inválido: '{texto}' (use p.ex. Terça ou 3)")
+
+def consultar_ocupacao(snapshot=None, livres=None, vagas=None, conflitos=False):
+    """
+    Consultas sobre um snapshot salvo, sem acessar o SIGAA: salas livres num
+    intervalo (`livres` = (dia, início, fim)), horários livres de uma sala
+    (`vagas` = (sala, dia)) e choques de horário.
+    """
+    try:
+        snapshot = snapshot or ARQUIVO_SNAPSHOT
+        if not os.path.exists(snapshot):
+            raise FileNotFoundError(f"Snapshot não encontrado: {snapshot}. Execute o scraping primeiro.")
+        indice = IndiceOcupacao(carregar_eventos(snapshot))
+
+        if livres:
+            dia, inicio, fim = ler_dia(livres[0]), ler_horario(livres[1]), ler_horario(livres[2])
+            salas = indice.salas_livres(dia, inicio, fim)
+            print(f"{len(salas)} sala(s) livre(s) {dia}, {formatar_minutos(inicio)}–{formatar_minutos(fim)}:")
+            for sala in salas:
+                print(f"  {sala}")
+
+        if vagas:
+            sala, dia = indice.sala(vagas[0]), ler_dia(vagas[1])
+            if sala not in indice.salas:
+                raise ValueError(f"Sala '{vagas[0]}' não aparece no snapshot.")
+            print(f"Horários livres de {sala}, {dia}:")
+            for inicio, fim in indice.horarios_livres(sala, dia):
+                print(f"  {formatar_minutos(inicio)}–{formatar_minutos(fim)}")
+
+        if conflitos and not imprimir_conflitos(indice.conflitos()):
+            print("Nenhum choque de horário encontrado.")
+        return True, snapshot
+    except Exception as e:
+        print(f"Erro na consulta: {str(e)}")
+        return False, str(e)
+
 # === MAIN ===
-def executar_scraping():
+DEPARTAMENTO_FCTE = 2  # índice no select formTurma:inputDepto
+
+DEPARTAMENTOS_EXTERNOS = [
+    "INSTITUTO DE FÍSICA - BRASÍLIA",
+    "INSTITUTO DE QUÍMICA - BRASÍLIA",
+    "DEPARTAMENTO DE MATEMÁTICA - BRASÍLIA",
+    "DEPARTAMENTO DE ENGENHARIA MECANICA - BRASÍLIA",
+    "DEPTO CIÊNCIAS DA COMPUTAÇÃO - BRASÍLIA"
+]
+
+def descrever_departamento(depto):
+    return depto if isinstance(depto, str) else f"FCTE (índice {depto})"
+
+def departamentos_da_busca():
+    # (departamento, apenas_fcte): a FCTE entra inteira, os demais só com salas FCTE/FGA
+    return [(DEPARTAMENTO_FCTE, False)] + [(depto, True) for depto in DEPARTAMENTOS_EXTERNOS]
+
+def mesclar_cronogramas(cron_main, cron_ex):
+    for s, d in cron_ex.items():
+        for dia, aulas in d.items():
+            cron_main[s][dia].extend(aulas)
+    return cron_main
+
+# === DESCOBERTA DE DEPARTAMENTOS ===
+ARQUIVO_DEPARTAMENTOS = os.path.join(BASE_DIR, ".cache", "departamentos.json")
+MODOS_DEPARTAMENTOS = ("indice", "varrer", "fixos")
+SEMESTRES_RELEVANTES = 4        # sem aulas FCTE/FGA nos últimos N semestres registrados, o departamento sai da busca
+INTERVALO_VARREDURA_DIAS = 30   # departamentos fora da busca são conferidos de novo depois desse prazo
+VARREDURA_POR_EXECUCAO = 2      # quantos deles cada coleta confere, no máximo (--varredura; 0 = nenhum)
+
+def departamentos_do_select(opcoes):
+    """
+    Nomes das opções (valor, texto) do select formTurma:inputDepto, na ordem
+    do SIGAA, sem a opção vazia ("-- SELECIONE --") e sem a própria FCTE,
+    que é buscada inteira pelo índice DEPARTAMENTO_FCTE.
+    """
+    nomes = []
+    for i, (valor, texto) in enumerate(opcoes):
+        if i == DEPARTAMENTO_FCTE or not texto or str(valor).strip() in ("", "0", "-1") or "SELECIONE" in texto.upper():
+            continue
+        nomes.append(texto)
+    return list(dict.fromkeys(nomes))
+
+def chave_semestre(semestre):
+    ano, _, periodo = semestre.partition(".")
+    return int(ano), int(periodo or 0)
+
+class IndiceDepartamentos:
+    """
+    Índice persistente de quais departamentos do SIGAA tiveram aulas em salas
+    FCTE/FGA em cada semestre coletado, mais a lista de opções do select de
+    departamentos vista na última coleta e a latência média das buscas de
+    cada departamento (a referência de lentidão do AgendadorBuscas, que assim
+    vale desde a primeira busca de cada coleta). Com ele a busca padrão só visita a
+    FCTE e os departamentos que usam as salas, e confere os demais aos
+    poucos (`varredura` por coleta, cada um a cada INTERVALO_VARREDURA_DIAS)
+    para descobrir quem passou a usá-las.
+    """
+
+    def __init__(self, caminho=ARQUIVO_DEPARTAMENTOS):
+        self.caminho = caminho
+        self.opcoes = []         # nomes do select, na ordem do SIGAA
+        self.departamentos = {}  # nome -> {"semestres": {"2025.1": aulas}, "verificado_em": ts}
+        self.latencias = {}      # descrever_departamento() -> média móvel da latência da busca, em s
+        self.trava = threading.Lock()
+        try:
+            with open(caminho, encoding="utf-8") as f:
+                dados = json.load(f)
+            self.opcoes = dados.get("opcoes", [])
+            self.departamentos = dados.get("departamentos", {})
+            self.latencias = dados.get("latencias", {})
+        except OSError:
+            pass
+        except ValueError as e:
+            print(f"[AVISO] Índice de departamentos ilegível ({e}); recomeçando do zero.")
+
+    def atualizar_opcoes(self, opcoes):
+        nomes = departamentos_do_select(opcoes)
+        if nomes:
+            with self.trava:
+                self.opcoes = nomes
+
+    def _opcao(self, nome):
+        # Mesmo critério da busca por nome: texto exato ou, senão, o primeiro que o contém
+        if not self.opcoes or nome in self.opcoes:
+            return nome
+        return next((opcao for opcao in self.opcoes if nome.lower() in opcao.lower()), None)
+
+    def _relevante(self, nome, fixo=False):
+        semestres = sorted(self.departamentos.get(nome, {}).get("semestres", {}).items(),
+                           key=lambda par: chave_semestre(par[0]))
+        if any(aulas > 0 for _, aulas in semestres[-SEMESTRES_RELEVANTES:]):
+            return True
+        # Os da lista fixa só saem depois de SEMESTRES_RELEVANTES semestres registrados sem aulas
+        return fixo and len(semestres) < SEMESTRES_RELEVANTES
+
+    def planejar(self, varredura=VARREDURA_POR_EXECUCAO, varrer_tudo=False, agora=None):
+        """
+        Devolve (relevantes, varredura): os departamentos com aulas em salas
+        FCTE/FGA nos últimos SEMESTRES_RELEVANTES semestres registrados (mais
+        os de DEPARTAMENTOS_EXTERNOS ainda sem esse histórico) e até
+        `varredura` dos demais a conferir nesta coleta (todos, com `varrer_tudo`).
+        """
+        agora = time.time() if agora is None else agora
+        with self.trava:
+            relevantes = []
+            for nome in dict.fromkeys(list(DEPARTAMENTOS_EXTERNOS) + list(self.departamentos)):
+                opcao = self._opcao(nome)
+                if not self._relevante(opcao or nome, fixo=nome in DEPARTAMENTOS_EXTERNOS):
+                    continue
+                if opcao is None:
+                    print(f"[AVISO] Departamento '{nome}' não aparece mais no SIGAA; fica fora da busca.")
+                elif opcao not in relevantes:
+                    relevantes.append(opcao)
+            posicao = {nome: i for i, nome in enumerate(self.opcoes)}
+            relevantes.sort(key=lambda nome: posicao.get(nome, len(posicao)))
+
+            restantes = [nome for nome in self.opcoes if nome not in relevantes]
+            if varrer_tudo:
+                return relevantes, restantes
+            if varredura <= 0:
+                return relevantes, []
+            verificado = lambda nome: self.departamentos.get(nome, {}).get("verificado_em", 0)
+            prazo = agora - INTERVALO_VARREDURA_DIAS * 86400
+            vencidos = sorted((nome for nome in restantes if verificado(nome) < prazo), key=verificado)
+            escolhidos = set(vencidos[:varredura])
+            return relevantes, [nome for nome in restantes if nome in escolhidos]
+
+    def registrar(self, nome, ano, periodo, aulas):
+        # Devolve True se o departamento passou a ter aulas em salas FCTE/FGA
+        with self.trava:
+            info = self.departamentos.setdefault(nome, {"semestres": {}})
+            novo = aulas > 0 and not any(info["semestres"].values()) and nome not in DEPARTAMENTOS_EXTERNOS
+            info["semestres"][f"{ano}.{periodo}"] = aulas
+            info["verificado_em"] = time.time()
+            return novo
+
+    def atualizar_latencias(self, latencias):
+        with self.trava:
+            self.latencias.update(latencias)
+
+    def salvar(self):
+        with self.trava:
+            dados = {"opcoes": self.opcoes, "departamentos": self.departamentos, "latencias": self.latencias}
+        temporario = f"{self.caminho}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump(dados, f, ensure_ascii=False)
+            os.replace(temporario, self.caminho)
+        except OSError as e:
+            print(f"[AVISO] Não foi possível gravar o índice de departamentos: {e}")
+
+def descobrir_departamentos(backend="selenium", url=URL_TURMAS, pool=None):
+    # Abre um navegador/sessão só para ler as opções do select de departamentos
+    print("Listando os departamentos do SIGAA...")
+    coletor = pool.obter() if pool else criar_backend(backend, url)
     try:
-        print("Iniciando processo de scraping do SIGAA...")
-        driver, wait = configurar_driver()
-        fechar_modal_cookies(wait)
-        if len(sys.argv) > 2:
-            ano = sys.argv[1]
-            periodo = sys.argv[2]
+        return coletor.listar_departamentos()
+    finally:
+        if pool:
+            pool.devolver(coletor)
         else:
+            coletor.fechar()
+
+def planejar_departamentos(modo="indice", indice=None, backend="selenium", url=URL_TURMAS, pool=None,
+                           varredura=VARREDURA_POR_EXECUCAO):
+    """
+    Lista (departamento, apenas_fcte) de uma coleta. "fixos" é a lista fixa
+    de departamentos_da_busca(); "indice" busca a FCTE, os departamentos que
+    usaram salas FCTE/FGA segundo o IndiceDepartamentos e, com `varredura`,
+    até esse número dos demais; "varrer" busca todos os departamentos do
+    select (listando-os antes, se o índice ainda não os conhece).
+    """
+    if modo not in MODOS_DEPARTAMENTOS:
+        raise ValueError(f"Modo de departamentos desconhecido: '{modo}'. Opções: {', '.join(MODOS_DEPARTAMENTOS)}")
+    if modo == "fixos" or indice is None:
+        return departamentos_da_busca()
+    if backend != "selenium":
+        pool = None
+    if modo == "varrer" and not indice.opcoes:
+        indice.atualizar_opcoes(descobrir_departamentos(backend, url, pool))
+    relevantes, varredura = indice.planejar(varredura, varrer_tudo=modo == "varrer")
+    print(f"[DEPARTAMENTOS] FCTE + {len(relevantes)} departamento(s) com aulas em salas FCTE/FGA"
+          + (f"; conferindo também {len(varredura)} outro(s)." if varredura else "."))
+    return [(DEPARTAMENTO_FCTE, False)] + [(nome, True) for nome in relevantes + varredura]
+
+# === AGENDADOR DE BUSCAS AO SIGAA ===
+TAXA_BUSCAS = 2.0        # buscas por segundo somando todos os trabalhadores (--taxa; 0 desliga)
+RAJADA_BUSCAS = 3        # buscas que podem sair juntas depois de um tempo parado
+FATOR_LENTIDAO = 3.0     # busca "lenta": mais que isso vezes a latência média das buscas do mesmo departamento...
+LENTIDAO_MINIMA = 1.0    # ...e mais que esses segundos
+SUAVIZACAO_LATENCIA = 0.3  # peso da busca mais recente na média móvel exponencial da latência
+
+class BaldeFichas:
+    """
+    Limite de taxa por balde de fichas: cada busca gasta uma ficha, o balde
+    ganha `taxa` fichas por segundo e guarda no máximo `rajada`. Quem chega
+    sem ficha reserva a próxima e dorme até ela existir, então a ordem de
+    chegada é respeitada.
+    """
+
+    def __init__(self, taxa, rajada=RAJADA_BUSCAS):
+        self.taxa = taxa
+        self.rajada = max(1, rajada)
+        self.fichas = float(self.rajada)
+        self.ultimo = time.monotonic()
+        self.trava = threading.Lock()
+
+    def aguardar(self):
+        if not self.taxa or self.taxa <= 0:
+            return 0.0
+        with self.trava:
+            agora = time.monotonic()
+            self.fichas = min(self.rajada, self.fichas + (agora - self.ultimo) * self.taxa)
+            self.ultimo = agora
+            self.fichas -= 1
+            espera = -self.fichas / self.taxa if self.fichas < 0 else 0.0
+        if espera:
+            time.sleep(espera)
+        return espera
+
+class ConcorrenciaAdaptativa:
+    """
+    Quantas buscas podem estar em andamento ao mesmo tempo, ajustado por
+    AIMD: cada busca rápida e bem-sucedida soma 1/limite (cerca de +1 por
+    rodada completa) e um erro ou uma busca lenta corta o limite pela metade,
+    no mínimo 1. Buscas que já estavam em andamento quando o limite caiu não
+    o cortam de novo.
+
+    A lentidão é medida contra a média móvel das buscas anteriores da mesma
+    `chave` (o departamento), porque o tempo de uma busca depende sobretudo
+    do tamanho do departamento. As médias de coletas anteriores chegam em
+    `latencias` (IndiceDepartamentos); sem histórico da chave, só erros contam.
+    """
+
+    def __init__(self, maximo, latencias=None):
+        self.maximo = max(1, maximo)
+        self.limite = float(self.maximo)
+        self.minimo_atingido = self.limite
+        self.ativos = 0
+        self.latencias = dict(latencias or {})  # chave -> média móvel exponencial da latência das buscas bem-sucedidas
+        self.ultima_reducao = 0.0
+        self.condicao = threading.Condition()
+
+    def entrar(self):
+        with self.condicao:
+            while self.ativos >= int(self.limite):
+                self.condicao.wait()
+            self.ativos += 1
+
+    def sair(self, inicio, sucesso, chave=None):
+        latencia = time.monotonic() - inicio
+        with self.condicao:
+            self.ativos -= 1
+            media = self.latencias.get(chave)
+            lenta = (sucesso and media is not None and latencia > LENTIDAO_MINIMA
+                     and latencia > FATOR_LENTIDAO * media)
+            if sucesso and chave is not None:
+                self.latencias[chave] = (latencia if media is None
+                                         else media + SUAVIZACAO_LATENCIA * (latencia - media))
+            if not sucesso or lenta:
+                if inicio >= self.ultima_reducao:
+                    self.limite = max(1.0, self.limite / 2)
+                    self.minimo_atingido = min(self.minimo_atingido, self.limite)
+                    self.ultima_reducao = time.monotonic()
+                    METRICAS.contar("reducoes_de_concorrencia")
+                    motivo = "Erro" if not sucesso else f"Busca lenta de {chave} ({latencia:.1f}s; média {media:.1f}s)"
+                    print(f"[AGENDADOR] {motivo}; "
+                          f"até {int(self.limite)} busca(s) ao mesmo tempo.")
+            else:
+                self.limite = min(self.maximo, self.limite + 1 / self.limite)
+            self.condicao.notify_all()
+
+class AgendadorBuscas:
+    """
+    Ponto único por onde passam as buscas de uma coleta (ou de um lote
+    inteiro, se compartilhado): respeita o BaldeFichas de `taxa` buscas/s e
+    a ConcorrenciaAdaptativa de até `concorrencia` buscas simultâneas, e
+    informa a ela o resultado e a latência de cada uma (por `chave`, o
+    departamento buscado).
+    """
+
+    def __init__(self, concorrencia=1, taxa=None, rajada=RAJADA_BUSCAS, latencias=None):
+        self.balde = BaldeFichas(taxa, rajada)
+        self.concorrencia = ConcorrenciaAdaptativa(concorrencia, latencias)
+        self.buscas = 0
+        self.falhas = 0
+        self.espera_total = 0.0
+        self.trava = threading.Lock()
+
+    def executar(self, buscar, *args, chave=None):
+        # `buscar` devolve True se a busca trouxe a página; exceção também conta como falha
+        self.concorrencia.entrar()
+        espera = self.balde.aguardar()
+        inicio = time.monotonic()  # a latência não inclui a espera pela ficha
+        sucesso = False
+        try:
+            sucesso = bool(buscar(*args))
+            return sucesso
+        finally:
+            self.concorrencia.sair(inicio, sucesso, chave)
+            with self.trava:
+                self.buscas += 1
+                self.falhas += not sucesso
+                self.espera_total += espera
+
+    def latencias(self):
+        # Médias por departamento, para o IndiceDepartamentos guardar até a próxima coleta
+        with self.concorrencia.condicao:
+            return dict(self.concorrencia.latencias)
+
+    def resumo(self):
+        with self.trava:
+            return (f"{self.buscas} busca(s), {self.falhas} com falha; concorrência final "
+                    f"{int(self.concorrencia.limite)} (mínima {int(self.concorrencia.minimo_atingido)}), "
+                    f"{self.espera_total:.1f}s esperando pelo limite de taxa")
+
+TENTATIVAS_DEPARTAMENTO = 3
+ESPERA_NOVA_TENTATIVA = 2.0  # segundos antes da 2ª tentativa (±50%); dobra a cada falha
+
+def coletar_departamentos(ano, periodo, backend="selenium", extracao="snapshot", concorrencia=1,
+                          url=URL_TURMAS, cache=None, atualizar=False, incremental=None, pool=None,
+                          diario=None, departamentos=None, indice=None, agendador=None):
+    """
+    Busca todos os departamentos com até `concorrencia` trabalhadores, cada um
+    com seu próprio navegador/sessão HTTP. As linhas de cada página vão direto
+    para um DestinoSalas compartilhado, então a memória não guarda um
+    cronograma por departamento; o resultado sai na ordem de `departamentos`
+    (lista de planejar_departamentos; padrão: departamentos_da_busca()),
+    independente de quem terminar antes.
+
+    Com `cache`, páginas já salvas são lidas do disco e o navegador/sessão só
+    é aberto se algum departamento faltar; `atualizar` ignora o que está salvo.
+    Com `incremental` (EstadoIncremental), as páginas são sempre buscadas de
+    novo, mas só o que mudou desde a execução anterior é reprocessado.
+    Com `pool` (PoolNavegadores), o backend selenium usa navegadores já
+    abertos e os devolve ao pool no fim, em vez de fechá-los.
+
+    Um departamento que falha (busca recusada, navegador caído, timeout) é
+    tentado de novo com outro navegador/sessão até TENTATIVAS_DEPARTAMENTO
+    vezes, com espera exponencial. Com `diario` (DiarioColeta), cada
+    departamento concluído é gravado e os já gravados por uma execução que
+    caiu são reaproveitados sem nova busca. Com `indice`
+    (IndiceDepartamentos), as opções do select e as aulas em salas FCTE/FGA
+    de cada departamento buscado são registradas no índice.
+
+    Toda busca passa pelo `agendador` (AgendadorBuscas; padrão: um só desta
+    coleta, sem limite de taxa), que reduz a concorrência quando o SIGAA
+    erra ou fica lento e a recupera aos poucos. As novas tentativas esperam
+    um tempo com sorteio (±50%), para os trabalhadores não voltarem juntos.
+    """
+    if backend != "selenium":
+        pool = None
+    deptos = departamentos if departamentos is not None else departamentos_da_busca()
+    if extracao == "webdriver":
+        cache = None  # a leitura célula a célula não passa pelo HTML salvo
+        incremental = None
+    if incremental is not None:
+        atualizar = True
+    fila = queue.Queue()
+    for idx in range(len(deptos)):
+        fila.put(idx)
+    destino = DestinoSalas()
+    concluidos = [False] * len(deptos)
+    erros = []
+    opcoes_lidas = threading.Event()
+    proprio_agendador = agendador is None
+    if proprio_agendador:
+        agendador = AgendadorBuscas(concorrencia, latencias=indice.latencias if indice is not None else None)
+
+    def liberar(coletor):
+        if pool:
+            pool.devolver(coletor)  # o pool recicla o navegador que não voltar ao formulário
+            return
+        try:
+            coletor.fechar()
+        except Exception as e:
+            print(f"[AVISO] Falha ao fechar o navegador/sessão: {e}")
+
+    def buscar_e_extrair(coletor, idx, depto, apenas_fcte):
+        if isinstance(depto, str):
+            print(f"\n[{idx+1}/{len(deptos)}] Processando departamento: {depto}")
+        if not agendador.executar(coletor.buscar_departamento, depto, chave=descrever_departamento(depto)):
+            return False
+        with METRICAS.etapa("extrair_dados", departamento=descrever_departamento(depto)):
+            if extracao == "webdriver":
+                destino.absorver(idx, coletor.extrair(apenas_fcte=apenas_fcte, modo=extracao))
+                return True
+            html = coletor.html_resultados()
+            if cache:
+                cache.salvar(ano, periodo, depto, html)
+            print("Extraindo dados da tabela...")
+            if incremental is not None:
+                destino.absorver(idx, incremental.extrair(depto, html, apenas_fcte))
+            else:
+                encaminhar_tabela(html, apenas_fcte, destino, idx)
+        return True
+
+    def trabalhador():
+        coletor = None
+        try:
+            while True:
+                try:
+                    idx = fila.get_nowait()
+                except queue.Empty:
+                    return
+                depto, apenas_fcte = deptos[idx]
+                nome = descrever_departamento(depto)
+                salvo = diario.concluido(depto) if diario is not None else None
+                if salvo is not None:
+                    print(f"[DIÁRIO] Departamento {nome} retomado da execução interrompida.")
+                    METRICAS.contar("departamentos_retomados")
+                    destino.absorver(idx, salvo)
+                    concluidos[idx] = True
+                    continue
+
+                html = cache.obter(ano, periodo, depto) if cache and not atualizar else None
+                if html is not None:
+                    print(f"[CACHE] Departamento {nome} lido do cache.")
+                    METRICAS.contar("paginas_do_cache")
+                    with METRICAS.etapa("extrair_dados", departamento=nome):
+                        encaminhar_tabela(html, apenas_fcte, destino, idx)
+                    concluidos[idx] = True
+                else:
+                    for tentativa in range(1, TENTATIVAS_DEPARTAMENTO + 1):
+                        try:
+                            if coletor is None:
+                                coletor = pool.obter() if pool else criar_backend(backend, url)
+                                if not coletor.definir_ano_e_periodo(ano, periodo):
+                                    raise RuntimeError(f"não foi possível definir o semestre {ano}.{periodo}")
+                                if indice is not None and not opcoes_lidas.is_set():
+                                    opcoes_lidas.set()
+                                    indice.atualizar_opcoes(coletor.listar_departamentos())
+                            if buscar_e_extrair(coletor, idx, depto, apenas_fcte):
+                                concluidos[idx] = True
+                                break
+                            motivo = "a busca não trouxe a listagem"
+                        except Exception as e:
+                            motivo = str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__
+                        destino.descartar(idx)
+                        if coletor is not None:
+                            liberar(coletor)
+                            coletor = None
+                        if tentativa == TENTATIVAS_DEPARTAMENTO:
+                            print(f"[ERRO] Departamento {nome} falhou {tentativa} vezes; desistindo ({motivo}).")
+                            METRICAS.contar("departamentos_com_falha")
+                            erros.append(motivo)
+                            break
+                        espera = ESPERA_NOVA_TENTATIVA * 2 ** (tentativa - 1) * random.uniform(0.5, 1.5)
+                        print(f"[AVISO] Departamento {nome}: tentativa {tentativa} falhou ({motivo}); "
+                              f"nova tentativa em {espera:.1f}s.")
+                        METRICAS.contar("novas_tentativas")
+                        time.sleep(espera)
+
+                if concluidos[idx] and diario is not None:
+                    diario.registrar(depto, destino.parte(idx))
+        finally:
+            if coletor is not None:
+                liberar(coletor)
+
+    num_trabalhadores = max(1, min(concorrencia, len(deptos)))
+    if num_trabalhadores > 1:
+        print(f"Buscando {len(deptos)} departamentos com {num_trabalhadores} trabalhadores em paralelo...")
+    with ThreadPoolExecutor(max_workers=num_trabalhadores) as executor:
+        for futuro in [executor.submit(trabalhador) for _ in range(num_trabalhadores)]:
+            futuro.result()
+    if proprio_agendador and agendador.falhas:
+        print(f"[AGENDADOR] {agendador.resumo()}")
+
+    if indice is not None:
+        for idx, (depto, _) in enumerate(deptos):
+            if concluidos[idx] and isinstance(depto, str):
+                aulas = destino.contar(idx)
+                if indice.registrar(depto, ano, periodo, aulas):
+                    print(f"[DEPARTAMENTOS] {depto} passou a ter aulas em salas FCTE/FGA ({aulas}); "
+                          "entra nas próximas buscas.")
+        indice.atualizar_latencias(agendador.latencias())
+        indice.salvar()
+
+    faltando = [deptos[i][0] for i, feito in enumerate(concluidos) if not feito]
+    if faltando:
+        causa = f": {erros[0]}" if erros else ""
+        retomada = " Os demais ficaram no diário; rode de novo para retomar." if diario is not None else ""
+        raise RuntimeError(f"Departamentos não processados {faltando}{causa}.{retomada}")
+    return destino.cronograma()
+
+ARQUIVO_SNAPSHOT = os.path.join(BASE_DIR, "public", "Mapa_de_Salas.jsonl")
+
+def executar_scraping(ano=None, periodo=None, backend="selenium", extracao="snapshot", concorrencia=1,
+                      usar_cache=True, atualizar=False, incremental=False, exportar=(), renderizador="xml",
+                      pool=None, retomar=True, por_semestre=False, departamentos="indice", taxa=TAXA_BUSCAS,
+                      varredura=VARREDURA_POR_EXECUCAO):
+    """
+    Coleta um semestre e gera o snapshot e o DOCX em public/. Com
+    `por_semestre`, os arquivos vão para caminhos_do_semestre() e só depois
+    são copiados para Mapa_de_Salas.jsonl/.docx, de modo que coletas de
+    semestres diferentes nunca escrevem no mesmo arquivo ao mesmo tempo.
+    `departamentos` e `varredura` escolhem quais departamentos buscar (ver
+    planejar_departamentos) e `taxa` limita as buscas por segundo.
+    """
+    try:
+        print("Iniciando processo de scraping do SIGAA...")
+        if not ano or not periodo:
             ano = input("Digite o ano (ex: 2025): ").strip()
             periodo = input("Digite o período (ex: 1 ou 2): ").strip()
 
-        definir_ano_e_periodo(driver, wait, ano, periodo)
-        selecionar_departamento_por_indice(wait, 2)
-
-        cron_main = extrair_dados(driver)
-        
-        departamentos = [
-            "INSTITUTO DE FÍSICA - BRASÍLIA",
-            "INSTITUTO DE QUÍMICA - BRASÍLIA",
-            "DEPARTAMENTO DE MATEMÁTICA - BRASÍLIA",
-            "DEPARTAMENTO DE ENGENHARIA MECANICA - BRASÍLIA",
-            "DEPTO CIÊNCIAS DA COMPUTAÇÃO - BRASÍLIA"
-        ]
-        
-        for i, depto in enumerate(departamentos, 1):
-            print(f"\n[{i+1}/{len(departamentos)+1}] Processando departamento: {depto}")
-            selecionar_departamento_por_nome(wait, depto)
-            cron_ex = extrair_dados(driver, apenas_fcte=True)
-            for s, d in cron_ex.items():
-                for dia, aulas in d.items():
-                    cron_main[s][dia].extend(aulas)
-        BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+        METRICAS.reiniciar()
+        cache = CachePaginas() if usar_cache else None
+        estado = EstadoIncremental(ano, periodo) if incremental else None
+        diario = DiarioColeta(ano, periodo, retomar)
+        indice = IndiceDepartamentos()
+        deptos = planejar_departamentos(departamentos, indice, backend, pool=pool, varredura=varredura)
+        agendador = AgendadorBuscas(concorrencia, taxa, latencias=indice.latencias)
+        try:
+            cron_main = coletar_departamentos(ano, periodo, backend, extracao, concorrencia,
+                                              cache=cache, atualizar=atualizar, incremental=estado, pool=pool,
+                                              diario=diario, departamentos=deptos, indice=indice,
+                                              agendador=agendador)
+        finally:
+            if agendador.buscas:
+                print(f"[AGENDADOR] {agendador.resumo()}")
+        diario.encerrar()
+        if estado is not None:
+            imprimir_mudancas(estado.resumo_mudancas(cron_main))
+            estado.salvar()
+        imprimir_conflitos(IndiceOcupacao(cron_main).conflitos())
+
+        snapshot = ARQUIVO_SNAPSHOT
         arquivo = os.path.join(BASE_DIR, "public", "Mapa_de_Salas.docx")
-        gerar_docx(cron_main, arquivo)
-        driver.quit()
+        if por_semestre:
+            snapshot, arquivo = caminhos_do_semestre(ano, periodo)
+        exportar_eventos(cron_main, snapshot)
+        for caminho in exportar:
+            exportar_eventos(cron_main, caminho)
+
+        RENDERIZADORES[renderizador](cron_main, arquivo)
+        if por_semestre:
+            principal = os.path.join(BASE_DIR, "public", "Mapa_de_Salas.docx")
+            publicar_copia(snapshot, ARQUIVO_SNAPSHOT)
+            publicar_copia(arquivo, principal)
+            if os.path.exists(caminho_manifesto(arquivo)):
+                publicar_copia(caminho_manifesto(arquivo), caminho_manifesto(principal))
         print("Processo de scraping concluído com sucesso!")
         return True, arquivo
     
     except Exception as e:
         print(f"Erro durante o scraping: {str(e)}")
         return False, str(e)
+    finally:
+        METRICAS.imprimir_resumo()
+
+def gerar_docx_do_snapshot(snapshot=ARQUIVO_SNAPSHOT, arquivo=None, renderizador="xml"):
+    """
+    Modo só de renderização: lê um snapshot salvo por exportar_eventos e
+    roda apenas gerar_docx, sem navegador nem acesso ao SIGAA. Útil depois de
+    mudar MAPEAMENTO_SALAS_COMPLETAS ou ABBR_DISCIPLINAS.
+    """
+    try:
+        METRICAS.reiniciar()
+        inicio = time.perf_counter()
+        arquivo = arquivo or os.path.join(BASE_DIR, "public", "Mapa_de_Salas.docx")
+        print(f"Gerando documento a partir do snapshot: {snapshot}")
+        if not os.path.exists(snapshot):
+            raise FileNotFoundError(f"Snapshot não encontrado: {snapshot}. Execute o scraping primeiro.")
+        cron = carregar_eventos(snapshot)
+        imprimir_conflitos(IndiceOcupacao(cron).conflitos())
+        RENDERIZADORES[renderizador](cron, arquivo)
+        print(f"Documento regenerado em {time.perf_counter() - inicio:.2f}s.")
+        return True, arquivo
+    except Exception as e:
+        print(f"Erro ao gerar o documento: {str(e)}")
+        return False, str(e)
+    finally:
+        METRICAS.imprimir_resumo()
+
+# === LOTE DE SEMESTRES ===
+PADRAO_SEMESTRE = re.compile(r"(\d{4})[./](\d)")
+
+def _ler_semestre(texto):
+    m = PADRAO_SEMESTRE.fullmatch(texto.strip())
+    if not m:
+        raise ValueError(f"Semestre inválido: {texto!r} (use ANO.PERIODO, p.ex. 2024.2)")
+    return m.group(1), m.group(2)
+
+def ler_semestres(texto):
+    """
+    Lê uma lista de semestres ("2023.2,2024.1") e/ou intervalos
+    ("2020.1-2024.2", que cobre os períodos 1 e 2 de cada ano), sem repetir.
+    """
+    semestres = []
+    for parte in texto.split(","):
+        if not parte.strip():
+            continue
+        inicio, _, fim = parte.partition("-")
+        primeiro = _ler_semestre(inicio)
+        if not fim:
+            semestres.append(primeiro)
+            continue
+        ultimo = _ler_semestre(fim)
+        chave = lambda sem: (int(sem[0]), int(sem[1]))
+        if chave(ultimo) < chave(primeiro):
+            raise ValueError(f"Intervalo de semestres invertido: {parte.strip()}")
+        for ano in range(int(primeiro[0]), int(ultimo[0]) + 1):
+            for periodo in (1, 2):
+                if chave(primeiro) <= (ano, periodo) <= chave(ultimo):
+                    semestres.append((str(ano), str(periodo)))
+    return list(dict.fromkeys(semestres))
+
+def publicar_copia(origem, destino):
+    # Troca o arquivo de uma vez, para quem estiver lendo nunca ver a cópia pela metade
+    temporario = f"{destino}.{os.getpid()}.tmp"
+    shutil.copyfile(origem, temporario)
+    os.replace(temporario, destino)
+
+def caminhos_do_semestre(ano, periodo):
+    # (snapshot, docx) de um semestre do lote, ao lado do Mapa_de_Salas principal
+    base = os.path.join(BASE_DIR, "public", f"Mapa_de_Salas_{ano}-{periodo}")
+    return base + ".jsonl", base + ".docx"
+
+def executar_lote(semestres, backend="selenium", extracao="snapshot", concorrencia=1, usar_cache=True,
+                  atualizar=False, incremental=False, gerar_documentos=False, renderizador="xml",
+                  paralelo=1, pool=None, retomar=True, departamentos="indice", taxa=TAXA_BUSCAS,
+                  varredura=VARREDURA_POR_EXECUCAO):
+    """
+    Coleta vários (ano, período) numa única sessão: os navegadores ficam num
+    PoolNavegadores e só trocam de semestre via definir_ano_e_periodo, em vez
+    de abrir o Chrome de novo para cada um. Até `paralelo` semestres rodam ao
+    mesmo tempo. Cada semestre gera seu snapshot (e, com `gerar_documentos`,
+    seu DOCX) em caminhos_do_semestre(); um semestre com erro não interrompe
+    os demais. Um só AgendadorBuscas vale para o lote inteiro, então `taxa`
+    limita a soma das buscas de todos os semestres. `semestres` pode ser a lista de pares ou o texto de
+    ler_semestres().
+    """
+    try:
+        if isinstance(semestres, str):
+            semestres = ler_semestres(semestres)
+        if not semestres:
+            raise ValueError("Nenhum semestre informado.")
+    except ValueError as e:
+        return False, str(e)
+
+    METRICAS.reiniciar()
+    paralelo = max(1, min(paralelo, len(semestres)))
+    proprio_pool = None
+    if backend == "selenium" and pool is None:
+        pool = proprio_pool = PoolNavegadores(tamanho=paralelo * max(1, concorrencia))
+    cache = CachePaginas() if usar_cache else None
+    indice = IndiceDepartamentos()
+    agendador = AgendadorBuscas(paralelo * max(1, concorrencia), taxa, latencias=indice.latencias)
+
+    def processar(ano, periodo):
+        with METRICAS.etapa("semestre", semestre=f"{ano}.{periodo}"):
+            print(f"\n=== Semestre {ano}.{periodo} ===")
+            estado = EstadoIncremental(ano, periodo) if incremental else None
+            diario = DiarioColeta(ano, periodo, retomar)
+            deptos = planejar_departamentos(departamentos, indice, backend, pool=pool, varredura=varredura)
+            cron = coletar_departamentos(ano, periodo, backend, extracao, concorrencia,
+                                         cache=cache, atualizar=atualizar, incremental=estado, pool=pool,
+                                         diario=diario, departamentos=deptos, indice=indice,
+                                         agendador=agendador)
+            diario.encerrar()
+            if estado is not None:
+                imprimir_mudancas(estado.resumo_mudancas(cron))
+                estado.salvar()
+            snapshot, arquivo = caminhos_do_semestre(ano, periodo)
+            exportar_eventos(cron, snapshot)
+            gerados = [snapshot]
+            if gerar_documentos:
+                RENDERIZADORES[renderizador](cron, arquivo)
+                gerados.append(arquivo)
+            total = sum(len(aulas) for dias in cron.values() for aulas in dias.values())
+            print(f"[LOTE] {ano}.{periodo}: {total} aulas em {len(cron)} salas.")
+            return gerados
+
+    gerados, falhas = [], []
+    try:
+        print(f"Coletando {len(semestres)} semestres ({paralelo} por vez)...")
+        with ThreadPoolExecutor(max_workers=paralelo) as executor:
+            futuros = [(sem, executor.submit(processar, *sem)) for sem in semestres]
+            for (ano, periodo), futuro in futuros:
+                try:
+                    gerados.extend(futuro.result())
+                except Exception as e:
+                    print(f"[ERRO] Semestre {ano}.{periodo} falhou: {e}")
+                    falhas.append(f"{ano}.{periodo}")
+    finally:
+        if proprio_pool is not None:
+            proprio_pool.fechar()
+        if agendador.buscas:
+            print(f"[AGENDADOR] {agendador.resumo()}")
+        METRICAS.imprimir_resumo()
+
+    if falhas:
+        return False, f"{len(falhas)} de {len(semestres)} semestres falharam: {', '.join(falhas)}"
+    print("Lote concluído com sucesso!")
+    return True, gerados
+
+# === TRABALHADOR PERSISTENTE E FILA LOCAL ===
+DIR_FILA = os.path.join(BASE_DIR, ".cache", "fila")
+# Opções de executar_scraping que uma tarefa da fila pode definir
+OPCOES_TAREFA = ("ano", "periodo", "backend", "extracao", "concorrencia", "usar_cache", "atualizar",
+                 "incremental", "exportar", "renderizador", "retomar", "departamentos", "taxa",
+                 "varredura")
+INTERVALO_FILA = 0.5   # s entre verificações da fila
+TRABALHADOR_INATIVO = 30  # s sem sinal de vida até o trabalhador ser considerado parado
+TRABALHADOR_PARTIDA = 120  # s que um trabalhador recém-iniciado tem para abrir os navegadores
+RETENCAO_RESULTADOS = 3600  # s que o log e o resultado de uma tarefa concluída ficam disponíveis
+
+class FilaTarefas:
+    """
+    Fila em disco, sem dependências: cada tarefa é um <id>.json em
+    `diretorio`; o trabalhador a reivindica renomeando para .processando,
+    grava a saída em <id>.log e o resultado em <id>.resultado.json. Os ids
+    começam pelo horário, então a ordem dos nomes é a ordem de chegada.
+
+    Pedidos do mesmo (ano, período) são unidos: enquanto uma tarefa do
+    semestre está na fila ou em andamento, o arquivo semestre-ANO-PERIODO.ativa
+    aponta para ela e enfileirar() devolve essa mesma tarefa.
+    """
+
+    def __init__(self, diretorio=DIR_FILA):
+        self.diretorio = diretorio
+        os.makedirs(diretorio, exist_ok=True)
+        self.sinal_de_vida = os.path.join(diretorio, "trabalhador.vivo")
+        self.sinal_de_partida = os.path.join(diretorio, "trabalhador.iniciando")
+
+    def _caminho(self, id_tarefa, sufixo):
+        return os.path.join(self.diretorio, f"{id_tarefa}{sufixo}")
+
+    def _caminho_semestre(self, opcoes):
+        return os.path.join(self.diretorio, f"semestre-{opcoes.get('ano')}-{opcoes.get('periodo')}.ativa")
+
+    def _ler(self, caminho):
+        try:
+            with open(caminho, encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def enfileirar(self, opcoes):
+        """
+        Devolve (id, nova): `nova` é False quando o pedido foi unido a uma
+        tarefa do mesmo semestre que ainda não terminou.
+        """
+        marcador = self._caminho_semestre(opcoes)
+        while True:
+            try:
+                descritor = os.open(marcador, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                id_ativo = self._ler(marcador)
+                if id_ativo and (self.pendente(id_ativo) or os.path.exists(self._caminho(id_ativo, ".processando"))):
+                    return id_ativo, False
+                try:
+                    recente = time.time() - os.path.getmtime(marcador) < 1
+                except OSError:
+                    continue
+                if not id_ativo and recente:
+                    time.sleep(0.01)  # outro processo acabou de criar o marcador e ainda vai gravar o id
+                    continue
+                # Marcador de uma tarefa que já acabou (ou de quem caiu antes de gravar o id)
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(marcador)
+                continue
+            id_tarefa = f"{time.time_ns()}-{os.getpid()}"
+            temporario = self._caminho(id_tarefa, ".tmp")
+            with open(temporario, "w", encoding="utf-8") as f:
+                json.dump({k: v for k, v in opcoes.items() if k in OPCOES_TAREFA}, f, ensure_ascii=False)
+            os.replace(temporario, self._caminho(id_tarefa, ".json"))
+            with os.fdopen(descritor, "w", encoding="utf-8") as f:
+                f.write(id_tarefa)
+            return id_tarefa, True
+
+    def _liberar_semestre(self, id_tarefa, opcoes):
+        marcador = self._caminho_semestre(opcoes)
+        if self._ler(marcador) == id_tarefa:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(marcador)
+
+    def reivindicar(self):
+        # Próxima tarefa pendente, ou None. Com vários trabalhadores, só um consegue renomear.
+        for nome in sorted(os.listdir(self.diretorio)):
+            if not nome.endswith(".json") or nome.endswith(".resultado.json"):
+                continue
+            id_tarefa = nome[:-len(".json")]
+            try:
+                os.replace(self._caminho(id_tarefa, ".json"), self._caminho(id_tarefa, ".processando"))
+            except FileNotFoundError:
+                continue
+            with open(self._caminho(id_tarefa, ".processando"), encoding="utf-8") as f:
+                return id_tarefa, json.load(f)
+        return None
+
+    def devolver_orfas(self):
+        # Tarefas que ficaram .processando de um trabalhador que caiu voltam para a fila
+        for nome in os.listdir(self.diretorio):
+            if nome.endswith(".processando"):
+                id_tarefa = nome[:-len(".processando")]
+                os.replace(self._caminho(id_tarefa, ".processando"), self._caminho(id_tarefa, ".json"))
+
+    def concluir(self, id_tarefa, sucesso, resultado):
+        with open(self._caminho(id_tarefa, ".processando"), encoding="utf-8") as f:
+            opcoes = json.load(f)
+        temporario = self._caminho(id_tarefa, ".tmp")
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({"sucesso": sucesso, "resultado": resultado, "opcoes": opcoes,
+                       "concluida_em": time.time()}, f, ensure_ascii=False)
+        os.replace(temporario, self._caminho(id_tarefa, ".resultado.json"))
+        os.remove(self._caminho(id_tarefa, ".processando"))
+        self._liberar_semestre(id_tarefa, opcoes)
+
+    def caminho_log(self, id_tarefa):
+        return self._caminho(id_tarefa, ".log")
+
+    def resultado(self, id_tarefa):
+        try:
+            with open(self._caminho(id_tarefa, ".resultado.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def limpar(self, id_tarefa):
+        for sufixo in (".log", ".resultado.json"):
+            try:
+                os.remove(self._caminho(id_tarefa, sufixo))
+            except FileNotFoundError:
+                pass
+
+    def limpar_antigas(self, idade=RETENCAO_RESULTADOS):
+        # Vários clientes podem acompanhar a mesma tarefa, então o resultado
+        # não é apagado por quem lê, e sim aqui, depois de `idade` segundos
+        for nome in os.listdir(self.diretorio):
+            if nome.endswith(".resultado.json"):
+                caminho = os.path.join(self.diretorio, nome)
+                with contextlib.suppress(OSError):
+                    if time.time() - os.path.getmtime(caminho) > idade:
+                        self.limpar(nome[:-len(".resultado.json")])
+
+    def pendente(self, id_tarefa):
+        return os.path.exists(self._caminho(id_tarefa, ".json"))
+
+    def cancelar(self, id_tarefa):
+        try:
+            with open(self._caminho(id_tarefa, ".json"), encoding="utf-8") as f:
+                opcoes = json.load(f)
+            os.remove(self._caminho(id_tarefa, ".json"))
+        except (FileNotFoundError, ValueError):
+            return False
+        self._liberar_semestre(id_tarefa, opcoes)
+        return True
+
+    def situacao(self, id_tarefa):
+        """
+        Estado de uma tarefa (pendente, processando, concluida, falhou ou
+        desconhecida) com o semestre, a última linha [PROGRESSO] do log e,
+        no fim, o resultado.
+        """
+        estado, opcoes, resultado = "desconhecida", {}, None
+        final = self.resultado(id_tarefa)
+        if final is not None:
+            estado = "concluida" if final["sucesso"] else "falhou"
+            opcoes, resultado = final.get("opcoes", {}), final["resultado"]
+        else:
+            for sufixo, nome in ((".processando", "processando"), (".json", "pendente")):
+                conteudo = self._ler(self._caminho(id_tarefa, sufixo))
+                if conteudo is not None:
+                    with contextlib.suppress(ValueError):
+                        estado, opcoes = nome, json.loads(conteudo)
+                    break
+        progresso = None
+        for linha in (self._ler(self.caminho_log(id_tarefa)) or "").splitlines():
+            if linha.startswith("[PROGRESSO] "):
+                with contextlib.suppress(ValueError):
+                    progresso = json.loads(linha[len("[PROGRESSO] "):])
+        return {"id": id_tarefa, "estado": estado, "ano": opcoes.get("ano"), "periodo": opcoes.get("periodo"),
+                "progresso": progresso, "resultado": resultado}
+
+    def listar(self):
+        ids = set()
+        for nome in os.listdir(self.diretorio):
+            for sufixo in (".resultado.json", ".processando", ".json"):
+                if nome.endswith(sufixo):
+                    ids.add(nome[:-len(sufixo)])
+                    break
+        return [self.situacao(id_tarefa) for id_tarefa in sorted(ids)]
+
+    def marcar_vivo(self):
+        with open(self.sinal_de_vida, "w", encoding="utf-8") as f:
+            f.write(str(os.getpid()))
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.sinal_de_partida)
+
+    def trabalhador_ativo(self):
+        try:
+            return time.time() - os.path.getmtime(self.sinal_de_vida) < TRABALHADOR_INATIVO
+        except OSError:
+            return False
+
+    def trabalhador_subindo(self):
+        try:
+            return time.time() - os.path.getmtime(self.sinal_de_partida) < TRABALHADOR_PARTIDA
+        except OSError:
+            return False
+
+    def iniciar_trabalhador(self, argumentos=()):
+        """
+        Sobe um trabalhador em segundo plano, desligado de quem chamou, e
+        devolve o processo. Se outro cliente já está subindo um, devolve None.
+        """
+        try:
+            os.close(os.open(self.sinal_de_partida, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            if self.trabalhador_subindo():
+                return None
+            os.remove(self.sinal_de_partida)  # partida anterior que não deu certo
+            return self.iniciar_trabalhador(argumentos)
+        saida = open(os.path.join(self.diretorio, "trabalhador.log"), "a", encoding="utf-8")
+        with saida:
+            return subprocess.Popen([sys.executable, "-u", os.path.abspath(__file__), "--trabalhador", *argumentos],
+                                    stdin=subprocess.DEVNULL, stdout=saida, stderr=subprocess.STDOUT,
+                                    start_new_session=True)
+
+def servir_fila(navegadores=2, max_tarefas=20, max_crescimento_mb=300, fila=None):
+    """
+    Trabalhador de longa duração (modo serviço): abre o pool de navegadores
+    uma vez e atende as tarefas da fila local uma a uma, até ser interrompido
+    (Ctrl+C). Cada tarefa gera os arquivos do seu semestre
+    (caminhos_do_semestre), a saída vai para o .log dela com as linhas
+    [PROGRESSO], e resultados antigos são apagados depois de
+    RETENCAO_RESULTADOS.
+    """
+    fila = fila or FilaTarefas()
+    fila.devolver_orfas()
+    METRICAS.progresso = True
+    pool = PoolNavegadores(navegadores, max_tarefas=max_tarefas, max_crescimento_mb=max_crescimento_mb)
+    print(f"Abrindo {navegadores} navegador(es)...")
+    pool.aquecer()
+    print(f"Trabalhador pronto; aguardando tarefas em {fila.diretorio}")
+    try:
+        while True:
+            fila.marcar_vivo()
+            tarefa = fila.reivindicar()
+            if tarefa is None:
+                fila.limpar_antigas()
+                time.sleep(INTERVALO_FILA)
+                continue
+            id_tarefa, opcoes = tarefa
+            print(f"[FILA] Tarefa {id_tarefa}: {opcoes}")
+            inicio = time.perf_counter()
+            with open(fila.caminho_log(id_tarefa), "w", encoding="utf-8", buffering=1) as log, \
+                    contextlib.redirect_stdout(log):
+                try:
+                    sucesso, resultado = executar_scraping(**opcoes, pool=pool, por_semestre=True)
+                except Exception as e:
+                    sucesso, resultado = False, str(e)
+            fila.concluir(id_tarefa, sucesso, resultado)
+            print(f"[FILA] Tarefa {id_tarefa} {'concluída' if sucesso else 'falhou'} "
+                  f"em {time.perf_counter() - inicio:.1f}s")
+    except KeyboardInterrupt:
+        print("Encerrando o trabalhador...")
+    finally:
+        pool.fechar()
+
+def enviar_para_trabalhador(opcoes, fila=None, iniciar=True, argumentos_trabalhador=()):
+    """
+    Coloca uma tarefa na fila (ou se junta à do mesmo semestre que já está
+    rodando) e repete a saída dela aqui até terminar, para quem chama (p.ex.
+    a rota /api/executar) ver o mesmo log de uma execução normal. Sem
+    trabalhador ativo, sobe um com `argumentos_trabalhador` (ou falha logo,
+    com `iniciar=False`).
+    """
+    if not opcoes.get("ano") or not opcoes.get("periodo"):
+        return False, "Informe o ano e o período para enviar a tarefa ao trabalhador."
+    fila = fila or FilaTarefas()
+    processo = None
+    if not fila.trabalhador_ativo():
+        if not iniciar:
+            return False, "Nenhum trabalhador ativo. Inicie um com: python sigaa-scrapper.py --trabalhador"
+        if not fila.trabalhador_subindo():
+            print("Nenhum trabalhador ativo; iniciando um em segundo plano...")
+            processo = fila.iniciar_trabalhador(argumentos_trabalhador)
+    id_tarefa, nova = fila.enfileirar(opcoes)
+    if nova:
+        print(f"Tarefa {id_tarefa} enviada ao trabalhador.")
+    else:
+        print(f"Já há uma coleta de {opcoes['ano']}.{opcoes['periodo']} em andamento; acompanhando a tarefa {id_tarefa}.")
+    lido = 0
+    pendente_linha = ""
+    while True:
+        resultado = fila.resultado(id_tarefa)
+        try:
+            with open(fila.caminho_log(id_tarefa), encoding="utf-8") as log:
+                log.seek(lido)
+                trecho = log.read()
+                lido = log.tell()
+        except OSError:
+            trecho = ""
+        # Só linhas completas, para poder omitir as de progresso quando não foram pedidas
+        *linhas, pendente_linha = (pendente_linha + trecho).split("\n")
+        for linha in linhas:
+            if METRICAS.progresso or not linha.startswith("[PROGRESSO] "):
+                print(linha)
+        if resultado is not None:
+            if pendente_linha:
+                print(pendente_linha)
+            return resultado["sucesso"], resultado["resultado"]
+        if processo is not None and processo.poll() is not None:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(fila.sinal_de_partida)
+            processo = None
+        parado = not fila.trabalhador_ativo() and not fila.trabalhador_subindo()
+        if fila.pendente(id_tarefa) and parado and fila.cancelar(id_tarefa):
+            return False, "O trabalhador parou antes de pegar a tarefa."
+        time.sleep(INTERVALO_FILA)
+
+def criar_parser():
+    parser = argparse.ArgumentParser(description="Gera o mapa de salas da FCTE a partir das turmas do SIGAA.")
+    parser.add_argument("ano", nargs="?", help="ano letivo (ex: 2025); perguntado se omitido")
+    parser.add_argument("periodo", nargs="?", help="período letivo (ex: 1 ou 2); perguntado se omitido")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="selenium",
+                        help="selenium (Chrome headless) ou http (POST direto no formulário JSF)")
+    parser.add_argument("--extracao", choices=["snapshot", "webdriver"], default="snapshot",
+                        help="como ler a tabela no backend selenium (padrão: snapshot)")
+    parser.add_argument("--concorrencia", type=int, default=1,
+                        help="quantos departamentos buscar ao mesmo tempo, cada um com seu navegador/sessão (padrão: 1)")
+    parser.add_argument("--taxa", type=float, default=TAXA_BUSCAS, metavar="N",
+                        help=f"no máximo N buscas por segundo ao SIGAA, somando todos os trabalhadores "
+                             f"(padrão: {TAXA_BUSCAS:g}; 0 = sem limite)")
+    parser.add_argument("--no-cache", dest="usar_cache", action="store_false",
+                        help="não lê nem grava o cache em disco das páginas do SIGAA")
+    parser.add_argument("--refresh", dest="atualizar", action="store_true",
+                        help="busca tudo de novo no SIGAA e regrava o cache")
+    parser.add_argument("--recomecar", dest="retomar", action="store_false",
+                        help="ignora os departamentos salvos no diário de uma coleta interrompida e começa do zero")
+    parser.add_argument("--departamentos", choices=MODOS_DEPARTAMENTOS, default="indice",
+                        help="indice (padrão): só a FCTE e os departamentos que já usaram salas FCTE/FGA; "
+                             "varrer: todos os departamentos do SIGAA; fixos: a lista do script")
+    parser.add_argument("--varredura", type=int, default=VARREDURA_POR_EXECUCAO, metavar="N",
+                        help="com --departamentos indice, confere a cada coleta até N dos demais departamentos do "
+                             f"SIGAA, cada um no máximo a cada {INTERVALO_VARREDURA_DIAS} dias, para descobrir quem "
+                             f"passou a usar salas FCTE/FGA (padrão: {VARREDURA_POR_EXECUCAO}; 0 = nenhum)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="busca de novo, mas só reprocessa departamentos/turmas que mudaram e lista as salas afetadas")
+    parser.add_argument("--exportar", action="append", default=[], metavar="ARQUIVO",
+                        help="também grava a tabela de eventos em ARQUIVO (.jsonl, .csv ou .parquet); pode repetir")
+    parser.add_argument("--renderizador", choices=sorted(RENDERIZADORES), default="xml",
+                        help="xml (tabelas montadas como XML, padrão), paralelo (o mesmo XML montado em "
+                             "vários processos) ou python-docx (célula a célula)")
+    parser.add_argument("--processos", type=int, metavar="N",
+                        help="processos do renderizador paralelo (padrão: um por núcleo)")
+    parser.add_argument("--docx-sem-cache", dest="paginas_em_cache", action="store_false",
+                        help="monta de novo a página de todas as salas, sem reaproveitar as guardadas em .cache/salas")
+    parser.add_argument("--semestres", metavar="LISTA",
+                        help="modo lote: coleta vários semestres numa só sessão, p.ex. 2020.1-2024.2 ou 2023.2,2024.1; "
+                             "grava public/Mapa_de_Salas_ANO-PERIODO.jsonl de cada um")
+    parser.add_argument("--paralelo", type=int, default=1, metavar="N",
+                        help="no modo lote, quantos semestres coletar ao mesmo tempo (padrão: 1)")
+    parser.add_argument("--lote-docx", action="store_true",
+                        help="no modo lote, também gera o DOCX de cada semestre")
+    parser.add_argument("--somente-docx", nargs="?", const=ARQUIVO_SNAPSHOT, metavar="SNAPSHOT",
+                        help="não acessa o SIGAA: só gera o DOCX a partir de um snapshot salvo "
+                             "(padrão: public/Mapa_de_Salas.jsonl)")
+    parser.add_argument("--livres", nargs=3, metavar=("DIA", "INICIO", "FIM"),
+                        help="lista as salas sem aula no intervalo (p.ex. Terça 14h00 16h00), a partir do snapshot")
+    parser.add_argument("--vagas", nargs=2, metavar=("SALA", "DIA"),
+                        help="lista os horários livres de uma sala no dia (p.ex. I1 Terça), a partir do snapshot")
+    parser.add_argument("--conflitos", action="store_true",
+                        help="lista as aulas que dividem a mesma sala ao mesmo tempo, a partir do snapshot")
+    parser.add_argument("--snapshot", default=ARQUIVO_SNAPSHOT, metavar="ARQUIVO",
+                        help="snapshot usado por --livres, --vagas e --conflitos (padrão: public/Mapa_de_Salas.jsonl)")
+    parser.add_argument("--trabalhador", action="store_true",
+                        help="fica rodando com navegadores já abertos, atendendo as tarefas da fila local")
+    parser.add_argument("--navegadores", type=int, default=2,
+                        help="quantos navegadores o trabalhador mantém abertos (padrão: 2)")
+    parser.add_argument("--reciclar-apos", type=int, default=20, metavar="N",
+                        help="fecha e reabre cada navegador do trabalhador depois de N tarefas (padrão: 20)")
+    parser.add_argument("--limite-memoria", type=int, default=300, metavar="MB",
+                        help="recicla o navegador se a memória dele crescer mais que MB (padrão: 300)")
+    parser.add_argument("--navegador-completo", dest="navegador_enxuto", action="store_false",
+                        help="deixa o Chrome baixar imagens, CSS e fontes e esperar a página inteira carregar")
+    parser.add_argument("--enfileirar", action="store_true",
+                        help="em vez de rodar aqui, envia a coleta ao trabalhador (subindo um, se preciso) e mostra "
+                             "a saída dele; pedidos do mesmo semestre em andamento são unidos")
+    parser.add_argument("--situacao", nargs="?", const="*", metavar="TAREFA",
+                        help="mostra em JSON o estado e o progresso das tarefas da fila (ou só da TAREFA informada)")
+    parser.add_argument("--progresso", action="store_true",
+                        help="imprime uma linha [PROGRESSO] em JSON ao fim de cada etapa (driver, busca, extração, DOCX)")
+    parser.add_argument("--metricas", metavar="ARQUIVO",
+                        help="grava em ARQUIVO o resumo em JSON dos tempos e contadores da execução")
+    parser.add_argument("--limpar-cache", action="store_true",
+                        help="apaga o cache do ano/período informado (ou todo o cache, sem ano/período) e sai")
+    return parser
 
 # Execução direta do script
 if __name__ == "__main__":
+    configurar_saida_utf8()
     try:
-        success, result = executar_scraping()
+        args = criar_parser().parse_args()
+        METRICAS.progresso = args.progresso
+        PROCESSOS_DOCX = args.processos
+        PERFIL_ENXUTO = args.navegador_enxuto
+        PAGINAS_EM_CACHE = args.paginas_em_cache
+        if args.limpar_cache:
+            removidas = CachePaginas().invalidar(args.ano, args.periodo)
+            print(f"{removidas} página(s) removida(s) do cache.")
+            sys.exit(0)
+        if args.trabalhador:
+            servir_fila(args.navegadores, args.reciclar_apos, args.limite_memoria)
+            sys.exit(0)
+        if args.situacao:
+            fila = FilaTarefas()
+            situacao = fila.listar() if args.situacao == "*" else fila.situacao(args.situacao)
+            print(json.dumps(situacao, ensure_ascii=False, indent=2))
+            sys.exit(0)
+        if args.enfileirar:
+            argumentos_trabalhador = ["--navegadores", str(args.navegadores), "--reciclar-apos", str(args.reciclar_apos),
+                                      "--limite-memoria", str(args.limite_memoria)]
+            if not args.navegador_enxuto:
+                argumentos_trabalhador.append("--navegador-completo")
+            if not args.paginas_em_cache:
+                argumentos_trabalhador.append("--docx-sem-cache")
+            success, result = enviar_para_trabalhador({
+                "ano": args.ano, "periodo": args.periodo, "backend": args.backend, "extracao": args.extracao,
+                "concorrencia": args.concorrencia, "usar_cache": args.usar_cache, "atualizar": args.atualizar,
+                "incremental": args.incremental, "exportar": args.exportar, "renderizador": args.renderizador,
+                "retomar": args.retomar, "departamentos": args.departamentos, "taxa": args.taxa,
+                "varredura": args.varredura,
+            }, argumentos_trabalhador=argumentos_trabalhador)
+        elif args.livres or args.vagas or args.conflitos:
+            success, result = consultar_ocupacao(args.snapshot, args.livres, args.vagas, args.conflitos)
+        elif args.semestres:
+            if args.ano or args.periodo:
+                print("[AVISO] Ano/período ignorados: o modo lote usa apenas --semestres.")
+            success, result = executar_lote(args.semestres, args.backend, args.extracao,
+                                            args.concorrencia, args.usar_cache, args.atualizar, args.incremental,
+                                            args.lote_docx, args.renderizador, args.paralelo,
+                                            retomar=args.retomar, departamentos=args.departamentos,
+                                            taxa=args.taxa, varredura=args.varredura)
+        elif args.somente_docx:
+            success, result = gerar_docx_do_snapshot(args.somente_docx, renderizador=args.renderizador)
+        else:
+            success, result = executar_scraping(args.ano, args.periodo, args.backend, args.extracao, args.concorrencia,
+                                                args.usar_cache, args.atualizar, args.incremental, args.exportar,
+                                                args.renderizador, retomar=args.retomar,
+                                                departamentos=args.departamentos, taxa=args.taxa,
+                                                varredura=args.varredura)
+        if args.metricas:
+            with open(args.metricas, "w", encoding="utf-8") as f:
+                json.dump(METRICAS.resumo(), f, ensure_ascii=False, indent=2)
         if success:
             sys.exit(0)
         else: